@@ -1,6 +1,7 @@
 from __future__ import absolute_import
 
-
 from .errors import ValidationError
 from .objects import Object
 from .primitives import integer, string
+
+__all__ = ['ValidationError', 'Object', 'integer', 'string']
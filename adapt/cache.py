@@ -0,0 +1,64 @@
+"""Caches for the values read by the lenses."""
+
+from abc import ABCMeta, abstractmethod
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Dict, Hashable, Iterable, Mapping
+
+Key = Hashable
+
+
+class Cache(metaclass=ABCMeta):
+    """A store for the cached values."""
+
+    @abstractmethod
+    def get_many(self, keys: Iterable[Key]) -> Dict[Key, Any]:
+        """The values found for the keys."""
+        pass
+
+    @abstractmethod
+    def set_many(self, values: Mapping[Key, Any]) -> None:
+        """Store the values under their keys."""
+        pass
+
+    @property
+    def shared(self) -> bool:
+        """Whether the cache is shared between processes."""
+        return False
+
+
+class LRUCache(Cache):
+    """
+    An in-process cache keeping the most recently used values, up to the
+    given number.
+
+    The values are returned as they were stored, not copies, so they must
+    not be modified.
+    """
+
+    def __init__(self, max_size: int = 1000) -> None:
+        self.max_size = max_size
+        self.values: 'OrderedDict[Key, Any]' = OrderedDict()
+        self.lock = Lock()
+
+    def get_many(self, keys: Iterable[Key]) -> Dict[Key, Any]:
+        result = {}
+        with self.lock:
+            for key in keys:
+                try:
+                    result[key] = self.values[key]
+                except KeyError:
+                    continue
+                self.values.move_to_end(key)
+        return result
+
+    def set_many(self, values: Mapping[Key, Any]) -> None:
+        with self.lock:
+            for key, value in values.items():
+                self.values[key] = value
+                self.values.move_to_end(key)
+            while len(self.values) > self.max_size:
+                self.values.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self.values)
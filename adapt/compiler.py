@@ -0,0 +1,263 @@
+"""
+Compile lens trees into flat functions.
+
+The interpreted lens tree dispatches through several method calls for each
+field. The compiler generates the source of a get and a set function that
+inline the attribute access, type checks and dictionary building of the
+Attribute, Typed, Object and Composed lenses. Any other lens, or a lens
+overriding these methods, is called as is from the generated code.
+
+Only these calls can record validation errors, so a second set function,
+used inside transactions, records their errors under the attribute names
+and the first one skips the contexts altogether.
+"""
+
+from keyword import iskeyword
+from typing import Any, Callable, Dict, List
+
+from .instrumentation import _sinks
+from .lens import Composed, Lens
+from .objects import Attribute, ComposedAttribute, Object
+from .primitives import Typed
+from .transaction import _state, context
+from .utils import WRONG_TYPE_MESSAGE
+
+
+def inlined(lens: Lens, cls: type, method: str) -> bool:
+    """Whether the lens method is the one of the given class."""
+
+    return isinstance(lens, cls) and \
+        getattr(type(lens), method) is getattr(cls, method)
+
+
+def composed(lens: Lens, method: str) -> bool:
+    """
+    Whether the lens is a composition with the given method of Composed or
+    ComposedAttribute, and its outer lens modifies the target by getting and
+    setting it.
+    """
+
+    if not inlined(lens, Composed, method) and \
+            not inlined(lens, ComposedAttribute, method):
+        return False
+    assert isinstance(lens, Composed)
+    return type(lens.outer).modify in (Lens.modify, Attribute.modify)
+
+
+def identifier(name: str) -> bool:
+    """Whether the name can be used as an attribute name in the source."""
+
+    return name.isidentifier() and not iskeyword(name)
+
+
+class Generator:
+    """Generate the source of a function from a lens."""
+
+    def __init__(
+            self,
+            namespace: Dict[str, Any],
+            record: bool = False,
+    ) -> None:
+        self.namespace = namespace
+        self.record = record
+        self.constants: Dict[int, str] = {}
+        self.lines: List[str] = []
+        self.counter = 0
+        self.calls = 0
+        self.depth = 1
+
+    def name(self, prefix: str) -> str:
+        """Make a unique name."""
+
+        self.counter += 1
+        return '{}{}'.format(prefix, self.counter)
+
+    def constant(self, value: Any) -> str:
+        """Make a name referring to the value in the generated code."""
+
+        try:
+            return self.constants[id(value)]
+        except KeyError:
+            name = self.constants[id(value)] = \
+                '_c{}'.format(len(self.namespace))
+            self.namespace[name] = value
+            return name
+
+    def emit(self, line: str) -> None:
+        """Add a line to the function body."""
+
+        self.lines.append('    ' * self.depth + line)
+
+    def variable(self, expression: str) -> str:
+        """Evaluate the expression once, returning the variable holding it."""
+
+        if expression.isidentifier():
+            return expression
+        name = self.name('v')
+        self.emit('{} = {}'.format(name, expression))
+        return name
+
+    def function(self, name: str, arguments: str, result: str) -> str:
+        """The source of the function with the emitted body."""
+
+        return '\n'.join(
+            ['def {}({}):'.format(name, arguments)] +
+            self.lines +
+            ['    return {}'.format(result)]
+        )
+
+    def get(self, lens: Lens, source: str) -> str:
+        """Emit the code getting the value, returning its expression."""
+
+        if inlined(lens, Attribute, 'get'):
+            assert isinstance(lens, Attribute)
+            return '{}.{}'.format(source, lens.attribute) \
+                if identifier(lens.attribute) \
+                else 'getattr({}, {!r})'.format(source, lens.attribute)
+
+        if inlined(lens, Typed, 'get'):
+            return source
+
+        if composed(lens, 'get'):
+            assert isinstance(lens, Composed)
+            return self.get(lens.inner, self.get(lens.outer, source))
+
+        if inlined(lens, Object, 'get'):
+            assert isinstance(lens, Object)
+            source = self.variable(source)
+            values = [
+                (attribute, self.variable(self.get(attribute_lens, source)))
+                for attribute, attribute_lens in lens.attributes.items()
+            ]
+            return '{' + ', '.join(
+                '{!r}: {}'.format(attribute, value)
+                for attribute, value in values
+            ) + '}'
+
+        self.calls += 1
+        return '{}.get({})'.format(self.constant(lens), source)
+
+    def set(self, lens: Lens, target: str, value: str) -> str:
+        """Emit the code setting the value, returning the new target."""
+
+        if inlined(lens, Attribute, 'set'):
+            assert isinstance(lens, Attribute)
+            target = self.variable(target)
+            if identifier(lens.attribute):
+                self.emit('{}.{} = {}'.format(target, lens.attribute, value))
+            else:
+                self.emit('setattr({}, {!r}, {})'.format(
+                    target, lens.attribute, value))
+            return target
+
+        if inlined(lens, Typed, 'set'):
+            assert isinstance(lens, Typed)
+            value = self.variable(value)
+            expected = self.constant(lens.expected)
+            self.emit('if type({}) is not {}:'.format(value, expected))
+            self.emit('    raise TypeError({}.format('
+                      'expected={}, actual=type({})))'.format(
+                          self.constant(WRONG_TYPE_MESSAGE), expected, value))
+            return value
+
+        if composed(lens, 'set'):
+            assert isinstance(lens, Composed)
+            target = self.variable(target)
+            inner_target = self.get(lens.outer, target)
+            if not inlined(lens.outer, Attribute, 'get'):
+                inner_target = self.variable(inner_target)
+            # The attribute is only read if the inner lens uses its current
+            # value, which the type checks don't
+            inner_target_ = self.set(lens.inner, inner_target, value)
+            return self.set(lens.outer, target, inner_target_)
+
+        if inlined(lens, Object, 'set') and \
+                inlined(lens, Object, 'supplied'):
+            assert isinstance(lens, Object)
+            value = self.variable(value)
+            self.emit('if type({}) is not dict:'.format(value))
+            self.emit('    raise TypeError("Expected a dictionary.")')
+            current = self.name('t')
+            self.emit('{} = {}'.format(current, target))
+            for attribute, attribute_lens in lens.attributes.items():
+                if lens.partial:
+                    self.emit('if {!r} in {}:'.format(attribute, value))
+                    self.depth += 1
+                start, calls = len(self.lines), self.calls
+                target_ = self.set(
+                    attribute_lens,
+                    current,
+                    '{}[{!r}]'.format(value, attribute),
+                )
+                if target_ != current:
+                    self.emit('{} = {}'.format(current, target_))
+                if self.record and self.calls != calls:
+                    self.contain(start, 'with {}({!r}):'.format(
+                        self.constant(context), attribute))
+                if lens.partial:
+                    self.depth -= 1
+            return current
+
+        self.calls += 1
+        return '{}.set({}, {})'.format(self.constant(lens), target, value)
+
+    def contain(self, start: int, line: str) -> None:
+        """Nest the lines emitted since the start in a block."""
+
+        self.lines[start:] = ['    ' * self.depth + line] + [
+            '    ' + body for body in self.lines[start:]
+        ]
+
+
+class Compiled(Lens):
+    """A lens using the functions generated from another lens."""
+
+    def __init__(self, lens: Lens) -> None:
+        self.lens = lens
+
+        namespace: Dict[str, Any] = {}
+
+        getter = Generator(namespace)
+        get_source = getter.function(
+            'get', 'target', getter.get(lens, 'target'))
+
+        setter = Generator(namespace)
+        set_source = setter.function(
+            'set', 'target, value', setter.set(lens, 'target', 'value'))
+
+        recorder = Generator(namespace, record=True)
+        record_source = recorder.function(
+            'set_recording', 'target, value',
+            recorder.set(lens, 'target', 'value'))
+
+        self.source = '\n\n\n'.join(
+            [get_source, set_source, record_source])
+        exec(self.source, namespace)  # pylint:disable=exec-used
+
+        self._get: Callable[[Any], Any] = namespace['get']
+        self._set: Callable[[Any, Any], Any] = namespace['set']
+        self._set_recording: Callable[[Any, Any], Any] = \
+            namespace['set_recording']
+
+    def get(self, target: Any) -> Any:
+        if _sinks:
+            # Report the reads of the original lenses under their paths
+            return self.lens.get(target)
+        return self._get(target)
+
+    def set(self, target: Any, value: Any) -> Any:
+        if _state.active:
+            return self._set_recording(target, value)
+        return self._set(target, value)
+
+    async def aget(self, target: Any) -> Any:
+        return await self.lens.aget(target)
+
+    async def aset(self, target: Any, value: Any) -> Any:
+        return await self.lens.aset(target, value)
+
+
+def compile_lens(lens: Lens) -> Lens:
+    """Compile the lens tree into flat functions behaving the same way."""
+
+    return Compiled(lens)
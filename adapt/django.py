@@ -1,67 +1,2107 @@
 """Adapters for Django models."""
 
+from contextlib import ExitStack, contextmanager, nullcontext
+from functools import partial
+from hashlib import sha1
+from itertools import count, islice
 from operator import attrgetter
-from typing import Any, List
+from types import SimpleNamespace
+from typing import (Any, AsyncIterator, Callable, Dict, Generator, Hashable,
+                    Iterable, Iterator, List, Mapping, Optional, Set, Tuple,
+                    TypeVar, cast)
+from uuid import uuid4
+from weakref import WeakSet
 
-from .lens import Lens
-from .objects import Object
-from .transaction import atomic, on_commit
+from asgiref.sync import sync_to_async
+from django.core.cache import caches  # type: ignore
+from django.core.cache.backends.base import DEFAULT_TIMEOUT  # type: ignore
+from django.core.cache.backends.dummy import DummyCache  # type: ignore
+from django.core.cache.backends.locmem import LocMemCache  # type: ignore
+from django.core.exceptions import FieldDoesNotExist  # type: ignore
+from django.core.exceptions import ObjectDoesNotExist
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import connections, router  # type: ignore
+from django.db.models import Case, F, Max, Q, Value, When  # type: ignore
+from django.db.models.deletion import Collector  # type: ignore
+from django.db.models.manager import BaseManager  # type: ignore
+from django.db.transaction import atomic as db_atomic  # type: ignore
+from django.db.transaction import on_commit as db_on_commit
+
+from .cache import Cache, Key
+from .encoding import compile_encoder, encode_value
+from .errors import ContextStep, Errors, ValidationError
+from .instrumentation import _sinks, add_counter, reading
+from .lens import Composed, Lens
+from .objects import Attribute, Object
+from .transaction import (_state, atomic, commit_context, context, error,
+                          on_commit, resource)
 from .utils import validate_type
 
+T = TypeVar('T')
+
+
+class AsyncAtomic:
+    """
+    A database transaction for the asynchronous commit hooks.
+
+    Django runs the queries of the asynchronous methods in a single thread,
+    so the transaction is started and ended in that thread as well, making
+    the queries of the hooks a part of it.
+    """
+
+    def __init__(self, using: str) -> None:
+        self.atomic = db_atomic(using=using)
+
+    async def __aenter__(self) -> None:
+        await sync_to_async(self.atomic.__enter__)()
+
+    async def __aexit__(self, *exc_info: Any) -> Optional[bool]:
+        result: Optional[bool] = \
+            await sync_to_async(self.atomic.__exit__)(*exc_info)
+        return result
+
+
+def commit_in_transaction(using: str, asynchronous: bool = False) -> None:
+    """
+    Run the commit hooks of the current transaction inside a database
+    transaction, so that all the writes to the database are committed at
+    once or not at all. Inside an existing database transaction, a savepoint
+    is used instead.
+    """
+
+    commit_context(
+        ('django', using),
+        partial(AsyncAtomic, using) if asynchronous
+        else partial(db_atomic, using=using),
+    )
+
+
+@contextmanager
+def count_queries() -> Iterator[Callable[[], int]]:
+    """
+    Count the queries run on the database connections of the current
+    thread.
+    """
+
+    count = 0
+
+    def counted(execute: Any, *args: Any) -> Any:
+        nonlocal count
+        count += 1
+        return execute(*args)
+
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(counted))
+        yield lambda: count
+
+
+add_counter('queries', count_queries)
+
+
+class Call:
+    """
+    A call of a method of a queryset, a model instance or a lens, made
+    either directly or, from asynchronous code, through the asynchronous
+    counterpart of the method named with the 'a' prefix. Methods without
+    one are run in the thread Django runs the asynchronous queries in.
+    """
+
+    __slots__ = ('target', 'method', 'args', 'kwargs')
+
+    def __init__(self, target: Any, method: str, /, *args: Any,
+                 **kwargs: Any) -> None:
+        self.target = target
+        self.method = method
+        self.args = args
+        self.kwargs = kwargs
+
+    def run(self) -> Any:
+        """Make the call."""
+
+        return getattr(self.target, self.method)(*self.args, **self.kwargs)
+
+    async def arun(self) -> Any:
+        """Make the call asynchronously."""
+
+        try:
+            method = getattr(self.target, 'a' + self.method)
+        except AttributeError:
+            return await sync_to_async(self.run)()
+        return await method(*self.args, **self.kwargs)
+
+
+class Rows(Call):
+    """Reading all the rows of a queryset."""
+
+    __slots__ = ()
+
+    def __init__(self, target: Any) -> None:
+        super().__init__(target, '__iter__')
+
+    def run(self) -> Any:
+        return list(self.target)
+
+    async def arun(self) -> Any:
+        return [row async for row in self.target]
+
+
+class Function(Call):
+    """
+    A call of a function, run in the thread of the asynchronous queries
+    from asynchronous code.
+    """
+
+    __slots__ = ()
+
+    def __init__(self, function: Callable[..., Any], /, *args: Any,
+                 **kwargs: Any) -> None:
+        super().__init__(function, '__call__', *args, **kwargs)
+
+
+# The calls to make one after another, each getting the result of the
+# previous one, or its exception raised, and returning the final result
+Calls = Generator[Call, Any, T]
+
+
+def run_calls(calls: Calls[T]) -> T:
+    """Make the calls, returning the final result."""
+
+    result: Any = None
+    exception: Optional[Exception] = None
+    while True:
+        try:
+            call = calls.send(result) if exception is None \
+                else calls.throw(exception)
+        except StopIteration as stop:
+            return cast(T, stop.value)
+        try:
+            result, exception = call.run(), None
+        except Exception as exc:  # pylint:disable=broad-except
+            result, exception = None, exc
+
+
+async def arun_calls(calls: Calls[T]) -> T:
+    """Make the calls asynchronously, returning the final result."""
+
+    result: Any = None
+    exception: Optional[Exception] = None
+    while True:
+        try:
+            call = calls.send(result) if exception is None \
+                else calls.throw(exception)
+        except StopIteration as stop:
+            return cast(T, stop.value)
+        try:
+            result, exception = await call.arun(), None
+        except Exception as exc:  # pylint:disable=broad-except
+            result, exception = None, exc
+
+
+def make_calls(calls: Calls[T], asynchronous: bool = False) -> Any:
+    """
+    Make the calls, or return the coroutine making them asynchronously.
+    """
+
+    return arun_calls(calls) if asynchronous else run_calls(calls)
+
+
+class Write:
+    """
+    A pending write of a model instance.
+
+    A versioned write only updates the row if its version field still has
+    the expected value, recording the context path to report a conflict
+    under.
+    """
+
+    __slots__ = ('instance', 'using', 'fields', 'bulk', 'batch_size',
+                 'version', 'expected', 'path')
+
+    def __init__(
+            self,
+            instance: Any,
+            using: str,
+            fields: Optional[List[str]],
+            bulk: bool,
+            batch_size: Optional[int],
+            version: Optional[str] = None,
+    ) -> None:
+        self.instance = instance
+        self.using = using
+        self.fields = fields
+        self.bulk = bulk
+        self.batch_size = batch_size
+        self.version = version
+        self.expected: Any = None
+        self.path: Tuple[ContextStep, ...] = ()
+        if version is not None:
+            self.expected = getattr(instance, version)
+            self.path = _state.path
+
+    def merge(
+            self,
+            instance: Any,
+            fields: Optional[List[str]],
+            bulk: bool,
+            batch_size: Optional[int],
+    ) -> None:
+        """Merge a later write of the same row into this one."""
+
+        if instance is not self.instance:
+            # The same row reached as a different object: copy the values it
+            # would write
+            for field in instance._meta.concrete_fields:
+                if not field.primary_key and \
+                        (fields is None or field.name in fields):
+                    setattr(self.instance, field.attname,
+                            getattr(instance, field.attname))
+
+        if self.fields is None or fields is None:
+            self.fields = None
+        else:
+            self.fields += [
+                field for field in fields if field not in self.fields
+            ]
+
+        self.bulk = self.bulk and bulk
+        if self.batch_size is None or batch_size is None:
+            self.batch_size = self.batch_size or batch_size
+        else:
+            self.batch_size = min(self.batch_size, batch_size)
+
+
+def dependency_order(models: Iterable[Any]) -> List[Any]:
+    """Order the models so that the ones referenced by others come first."""
+
+    models = set(models)
+    ordered: List[Any] = []
+    visited: Set[Any] = set()
+
+    def visit(model: Any) -> None:
+        """Add the model after the ones it references."""
+
+        if model in visited:
+            return
+        visited.add(model)
+        for field in model._meta.concrete_fields:
+            if field.is_relation and field.related_model in models:
+                visit(field.related_model)
+        ordered.append(model)
+
+    for model in sorted(models, key=lambda model: model._meta.label):
+        visit(model)
+
+    return ordered
+
+
+class UnitOfWork:
+    """
+    The model instances to write when the transaction commits.
+
+    The instances are identified by their model, database and primary key,
+    so repeated saves of the same row are merged into a single write. The
+    writes are grouped by model, creating and updating the instances of the
+    models referenced by others first, and the ones marked as bulk are
+    written with bulk_create and bulk_update.
+
+    The versioned writes are conditional updates, incrementing the version;
+    the bulk ones are checked for changed rows first, and updated in
+    batches with one query each. If any of them finds the row changed, the
+    conflicts are raised as a validation error under the context paths of
+    the writes, after all the writes are attempted.
+    """
+
+    def __init__(self) -> None:
+        self.writes: Dict[Tuple[Any, str, Hashable], Write] = {}
+
+    def add(
+            self,
+            instance: Any,
+            using: str,
+            fields: Optional[List[str]] = None,
+            bulk: bool = False,
+            batch_size: Optional[int] = None,
+            version: Optional[str] = None,
+    ) -> None:
+        """
+        Write the instance, only the given fields if it exists already, or
+        all of them if the fields are None, checking the given version field
+        if it exists.
+        """
+
+        if instance._state.adding or instance.pk is None:
+            identity: Hashable = ('new', id(instance))
+            # New instances are created unconditionally
+            version = None
+        else:
+            identity = ('existing', instance.pk)
+            if version is not None:
+                version = instance._meta.get_field(version).attname
+
+        key = (type(instance), using, identity)
+
+        try:
+            write = self.writes[key]
+        except KeyError:
+            self.writes[key] = Write(
+                instance,
+                using,
+                None if fields is None else list(fields),
+                bulk,
+                batch_size,
+                version,
+            )
+        else:
+            write.merge(instance, fields, bulk, batch_size)
+
+    def groups(self) -> List[Tuple[Any, str, List[Write], List[Write]]]:
+        """
+        The writes grouped by model and database in dependency order, split
+        into the instances to create and to update.
+        """
+
+        grouped: Dict[Tuple[Any, str], List[Write]] = {}
+        for (model, using, _), write in self.writes.items():
+            grouped.setdefault((model, using), []).append(write)
+
+        order = dependency_order(model for model, _ in grouped)
+
+        return [
+            (
+                model,
+                using,
+                [write for write in writes if write.instance._state.adding],
+                [write for write in writes
+                 if not write.instance._state.adding],
+            )
+            for (model, using), writes in sorted(
+                grouped.items(),
+                key=lambda item: order.index(item[0][0]),
+            )
+        ]
+
+    @staticmethod
+    def create_in_bulk(write: Write) -> bool:
+        """
+        Whether to create the instance with bulk_create: only if the
+        database returns the generated primary keys, when it has none, so
+        that the instance isn't mistaken for an omitted one afterwards.
+        """
+
+        return write.bulk and (
+            write.instance.pk is not None or
+            connections[write.using].features
+            .can_return_rows_from_bulk_insert
+        )
+
+    @staticmethod
+    def bulk_fields(model: Any, writes: List[Write]) -> List[str]:
+        """The fields to write to all the instances with bulk_update."""
+
+        fields: List[str] = []
+        for write in writes:
+            if write.fields is None:
+                return [
+                    field.name
+                    for field in model._meta.concrete_fields
+                    if not field.primary_key
+                ]
+            fields += [field for field in write.fields if field not in fields]
+        return fields
+
+    @staticmethod
+    def batch_size(writes: List[Write]) -> Optional[int]:
+        """The batch size for writing the instances in bulk."""
+
+        sizes = [write.batch_size for write in writes if write.batch_size]
+        return min(sizes) if sizes else None
+
+    def versioned_batches(self, writes: List[Write]) -> Iterator[
+            List[Write]]:
+        """
+        Split the versioned writes into the single ones and the batches of
+        bulk ones.
+        """
+
+        for write in writes:
+            if not write.bulk:
+                yield [write]
+        bulk = [write for write in writes if write.bulk]
+        if bulk:
+            size = self.batch_size(bulk) or len(bulk)
+            for start in range(0, len(bulk), size):
+                yield bulk[start:start + size]
+
+    def versioned_update(self, model: Any, writes: List[Write]) -> Tuple[
+            Any, Dict[str, Any]]:
+        """
+        The rows to update conditionally on their versions, and the values
+        to set, incrementing the versions.
+        """
+
+        version = writes[0].version
+        assert version is not None
+        condition = Q()
+        for write in writes:
+            condition |= Q(pk=write.instance.pk, **{version: write.expected})
+
+        values: Dict[str, Any] = {}
+        for name in self.bulk_fields(model, writes):
+            field = model._meta.get_field(name)
+            if field.attname == version:
+                continue
+            if len(writes) == 1:
+                values[field.attname] = field.pre_save(
+                    writes[0].instance, False)
+            else:
+                values[field.attname] = Case(*(
+                    When(pk=write.instance.pk, then=Value(
+                        field.pre_save(write.instance, False),
+                        output_field=field,
+                    ))
+                    for write in writes
+                ), output_field=field)
+        values[version] = F(version) + 1
+
+        return model._base_manager.filter(condition), values
+
+    @staticmethod
+    def versions(model: Any, using: str, writes: List[Write]) -> Any:
+        """The query for the current versions of the rows of the writes."""
+
+        return model._base_manager.using(using).filter(
+            pk__in=[write.instance.pk for write in writes],
+        ).values_list('pk', writes[0].version)
+
+    @staticmethod
+    def stale(writes: List[Write], versions: Dict[Any, Any]) -> List[Write]:
+        """The versioned writes of the rows with other versions."""
+
+        return [
+            write
+            for write in writes
+            if versions.get(write.instance.pk) != write.expected
+        ]
+
+    @staticmethod
+    def conflicts(writes: List[Write], updated: int) -> List[Write]:
+        """
+        The versioned writes that found their rows changed, given the number
+        of rows updated, incrementing the versions of the instances if there
+        were none.
+        """
+
+        if updated != len(writes):
+            return writes
+
+        version = writes[0].version
+        assert version is not None
+        for write in writes:
+            setattr(write.instance, version, write.expected + 1)
+        return []
+
+    @staticmethod
+    def raise_conflicts(conflicts: List[Write]) -> None:
+        """Raise the conflicts of the versioned writes, if any."""
+
+        if conflicts:
+            errors = Errors()
+            for write in conflicts:
+                errors.add(write.path, "Modified concurrently.")
+            raise ValidationError(errors)
+
+    def flush_calls(self) -> Calls[None]:
+        """The calls writing all the pending instances."""
+
+        groups = self.groups()
+
+        for model, using, created, _ in groups:
+            bulk: List[Write] = []
+            for write in created:
+                if self.create_in_bulk(write):
+                    bulk.append(write)
+                else:
+                    yield Call(write.instance, 'save', using=using)
+            if bulk:
+                yield Call(
+                    model._base_manager.using(using),
+                    'bulk_create',
+                    [write.instance for write in bulk],
+                    batch_size=self.batch_size(bulk),
+                )
+
+        conflicts: List[Write] = []
+
+        for model, using, _, updated in groups:
+            for write in updated:
+                if not write.bulk and write.version is None:
+                    yield Call(write.instance, 'save',
+                               using=using, update_fields=write.fields)
+            bulk = [write for write in updated
+                    if write.bulk and write.version is None]
+            if bulk:
+                yield Call(
+                    model._base_manager.using(using),
+                    'bulk_update',
+                    [write.instance for write in bulk],
+                    self.bulk_fields(model, bulk),
+                    batch_size=self.batch_size(bulk),
+                )
+            for batch in self.versioned_batches(
+                    [write for write in updated if write.version]):
+                if len(batch) > 1:
+                    # Check the versions first to know which rows changed
+                    stale = self.stale(batch, dict((yield Rows(
+                        self.versions(model, using, batch)))))
+                    if stale:
+                        conflicts += stale
+                        continue
+                rows, values = self.versioned_update(model, batch)
+                conflicts += self.conflicts(
+                    batch, (yield Call(rows.using(using), 'update', **values)))
+
+        self.raise_conflicts(conflicts)
+
+    def flush(self) -> None:
+        """Write all the pending instances."""
+        run_calls(self.flush_calls())
+
+    async def aflush(self) -> None:
+        """Write all the pending instances asynchronously."""
+        await arun_calls(self.flush_calls())
+
+
+def unit_of_work(asynchronous: bool = False) -> UnitOfWork:
+    """
+    The unit of work of the current transaction, written when it commits.
+    """
+
+    def create() -> UnitOfWork:
+        """Create the unit of work and flush it on commit."""
+
+        work = UnitOfWork()
+        on_commit(work.aflush if asynchronous else work.flush)
+        return work
+
+    return resource(('django', 'unit of work', asynchronous), create)
+
+
+class DjangoCache(Cache):
+    """
+    A cache stored with Django's cache framework, in the cache with the
+    given alias.
+    """
+
+    def __init__(
+            self,
+            alias: str = 'default',
+            timeout: Any = DEFAULT_TIMEOUT,
+    ) -> None:
+        self.alias = alias
+        self.timeout = timeout
+
+    @staticmethod
+    def key(key: Key) -> str:
+        """The key to store the value in the Django cache under."""
+
+        return 'adapt:' + sha1(repr(key).encode()).hexdigest()
+
+    def get_many(self, keys: Iterable[Key]) -> Dict[Key, Any]:
+        names = {self.key(key): key for key in keys}
+        return {
+            names[name]: value
+            for name, value in caches[self.alias].get_many(names).items()
+        }
+
+    def set_many(self, values: Mapping[Key, Any]) -> None:
+        caches[self.alias].set_many(
+            {self.key(key): value for key, value in values.items()},
+            timeout=self.timeout,
+        )
+
+    @property
+    def shared(self) -> bool:
+        return not isinstance(caches[self.alias], (LocMemCache, DummyCache))
+
+
+# The caches used by the existing model lenses, to invalidate on writes
+_caches: 'WeakSet[Cache]' = WeakSet()
+
+
+def row_key(model: Any, key: Any) -> Key:
+    """The cache key of the stamp of a row."""
+
+    meta = model._meta.concrete_model._meta
+    return ('row', meta.label, meta.pk.to_python(key))
+
+
+def table_key(model: Any) -> Key:
+    """The cache key of the stamp of all the rows of a model."""
+
+    return ('table', model._meta.concrete_model._meta.label)
+
+
+def model_key(model: Any) -> Key:
+    """
+    The cache key marking the model as read by some of the cached values.
+    """
+
+    return ('model', model._meta.concrete_model._meta.label)
+
+
+def invalidate(written: Mapping[Any, List[Any]]) -> None:
+    """
+    Mark the rows of the models with the given primary keys, and the models
+    as a whole, as changed, so the values cached from them are not used
+    anymore.
+
+    Only the models some of the values in a cache were read from are marked
+    in it, with a single write to each cache.
+    """
+
+    if not _caches:
+        return
+
+    token = uuid4().hex
+    for cache in list(_caches):
+        read = cache.get_many([model_key(model) for model in written])
+        stamps: Dict[Key, str] = {}
+        for model, keys in written.items():
+            if model_key(model) not in read:
+                continue
+            stamps.update((row_key(model, key), token) for key in keys)
+            stamps[table_key(model)] = token
+        if stamps:
+            cache.set_many(stamps)
+
+
+def invalidate_on_commit(
+        using: str,
+        written: Mapping[Any, List[Any]],
+) -> None:
+    """
+    Invalidate the written rows once the database transaction commits, so
+    that no one caches them again as they were before the changes.
+    """
+
+    db_on_commit(partial(invalidate, written), using=using)
+
+
+def invalidation(asynchronous: bool = False) -> List[Tuple[Any, str]]:
+    """
+    The model instances written by the current transaction, with the
+    databases they are written to, to invalidate once they are committed.
+    """
+
+    def create() -> List[Tuple[Any, str]]:
+        """Invalidate the instances on commit."""
+
+        instances: List[Tuple[Any, str]] = []
+
+        def written() -> Dict[str, Dict[Any, List[Any]]]:
+            """The primary keys of the instances by database and model."""
+
+            result: Dict[str, Dict[Any, List[Any]]] = {}
+            for instance, using in instances:
+                result.setdefault(using, {}).setdefault(
+                    type(instance), []).append(instance.pk)
+            return result
+
+        def invalidate_all() -> None:
+            """Invalidate the written instances."""
+            for using, models in written().items():
+                invalidate_on_commit(using, models)
+
+        async def ainvalidate_all() -> None:
+            """Invalidate the written instances."""
+            for using, models in written().items():
+                await sync_to_async(invalidate_on_commit)(using, models)
+
+        on_commit(ainvalidate_all if asynchronous else invalidate_all)
+        return instances
+
+    return resource(('django', 'invalidation', asynchronous), create)
+
+
+class Field(Attribute):
+    """Lens targeting a model's field."""
+
+    async def aget(self, target: Any) -> Any:
+        """
+        Get the field value, loading a related object asynchronously if it
+        isn't loaded yet.
+        """
+
+        meta = getattr(target, '_meta', None)
+        if meta is None:
+            return self.get(target)
+
+        try:
+            field = meta.get_field(self.attribute)
+        except FieldDoesNotExist:
+            return self.get(target)
+
+        if field.concrete and (field.many_to_one or field.one_to_one) and \
+                not field.is_cached(target):
+            related_id = getattr(target, field.attname)
+            if related_id is not None:
+                manager = field.remote_field.model._base_manager.db_manager(
+                    target._state.db)
+                related = await manager.aget(**{
+                    field.target_field.attname: related_id,
+                })
+                field.set_cached_value(target, related)
+
+        return self.get(target)
+
 
 class Model(Object):
-    """A lens for Django models."""
+    """
+    A lens for Django models.
+
+    The models are saved to the given database, or the one chosen by the
+    database router. The saves happen inside a database transaction, through
+    the transaction's unit of work; in bulk mode, the instances are written
+    with bulk_create and bulk_update together with the other instances of the
+    same model (new instances without a primary key are saved one by one
+    instead on databases not returning the generated keys from bulk inserts,
+    such as MySQL).
+
+    In partial mode, only the attributes present in the value are set, and
+    only the changed ones among them are saved.
+
+    With an optimistic version field (an integer), concurrent changes are
+    detected instead of overwritten: the version in the value must be the
+    current one of the instance, and the instance is only saved if the
+    version of the row is still the one it was read with, incrementing it.
+    Otherwise, the conflict is a validation error. Such saves are
+    conditional updates, so the save signals are not sent.
+    """
+
+    pointer = Field
+
+    def __init__(
+            self,
+            attributes: Dict[str, Lens],
+            using: Optional[str] = None,
+            bulk: bool = False,
+            partial: bool = False,
+            optimistic: Optional[str] = None,
+    ) -> None:
+        super().__init__(attributes, partial=partial)
+        self.using = using
+        self.bulk = bulk
+        self.optimistic = optimistic
+
+    def alias(self, target: Any) -> str:
+        """The database to save the instance to."""
+
+        if self.using is not None:
+            return self.using
+        using: str = router.db_for_write(type(target), instance=target)
+        return using
+
+    @atomic
+    def assign(self, target: Any, value: Any) -> Any:
+        """Set the values without saving the model."""
+        return super().set(target, value)
+
+    @atomic
+    def update(self, target: Any, value: Any) -> Tuple[
+            Any, Optional[List[str]]]:
+        """
+        Set the values without saving the model, returning the names of the
+        changed attributes, or None if the instance is new.
+        """
+
+        if target._state.adding:
+            return self.assign(target, value), None
+
+        before = {
+            attribute: self.pointer(attribute).get(target)
+            for attribute, _ in self.supplied(value)
+        }
+        target_ = self.assign(target, value)
+        return target_, self.changed(target_, [
+            attribute
+            for attribute, previous in before.items()
+            if self.pointer(attribute).get(target_) != previous
+        ])
+
+    def changed(self, target: Any, changed: List[str]) -> List[str]:
+        """
+        The changed attributes to save, or none if the version in the value
+        is not the one of the instance, recording the conflict.
+        """
+
+        if self.optimistic in changed:
+            error("Modified concurrently.")
+            return []
+        return changed
 
     @atomic
     def set(self, target: Any, value: Any) -> Any:
-        """Set the values and save the model."""
-        target_ = super().set(target, value)
-        on_commit(target_.save)
+        """
+        Set the values and save the model.
+
+        Only the changed fields of an existing instance are saved, and it is
+        not saved at all if nothing changed.
+        """
+
+        target_, changed = self.update(target, value)
+        self.save_on_commit(target_, changed)
         return target_
 
+    @atomic
+    async def aassign(self, target: Any, value: Any) -> Any:
+        """Set the values asynchronously without saving the model."""
+        return await super().aset(target, value)
+
+    @atomic
+    async def aupdate(self, target: Any, value: Any) -> Tuple[
+            Any, Optional[List[str]]]:
+        """
+        Set the values asynchronously without saving the model, returning
+        the names of the changed attributes, or None if the instance is new.
+        """
+
+        if target._state.adding:
+            return await self.aassign(target, value), None
+
+        before = {
+            attribute: await self.pointer(attribute).aget(target)
+            for attribute, _ in self.supplied(value)
+        }
+        target_ = await self.aassign(target, value)
+        return target_, self.changed(target_, [
+            attribute
+            for attribute, previous in before.items()
+            if await self.pointer(attribute).aget(target_) != previous
+        ])
+
+    @atomic
+    async def aset(self, target: Any, value: Any) -> Any:
+        """Set the values and save the model asynchronously."""
+
+        target_, changed = await self.aupdate(target, value)
+        self.save_on_commit(target_, changed, asynchronous=True)
+        return target_
+
+    def save_on_commit(
+            self,
+            target: Any,
+            changed: Optional[List[str]],
+            asynchronous: bool = False,
+            using: Optional[str] = None,
+            bulk: bool = False,
+            batch_size: Optional[int] = None,
+    ) -> None:
+        """
+        Save the changed attributes of the instance, or all of them if it is
+        new, when the transaction commits.
+        """
+
+        if changed is not None and not changed:
+            return
+
+        using = using or self.alias(target)
+        commit_in_transaction(using, asynchronous)
+
+        fields = self.fields(type(target))
+        work = unit_of_work(asynchronous)
+        if _caches:
+            invalidation(asynchronous).append((target, using))
+        work.add(
+            target,
+            using,
+            changed
+            if changed is not None and
+            all(attribute in fields for attribute in changed)
+            else None,
+            bulk=self.bulk or bulk,
+            batch_size=batch_size,
+            version=self.optimistic,
+        )
+
+    def fields(self, model: Any) -> List[str]:
+        """Names of the model's concrete fields covered by the lens."""
+
+        concrete = {
+            field.name
+            for field in model._meta.concrete_fields
+            if not field.primary_key
+        }
+        return [
+            attribute
+            for attribute in self.attributes
+            if attribute in concrete
+        ]
+
+
+class CachedModel(Model):
+    """
+    A lens for Django models caching the values it gets from the saved
+    instances.
+
+    The values are cached under the lens name, the model, the primary key
+    and, if given, the value of the version field, such as a modification
+    time or a version counter. The name defaults to the lens identity, so it
+    must be given when the cache is shared between processes.
+
+    A cached value is used until the instance, or any related instance read
+    through the nested model and queryset lenses, is written through the
+    model and queryset lenses: the written rows are invalidated when the
+    database transaction commits. For multi-valued relations, writing any
+    instance of the related model invalidates the value. The writes
+    invalidate the caches of the cached lenses existing in the process, so a
+    cache shared between processes is only kept valid by the ones using it.
+    Only the models the values in a cache were read from are invalidated in
+    it.
+
+    The cached values are shared, so they must not be modified.
+    """
+
+    def __init__(
+            self,
+            attributes: Dict[str, Lens],
+            cache: Cache,
+            version: Optional[str] = None,
+            name: Optional[str] = None,
+            using: Optional[str] = None,
+            bulk: bool = False,
+            partial: bool = False,
+            optimistic: Optional[str] = None,
+    ) -> None:
+        super().__init__(attributes, using=using, bulk=bulk, partial=partial,
+                         optimistic=optimistic)
+        if name is None and cache.shared:
+            raise ValueError(
+                "A name is required to use a cache shared between processes.")
+        self.cache = cache
+        self.version = version
+        self.name = name if name is not None else id(self)
+        self.relations = relations(self)
+        _caches.add(cache)
+
+    def cache_key(self, target: Any) -> Key:
+        """The key to cache the value of the instance under."""
+
+        return (
+            'value',
+            self.name,
+            target._meta.concrete_model._meta.label,
+            target.pk,
+            getattr(target, self.version) if self.version else None,
+        )
+
+    def dependencies(self, target: Any) -> List[Key]:
+        """
+        The stamps of the rows the value of the instance is read from, and
+        the marks of their models.
+        """
+
+        models = {type(target)}
+        keys = [row_key(type(target), target.pk)]
+        for path in self.relations:
+            model = type(target)
+            current = target
+            for step in path:
+                try:
+                    field = relation_field(model, step)
+                except FieldDoesNotExist:
+                    break
+                if not field.is_relation or field.related_model is None:
+                    break
+                model = field.related_model
+                models.add(model)
+                if current is not None and \
+                        (field.many_to_one or field.one_to_one):
+                    try:
+                        current = getattr(current, step)
+                    except ObjectDoesNotExist:
+                        current = None
+                    if current is not None:
+                        keys.append(row_key(model, current.pk))
+                else:
+                    current = None
+                    keys.append(table_key(model))
+        keys.extend(model_key(model) for model in models)
+        return keys
+
+    def cached(self, key: Key) -> Tuple[bool, Any]:
+        """
+        Whether a valid value is cached under the key, and the value.
+
+        The value is valid if the stamps of the rows it was read from didn't
+        change since.
+        """
+
+        try:
+            value, stamps = self.cache.get_many([key])[key]
+        except KeyError:
+            return False, None
+        current = self.cache.get_many(stamps)
+        if any(current.get(stamp) != token
+               for stamp, token in stamps.items()):
+            return False, None
+        return True, value
+
+    def store(self, key: Key, value: Any, dependencies: List[Key]) -> None:
+        """Cache the value together with the stamps of its rows."""
+
+        stamps = self.cache.get_many(dependencies)
+        # Missing stamps are created, so that losing them later doesn't make
+        # the value seem valid
+        missing = {
+            dependency: uuid4().hex
+            for dependency in dependencies
+            if dependency not in stamps
+        }
+        if missing:
+            self.cache.set_many(missing)
+            stamps.update(missing)
+        self.cache.set_many({key: (value, stamps)})
+
+    def get(self, target: Any) -> Any:
+        # Rows read as values and unsaved instances are not cached
+        if not hasattr(target, '_meta') or target.pk is None:
+            return super().get(target)
+
+        key = self.cache_key(target)
+        found, value = self.cached(key)
+        if not found:
+            value = super().get(target)
+            self.store(key, value, self.dependencies(target))
+        return value
+
+    async def aget(self, target: Any) -> Any:
+        if not hasattr(target, '_meta') or target.pk is None:
+            return await super().aget(target)
+
+        key = self.cache_key(target)
+        found, value = self.cached(key)
+        if not found:
+            value = await super().aget(target)
+            self.store(key, value, self.dependencies(target))
+        return value
+
 
 GET_PK = attrgetter('pk')
 
+Path = Tuple[str, ...]
+
+
+def relations(lens: Lens) -> List[Path]:
+    """Paths of the attributes the nested object lenses traverse."""
+
+    if isinstance(lens, QuerySet):
+        return relations(lens.model)
+
+    if not isinstance(lens, Object):
+        return []
+
+    paths: List[Path] = []
+    for attribute, attribute_lens in lens.attributes.items():
+        if not isinstance(attribute_lens, Composed):
+            continue
+        inner = attribute_lens.inner
+        if isinstance(inner, (Object, QuerySet)):
+            paths.append((attribute,))
+            paths.extend((attribute,) + path for path in relations(inner))
+    return paths
+
+
+def relation_field(model: Any, name: str) -> Any:
+    """
+    The field of the model with the name, which for reverse relations is the
+    accessor (e.g. 'user_set') rather than the query name.
+    """
+
+    try:
+        return model._meta.get_field(name)
+    except FieldDoesNotExist:
+        for relation in model._meta.related_objects:
+            if relation.get_accessor_name() == name:
+                return relation
+        raise
+
+
+def plan_relations(model: Any, paths: List[Path]) -> Tuple[
+        List[str], List[str]]:
+    """
+    Split the paths into the ones to use with select_related and the ones to
+    use with prefetch_related on the given model.
+
+    Paths stop at the first attribute that is not a relation; paths going
+    through a multi-valued relation must be prefetched.
+    """
+
+    select: List[str] = []
+    prefetch: List[str] = []
+
+    for path in paths:
+        current = model
+        steps: List[str] = []
+        single = True
+        for step in path:
+            try:
+                field = relation_field(current, step)
+            except FieldDoesNotExist:
+                break
+            if not field.is_relation or field.related_model is None:
+                break
+            steps.append(step)
+            single = single and (field.many_to_one or field.one_to_one)
+            current = field.related_model
+
+        if steps:
+            (select if single else prefetch).append('__'.join(steps))
+
+    return select, prefetch
+
+
+# A column path, and whether it is a relation to the model with the following
+# columns
+Column = Tuple[Path, bool]
+
+
+def columns(lens: Object, model: Any, prefix: Path = ()) -> Optional[
+        List[Column]]:
+    """
+    Columns of the model read by the object lens, or None if the lens reads
+    anything other than concrete fields and single-valued relations, or
+    caches its values from the instances.
+    """
+
+    if isinstance(lens, CachedModel):
+        return None
+
+    result: List[Column] = []
+    for attribute, attribute_lens in lens.attributes.items():
+        if not isinstance(attribute_lens, Composed) or \
+                not isinstance(attribute_lens.outer, Attribute):
+            return None
+        try:
+            field = model._meta.get_field(attribute)
+        except FieldDoesNotExist:
+            return None
+        if not field.concrete:
+            return None
+
+        path = prefix + (attribute,)
+        inner = attribute_lens.inner
+        if isinstance(inner, Object):
+            if not field.many_to_one and not field.one_to_one:
+                return None
+            nested = columns(inner, field.related_model, path)
+            if nested is None:
+                return None
+            result.append((path, True))
+            result.extend(nested)
+        elif field.is_relation or isinstance(inner, QuerySet):
+            return None
+        else:
+            result.append((path, False))
+    return result
+
+
+def build_row(row_columns: List[Column], values: Any) -> Any:
+    """Build an object with the attributes from a values_list row."""
+
+    row = SimpleNamespace()
+    for (path, relation), value in zip(row_columns, values):
+        parent = row
+        for step in path[:-1]:
+            parent = getattr(parent, step)
+            if parent is None:
+                break
+        else:
+            if relation and value is not None:
+                value = SimpleNamespace()
+            setattr(parent, path[-1], value)
+    return row
+
+
+def instance_row(instance: Any) -> Tuple[Any, Any]:
+    """Primary key and the object for the lens from a model instance."""
+    return instance.pk, instance
+
+
+def values_row(row_columns: List[Column], row: Any) -> Tuple[Any, Any]:
+    """Primary key and the object for the lens from a values_list row."""
+    return row[0], build_row(row_columns, row[1:])
+
+
+# A patch operation: 'add', 'update' or 'remove', the primary key and the
+# item (None for removing), also accepted as a list
+Operation = Tuple[str, Any, Any]
+
+
+def diff(previous: Iterable[Tuple[Any, Any]], current: Iterable[
+        Tuple[Any, Any]]) -> List[Operation]:
+    """
+    The patch operations turning the previous primary keys and items into
+    the current ones.
+    """
+
+    before = dict(previous)
+    operations: List[Operation] = []
+    kept = set()
+
+    for key, item in current:
+        kept.add(key)
+        if key not in before:
+            operations.append(('add', key, item))
+        elif before[key] != item:
+            operations.append(('update', key, item))
+
+    operations.extend(
+        ('remove', key, None)
+        for key in before
+        if key not in kept
+    )
+    return operations
+
+
+def is_operation(operation: Any) -> bool:
+    """
+    Whether the value has the shape of a patch operation: a tuple, or a list
+    as decoded from JSON, of three elements.
+    """
+
+    return type(operation) in (tuple, list) and len(operation) == 3
+
+
+class Patch:
+    """The changes and removals of a patch, checked against the target."""
+
+    __slots__ = ('indices', 'changes', 'removed')
+
+    def __init__(self) -> None:
+        self.indices: List[int] = []
+        self.changes: List[Tuple[Any, Any]] = []
+        self.removed: List[Any] = []
+
+
+class Changes:
+    """
+    The items changed since a watermark, the new watermark and the primary
+    keys of the deleted instances.
+    """
+
+    __slots__ = ('items', 'watermark', 'deleted')
+
+    def __init__(
+            self,
+            items: List[Tuple[Any, Any]],
+            watermark: Any,
+            deleted: List[Any],
+    ) -> None:
+        self.items = items
+        self.watermark = watermark
+        self.deleted = deleted
+
 
 class QuerySet(Lens):
-    """A lens for querysets."""
+    """
+    A lens for querysets.
+
+    In bulk mode, the existing instances are loaded in a single query, and
+    the changes are written with bulk_create and bulk_update in batches of
+    the given size, instead of a query and a save for each instance.
+
+    The related objects read by the nested lenses are loaded together with
+    the instances using select_related and prefetch_related.
+
+    If the lens only reads concrete fields (possibly through single-valued
+    relations), the projection can restrict the columns read: 'only' loads
+    the instances with just these fields, and 'values' reads the fields with
+    values_list without creating the model instances at all. Otherwise, the
+    whole instances are read.
+
+    The models omitted from the value are found by comparing the primary
+    keys of the target with the ones kept, and deleted in batches of the
+    given size. If the deletion doesn't involve signals or cascades, the
+    batches are deleted directly, without loading the models.
+
+    The changes are written to the given database, or the one chosen by the
+    database router, inside a database transaction.
+
+    Validation errors are recorded under the index of the item in the value.
+
+    Instead of replacing the whole collection, a patch can add, update and
+    remove the instances by primary key, leaving the ones not mentioned
+    alone. diff returns the patch between an earlier result of get and the
+    current one.
+
+    To poll for changes, changes reads only the instances whose watermark
+    field (a modification time, or an increasing version or primary key)
+    moved past the previous watermark. Finding the deleted instances
+    requires the consumer to send every primary key it knows, which costs a
+    query per batch of them on each poll; with soft deletion, a tombstone
+    condition reports them among the changes instead.
+
+    With a replica database, the reads (get, stream, encode and changes)
+    are sent to it, unless they happen inside a transaction. Setting always
+    looks up the existing instances in the database the changes are written
+    to, so that the writes are based on the current rows.
+
+    In lock mode, the existing instances are read with select_for_update,
+    in one query, so that no one else changes them until the database
+    transaction ends. As select_for_update requires, the lens must then be
+    used inside a database transaction, which the writes join.
+    """
+
+    def __init__(
+            self,
+            model: Model,
+            bulk: bool = False,
+            batch_size: Optional[int] = None,
+            projection: Optional[str] = None,
+            delete_batch_size: int = 500,
+            using: Optional[str] = None,
+            lock: bool = False,
+            replica: Optional[str] = None,
+    ) -> None:
+        if projection not in (None, 'only', 'values'):
+            raise ValueError(
+                "Unknown projection: {}.".format(projection))
 
-    def __init__(self, model: Model) -> None:
         self.model = model
+        self.bulk = bulk
+        self.batch_size = batch_size
+        self.projection = projection
+        self.delete_batch_size = delete_batch_size
+        self.using = using
+        self.lock = lock
+        self.replica = replica
+        self.relations = relations(model)
+        self.plans: Dict[Any, Tuple[List[str], List[str]]] = {}
+        self.projections: Dict[Any, Optional[List[Column]]] = {}
+        self.encoder: Optional[Callable[[Any], str]] = None
+
+    def alias(self, target: Any) -> str:
+        """The database to write the changes to the target to."""
+
+        if self.using is not None:
+            return self.using
+        using: str = target._db or router.db_for_write(target.model)
+        return using
+
+    def reading(self, target: Any) -> Any:
+        """
+        The target to read from: the replica, if any, outside of
+        transactions, and the database to write to inside them.
+        """
+
+        if self.replica is None:
+            return target
+        if _state.active:
+            return target.using(self.alias(target))
+        return target.using(self.replica)
+
+    def writing(self, target: Any) -> Any:
+        """The target to look up the instances to write in."""
+        return target.using(self.alias(target))
+
+    def related(self, target: Any) -> Any:
+        """Load the related objects used by the lens along with the target."""
+
+        if not self.relations:
+            return target
+
+        try:
+            select, prefetch = self.plans[target.model]
+        except KeyError:
+            select, prefetch = self.plans[target.model] = \
+                plan_relations(target.model, self.relations)
+
+        if select:
+            target = target.select_related(*select)
+        if prefetch:
+            target = target.prefetch_related(*prefetch)
+        return target
+
+    def locked(self, target: Any) -> Any:
+        """The target to read the existing instances from when setting."""
+
+        if self.lock:
+            return target.select_for_update()
+        return target
+
+    def lock_rows(self, target: Any, value: Any) -> Any:
+        """The query locking the existing instances of the items."""
+
+        return self.locked(target.filter(pk__in=[
+            key for key, _ in value if key is not None
+        ])).values_list('pk', flat=True)
+
+    def columns(self, target: Any) -> Optional[List[Column]]:
+        """Columns to read with the projection, if it can be used."""
+
+        if self.projection is None:
+            return None
+
+        try:
+            return self.projections[target.model]
+        except KeyError:
+            result = self.projections[target.model] = \
+                columns(self.model, target.model)
+            return result
+
+    def source(self, target: Any) -> Tuple[Any, Callable[[Any], Any]]:
+        """
+        The queryset to read, and the function converting each of its rows
+        to the primary key and the object for the model lens.
+
+        A related manager is read through its queryset, which is the
+        prefetched one if the parent lens loaded it with prefetch_related.
+        """
+
+        if isinstance(target, BaseManager):
+            target = target.all()
+            if target._result_cache is not None:
+                return target, instance_row
+
+        target = self.reading(target)
+        target_columns = self.columns(target)
+
+        if target_columns is None:
+            return self.related(target), instance_row
+
+        names = ['__'.join(path) for path, _ in target_columns]
+
+        if self.projection == 'only':
+            return self.related(target).only(*names), instance_row
+
+        return (
+            target.values_list('pk', *names),
+            partial(values_row, target_columns),
+        )
 
     def get(self, target: Any) -> Any:
-        return [
-            (instance.pk, self.model.get(instance))
-            for instance in target
-        ]
+        rows, convert = self.source(target)
+        if not _sinks:
+            return [
+                (key, self.model.get(instance))
+                for key, instance in map(convert, rows)
+            ]
+        result = []
+        for index, (key, instance) in enumerate(map(convert, rows)):
+            with reading(index):
+                result.append((key, self.model.get(instance)))
+        return result
+
+    async def aget(self, target: Any) -> Any:
+        rows, convert = self.source(target)
+        result = []
+        index = 0
+        async for row in rows:
+            key, instance = convert(row)
+            with reading(index) if _sinks else nullcontext():
+                result.append((key, await self.model.aget(instance)))
+            index += 1
+        return result
+
+    def stream(self, target: Any, chunk_size: int = 2000) -> Iterator[
+            Tuple[Any, Any]]:
+        """
+        Yield the primary keys and the values one by one, fetching the rows
+        in chunks and not caching the instances, so that the memory used
+        doesn't depend on the number of rows.
+        """
+
+        rows, convert = self.source(target)
+        for row in rows.iterator(chunk_size=chunk_size):
+            key, instance = convert(row)
+            yield key, self.model.get(instance)
+
+    def encode(self, target: Any, chunk_size: int = 2000) -> Iterator[str]:
+        """
+        Yield the JSON text of the value, the same as json.dumps of the
+        result of get, in chunks of a row each. The rows are read as in
+        stream, and encoded directly from the instances without building the
+        dictionaries.
+        """
+
+        if self.encoder is None:
+            self.encoder = compile_encoder(self.model)
+        encode = self.encoder
+
+        rows, convert = self.source(target)
+        separator = '['
+        for row in rows.iterator(chunk_size=chunk_size):
+            key, instance = convert(row)
+            yield '{}[{}, {}]'.format(
+                separator, encode_value(key), encode(instance))
+            separator = ', '
+        yield '[]' if separator == '[' else ']'
+
+    async def astream(self, target: Any, chunk_size: int = 2000) -> \
+            AsyncIterator[Tuple[Any, Any]]:
+        """Yield the primary keys and the values one by one asynchronously."""
+
+        rows, convert = self.source(target)
+        async for row in rows.aiterator(chunk_size=chunk_size):
+            key, instance = convert(row)
+            yield key, await self.model.aget(instance)
+
+    def diff(self, target: Any, previous: Iterable[Tuple[Any, Any]]) -> List[
+            Operation]:
+        """The patch operations from the previous value to the target."""
+
+        return diff(previous, self.get(target))
+
+    @staticmethod
+    def changed(target: Any, field: str, since: Any, watermark: Any) -> Any:
+        """
+        The instances of the target whose field is past the previous
+        watermark, up to the new one, in the order of the field.
+        """
+
+        if since is not None:
+            target = target.filter(**{field + '__gt': since})
+        if watermark is not None:
+            target = target.filter(**{field + '__lte': watermark})
+        return target.order_by(field, 'pk')
+
+    def changes(
+            self,
+            target: Any,
+            field: str,
+            since: Any = None,
+            known: Optional[Iterable[Any]] = None,
+            tombstone: Optional[Q] = None,
+    ) -> Changes:
+        """
+        The primary keys and the items of the instances whose field is
+        greater than the watermark (all of them if it is None), and the new
+        watermark: the greatest value of the field, or the same watermark if
+        there are no instances past it.
+
+        The new watermark is found first, so an instance changed while
+        reading is returned by the next poll. The field must only increase,
+        and not repeat between polls, for no change to be missed.
+
+        If the primary keys known to the consumer are given, the ones no
+        longer in the target are returned as deleted. This makes the poll
+        proportional to the whole collection rather than to the changes: the
+        consumer sends all its keys, and they are looked up in a query per
+        batch of the delete batch size.
+
+        Instead, if the instances are soft deleted, the tombstone condition
+        selects the deleted ones in the target. The changed instances
+        matching it are returned as deleted rather than as items, so that
+        the deletions are found among the changes. The field must then move
+        forward when an instance is deleted.
+        """
+
+        return run_calls(
+            self.changes_calls(target, field, since, known, tombstone))
+
+    async def achanges(
+            self,
+            target: Any,
+            field: str,
+            since: Any = None,
+            known: Optional[Iterable[Any]] = None,
+            tombstone: Optional[Q] = None,
+    ) -> Changes:
+        """The items changed since the watermark, read asynchronously."""
+
+        return await arun_calls(
+            self.changes_calls(target, field, since, known, tombstone))
+
+    def changes_calls(
+            self,
+            target: Any,
+            field: str,
+            since: Any,
+            known: Optional[Iterable[Any]],
+            tombstone: Optional[Q],
+    ) -> Calls[Changes]:
+        """The calls reading the items changed since the watermark."""
+
+        target = self.reading(target)
+        watermark = (yield Call(
+            self.changed(target, field, since, None),
+            'aggregate',
+            watermark=Max(field),
+        ))['watermark']
+        if watermark is None:
+            return Changes([], since,
+                           (yield from self.deleted_calls(target, known)))
+
+        changed = self.changed(target, field, since, watermark)
+        if tombstone is None:
+            return Changes(
+                (yield Call(self, 'get', changed)),
+                watermark,
+                (yield from self.deleted_calls(target, known)),
+            )
+
+        items = yield Call(self, 'get', changed.exclude(tombstone))
+        removed = yield Rows(
+            changed.filter(tombstone).values_list('pk', flat=True))
+        return Changes(
+            items,
+            watermark,
+            removed + (yield from self.deleted_calls(target, known)),
+        )
+
+    def deleted(self, target: Any, known: Optional[Iterable[
+            Any]]) -> List[Any]:
+        """The known primary keys missing from the target, in batches."""
+
+        return run_calls(self.deleted_calls(target, known))
+
+    async def adeleted(self, target: Any, known: Optional[Iterable[
+            Any]]) -> List[Any]:
+        """The known primary keys missing from the target, asynchronously."""
+
+        return await arun_calls(self.deleted_calls(target, known))
+
+    def deleted_calls(self, target: Any, known: Optional[Iterable[
+            Any]]) -> Calls[List[Any]]:
+        """The calls finding the known primary keys missing from the target."""
+
+        if known is None:
+            return []
+
+        target = self.reading(target)
+        to_python = target.model._meta.pk.to_python
+        keys = [to_python(key) for key in known]
+        found = set()
+        for batch in self.batches(keys):
+            found.update((yield Rows(
+                target.filter(pk__in=batch).values_list('pk', flat=True))))
+        return [key for key in keys if key not in found]
 
     @atomic
     def set(self, target: Any, value: Any) -> Any:
-        validate_type(list, value)
+        return run_calls(self.set_calls(target, value))
 
-        existing: List[Any] = []
+    @atomic
+    async def aset(self, target: Any, value: Any) -> Any:
+        return await arun_calls(
+            self.set_calls(target, value, asynchronous=True))
 
-        for key, item in value:
-            if key is None:
-                # Create a new model instance with no explicit PK
-                instance = target.model()
-            else:
-                try:
-                    # Get the existing model instance
-                    instance = target.get(pk=key)
-                except target.model.DoesNotExist:
-                    # Create a new model instance with explicit PK
-                    instance = target.model(pk=key)
+    def set_calls(self, target: Any, value: Any,
+                  asynchronous: bool = False) -> Calls[Any]:
+        """The calls updating the target from the value."""
 
-            instance_ = self.model.set(instance, item)
+        validate_type(list, value)
+
+        using = self.alias(target)
+        commit_in_transaction(using, asynchronous)
+        target = self.writing(target)
 
-            # Remember the instance, not to delete it
-            existing.append(instance_)
+        if self.bulk:
+            existing = yield from self.set_bulk_calls(
+                target, value, asynchronous=asynchronous)
+        else:
+            existing = yield from self.set_each_calls(target, value)
 
-        def cleanup() -> None:
+        def cleanup() -> Any:
             """Remove models omitted from the value."""
-            target.exclude(pk__in=map(GET_PK, existing)).delete()
+            return make_calls(self.delete_omitted_calls(
+                target.using(using), map(GET_PK, existing)), asynchronous)
 
         on_commit(cleanup)
 
         return target
+
+    @atomic
+    def patch(self, target: Any, value: Any) -> Any:
+        """
+        Apply a list of operations to the target: add a new instance (with
+        the given primary key, or None), update an existing one or remove
+        it. The instances not mentioned are not read or written.
+
+        Adding an existing instance or updating or removing a missing one is
+        a validation error, recorded under the index of the operation.
+        """
+
+        return run_calls(self.patch_calls(target, value))
+
+    @atomic
+    async def apatch(self, target: Any, value: Any) -> Any:
+        """Apply a list of operations to the target asynchronously."""
+
+        return await arun_calls(
+            self.patch_calls(target, value, asynchronous=True))
+
+    def patch_calls(self, target: Any, value: Any,
+                    asynchronous: bool = False) -> Calls[Any]:
+        """The calls applying the operations to the target."""
+
+        validate_type(list, value)
+
+        using = self.alias(target)
+        commit_in_transaction(using, asynchronous)
+        target = self.writing(target)
+
+        patch = self.plan_patch(target, value, set((yield Rows(
+            self.locked(target.filter(pk__in=self.patch_keys(target, value)))
+            .values_list('pk', flat=True)
+        ))))
+
+        if self.bulk:
+            yield from self.set_bulk_calls(
+                target, patch.changes, patch.indices, asynchronous)
+        else:
+            yield from self.set_each_calls(
+                target, patch.changes, patch.indices)
+
+        def cleanup() -> Any:
+            """Remove the models."""
+            return make_calls(self.delete_keys_calls(
+                target.using(using), patch.removed), asynchronous)
+
+        on_commit(cleanup)
+
+        return target
+
+    @staticmethod
+    def patch_keys(target: Any, value: List[Operation]) -> List[Any]:
+        """The primary keys the operations require to exist or not."""
+
+        to_python = target.model._meta.pk.to_python
+        keys = []
+        for operation in value:
+            if is_operation(operation) and operation[1] is not None:
+                try:
+                    keys.append(to_python(operation[1]))
+                except DjangoValidationError:
+                    continue
+        return keys
+
+    @staticmethod
+    def plan_patch(target: Any, value: List[Operation], found: Set[
+            Any]) -> Patch:
+        """
+        Check the operations against the primary keys found in the target,
+        recording the errors, and split them into changes and removals.
+        """
+
+        to_python = target.model._meta.pk.to_python
+        patch = Patch()
+
+        for index, operation in enumerate(value):
+            with context(index):
+                if not is_operation(operation):
+                    error("Expected an operation, a primary key and an item.")
+                    continue
+                kind, key, item = operation
+                try:
+                    exists = key is not None and to_python(key) in found
+                except DjangoValidationError:
+                    error("Invalid primary key.")
+                    continue
+
+                if kind == 'add':
+                    if exists:
+                        error("Already exists.")
+                        continue
+                elif kind in ('update', 'remove'):
+                    if not exists:
+                        error("Does not exist.")
+                        continue
+                else:
+                    error("Unknown operation: {}.".format(kind))
+                    continue
+
+                if kind == 'remove':
+                    patch.removed.append(key)
+                else:
+                    patch.indices.append(index)
+                    patch.changes.append((key, item))
+
+        return patch
+
+    def set_stream(
+            self,
+            target: Any,
+            value: Iterable[Tuple[Any, Any]],
+            chunk_size: int = 2000,
+    ) -> Any:
+        """
+        Update the target from an iterable of primary keys and items, such as
+        a generator, without holding all of it in memory.
+
+        The items are processed in chunks, each validated and written in bulk
+        as a separate transaction, so only the primary keys are kept to
+        delete the omitted models at the end, in a final database
+        transaction. If a chunk fails validation, the earlier chunks stay
+        written and nothing is deleted. The errors are recorded under the
+        positions of the items in the whole value.
+
+        Inside a transaction, the chunks become a part of it instead, and
+        the omitted models are deleted when it commits, after the chunks are
+        written.
+        """
+
+        active = _state.active
+        kept: List[Any] = []
+
+        items = iter(value)
+        offset = 0
+        while True:
+            chunk = list(islice(items, chunk_size))
+            if not chunk:
+                break
+            existing = self.set_chunk(target, chunk, offset)
+            # Inside a transaction, the new instances only get their primary
+            # keys when it commits
+            kept.extend(existing if active else map(GET_PK, existing))
+            offset += len(chunk)
+
+        using = self.alias(target)
+
+        if active:
+            commit_in_transaction(using)
+
+            def cleanup() -> None:
+                """Remove models omitted from the value."""
+                self.delete_omitted(target.using(using), map(GET_PK, kept))
+
+            on_commit(cleanup)
+        else:
+            with db_atomic(using=using):
+                self.delete_omitted(target.using(using), kept)
+
+        return target
+
+    @atomic
+    def set_chunk(
+            self,
+            target: Any,
+            value: List[Tuple[Any, Any]],
+            offset: int = 0,
+    ) -> List[Any]:
+        """
+        Update the instances from a chunk of items and save them in bulk,
+        recording the errors under the positions of the items starting from
+        the offset.
+        """
+
+        commit_in_transaction(self.alias(target))
+        return self.set_bulk(self.writing(target), value,
+                             range(offset, offset + len(value)))
+
+    def omitted(self, target: Any, kept: Iterable[Any], keys: Iterable[
+            Any]) -> List[Any]:
+        """The primary keys of the target not among the kept ones."""
+
+        to_python = target.model._meta.pk.to_python
+        kept_keys = {to_python(key) for key in kept}
+        return [key for key in keys if key not in kept_keys]
+
+    def batches(self, keys: List[Any]) -> Iterator[List[Any]]:
+        """Split the primary keys into batches to delete or look up."""
+
+        for start in range(0, len(keys), self.delete_batch_size):
+            yield keys[start:start + self.delete_batch_size]
+
+    def delete_omitted(self, target: Any, kept: Iterable[Any]) -> None:
+        """Delete the models of the target not among the kept ones."""
+        run_calls(self.delete_omitted_calls(target, kept))
+
+    async def adelete_omitted(self, target: Any, kept: Iterable[
+            Any]) -> None:
+        """Delete the models of the target not among the kept ones."""
+        await arun_calls(self.delete_omitted_calls(target, kept))
+
+    def delete_omitted_calls(self, target: Any, kept: Iterable[
+            Any]) -> Calls[None]:
+        """The calls deleting the models not among the kept ones."""
+
+        # The primary keys of the target are streamed, not all held at once
+        yield from self.delete_keys_calls(target, (yield Function(
+            self.omitted, target, kept,
+            target.values_list('pk', flat=True).iterator(),
+        )))
+
+    def delete_keys(self, target: Any, keys: List[Any]) -> None:
+        """Delete the models of the target with the given primary keys."""
+        run_calls(self.delete_keys_calls(target, keys))
+
+    async def adelete_keys(self, target: Any, keys: List[Any]) -> None:
+        """Delete the models of the target with the given primary keys."""
+        await arun_calls(self.delete_keys_calls(target, keys))
+
+    def delete_keys_calls(self, target: Any, keys: List[Any]) -> Calls[None]:
+        """
+        The calls deleting the models with the given primary keys, directly
+        if the deletion doesn't involve signals or cascades.
+        """
+
+        if not keys:
+            return
+
+        fast = Collector(using=target.db).can_fast_delete(target)
+        for batch in self.batches(keys):
+            batch_target = target.filter(pk__in=batch)
+            if fast:
+                yield Call(batch_target, '_raw_delete', batch_target.db)
+            else:
+                yield Call(batch_target, 'delete')
+        yield Function(invalidate_on_commit, target.db, {target.model: keys})
+
+    def set_each(
+            self,
+            target: Any,
+            value: Any,
+            indices: Optional[Iterable[int]] = None,
+    ) -> List[Any]:
+        """
+        Update and save the instances one by one, recording the errors under
+        the given indices of the items (their positions by default).
+        """
+
+        return run_calls(self.set_each_calls(target, value, indices))
+
+    async def aset_each(
+            self,
+            target: Any,
+            value: Any,
+            indices: Optional[Iterable[int]] = None,
+    ) -> List[Any]:
+        """Update and save the instances one by one asynchronously."""
+
+        return await arun_calls(self.set_each_calls(target, value, indices))
+
+    def set_each_calls(
+            self,
+            target: Any,
+            value: Any,
+            indices: Optional[Iterable[int]] = None,
+    ) -> Calls[List[Any]]:
+        """The calls updating and saving the instances one by one."""
+
+        existing: List[Any] = []
+
+        if self.lock:
+            # Lock all the rows at once rather than one by one
+            yield Rows(self.lock_rows(target, value))
+
+        for index, (key, item) in zip(
+                count() if indices is None else indices, value):
+            with context(index):
+                if key is None:
+                    # Create a new model instance with no explicit PK
+                    instance = target.model()
+                else:
+                    try:
+                        # Get the existing model instance
+                        instance = yield Call(
+                            self.related(target), 'get', pk=key)
+                    except target.model.DoesNotExist:
+                        # Create a new model instance with explicit PK
+                        instance = target.model(pk=key)
+
+                instance_ = yield Call(self.model, 'set', instance, item)
+
+                # Remember the instance, not to delete it
+                existing.append(instance_)
+
+        return existing
+
+    @staticmethod
+    def lookup_keys(target: Any, value: Any) -> List[Any]:
+        """
+        The primary keys of the items converted to the type of the model's,
+        leaving out the invalid ones.
+        """
+
+        to_python = target.model._meta.pk.to_python
+        keys = []
+        for key, _ in value:
+            if key is not None:
+                try:
+                    keys.append(to_python(key))
+                except DjangoValidationError:
+                    continue
+        return keys
+
+    @staticmethod
+    def item_key(target: Any, key: Any) -> Any:
+        """The primary key of an item converted to the type of the model's."""
+
+        if key is None:
+            return None
+        try:
+            return target.model._meta.pk.to_python(key)
+        except DjangoValidationError as exc:
+            raise ValidationError("Invalid primary key.") from exc
+
+    def set_bulk(
+            self,
+            target: Any,
+            value: Any,
+            indices: Optional[Iterable[int]] = None,
+    ) -> List[Any]:
+        """
+        Update the instances and save them in bulk, recording the errors
+        under the given indices of the items (their positions by default).
+        """
+
+        return run_calls(self.set_bulk_calls(target, value, indices))
+
+    async def aset_bulk(
+            self,
+            target: Any,
+            value: Any,
+            indices: Optional[Iterable[int]] = None,
+    ) -> List[Any]:
+        """Update the instances and save them in bulk asynchronously."""
+
+        return await arun_calls(
+            self.set_bulk_calls(target, value, indices, asynchronous=True))
+
+    def set_bulk_calls(
+            self,
+            target: Any,
+            value: Any,
+            indices: Optional[Iterable[int]] = None,
+            asynchronous: bool = False,
+    ) -> Calls[List[Any]]:
+        """The calls updating the instances to save them in bulk."""
+
+        instances = yield Call(self.locked(self.related(target)), 'in_bulk',
+                               self.lookup_keys(target, value))
+
+        using = self.alias(target)
+        existing: List[Any] = []
+
+        for index, (key, item) in zip(
+                count() if indices is None else indices, value):
+            with context(index):
+                key = self.item_key(target, key)
+                if key in instances:
+                    # Update the existing model instance, or the one created
+                    # for an earlier item with the same PK
+                    instance = instances[key]
+                elif key is None:
+                    # Create a new model instance with no explicit PK
+                    instance = target.model()
+                else:
+                    # Create a new model instance with explicit PK
+                    instance = instances[key] = target.model(pk=key)
+
+                instance_, changed = yield Call(
+                    self.model, 'update', instance, item)
+                self.model.save_on_commit(
+                    instance_,
+                    changed,
+                    asynchronous=asynchronous,
+                    using=using,
+                    bulk=True,
+                    batch_size=self.batch_size,
+                )
+
+                # Remember the instance, not to delete it
+                existing.append(instance_)
+
+        return existing
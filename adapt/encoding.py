@@ -0,0 +1,171 @@
+"""
+Encode and decode JSON using the shape the lenses know.
+
+The encoder compiled from a lens tree writes the JSON text of the value the
+lens would get directly from the target, without building the intermediate
+dictionaries. The decoder reads a JSON array of primary keys and items, as
+accepted by the queryset lens, incrementally from chunks of the request
+body.
+"""
+
+import codecs
+import json
+from itertools import count
+from json.encoder import encode_basestring_ascii
+from typing import (Any, Callable, Dict, Iterable, Iterator, Optional, Tuple,
+                    Union)
+
+from .compiler import Generator, composed, inlined
+from .lens import Composed, Lens
+from .objects import Object
+
+WHITESPACE = ' \t\n\r'
+
+
+def encode_value(value: Any) -> str:
+    """Encode a value as JSON, the strings and integers directly."""
+
+    value_type = type(value)
+    if value_type is str:
+        return encode_basestring_ascii(value)
+    if value_type is int:
+        return int.__repr__(value)
+    return json.dumps(value)
+
+
+class Encoder(Generator):
+    """Generate the source of a function encoding the value of a lens."""
+
+    def encode(self, lens: Lens, source: str) -> str:
+        """Emit the code encoding the value, returning its expression."""
+
+        if composed(lens, 'get'):
+            assert isinstance(lens, Composed)
+            return self.encode(
+                lens.inner, self.variable(self.get(lens.outer, source)))
+
+        if inlined(lens, Object, 'get'):
+            assert isinstance(lens, Object)
+            source = self.variable(source)
+            expression = ''
+            separator = '{'
+            for attribute, attribute_lens in lens.attributes.items():
+                value = self.variable(self.encode(attribute_lens, source))
+                expression += '{!r} + {} + '.format(
+                    separator + json.dumps(attribute) + ': ', value)
+                separator = ', '
+            return expression + "'}'" if expression else "'{}'"
+
+        return '{}({})'.format(
+            self.constant(encode_value), self.get(lens, source))
+
+
+def compile_encoder(lens: Lens) -> Callable[[Any], str]:
+    """
+    Compile a function returning the JSON text of the value the lens gets
+    from the target, the same as json.dumps of the value.
+    """
+
+    namespace: Dict[str, Any] = {}
+    encoder = Encoder(namespace)
+    source = encoder.function('encode', 'target',
+                              encoder.encode(lens, 'target'))
+    exec(source, namespace)  # pylint:disable=exec-used
+    encode: Callable[[Any], str] = namespace['encode']
+    return encode
+
+
+def decode_items(chunks: Iterable[Union[str, bytes]]) -> Iterator[
+        Tuple[Any, Any]]:
+    """
+    Decode a JSON array of primary keys and items, given as arrays of two
+    elements, yielding the pairs as soon as each one is read.
+
+    The chunks can be text or UTF-8 bytes, split anywhere. An element that
+    is not a pair, or anything but whitespace after the array, raises
+    ValueError.
+    """
+
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder('utf-8')()
+    chunks = iter(chunks)
+    buffer = ''
+    position = 0
+
+    def read() -> bool:
+        """Add the next chunk to the buffer, returning whether there was one."""
+
+        nonlocal buffer, position
+        try:
+            chunk = next(chunks)
+        except StopIteration:
+            buffer = buffer[position:] + text_decoder.decode(b'', final=True)
+            position = 0
+            return False
+        if isinstance(chunk, bytes):
+            chunk = text_decoder.decode(chunk)
+        buffer = buffer[position:] + chunk
+        position = 0
+        return True
+
+    def skip() -> Optional[str]:
+        """
+        Skip the whitespace, returning the next character, or None at the
+        end of the input.
+        """
+
+        nonlocal position
+        while True:
+            while position < len(buffer) and buffer[position] in WHITESPACE:
+                position += 1
+            if position < len(buffer):
+                return buffer[position]
+            if not read():
+                return None
+
+    def expect() -> str:
+        """Skip the whitespace, returning the next character."""
+
+        character = skip()
+        if character is None:
+            raise ValueError("Unexpected end of JSON input.")
+        return character
+
+    if expect() != '[':
+        raise ValueError("Expected a JSON array.")
+    position += 1
+
+    for index in count():
+        character = expect()
+        if character == ']':
+            break
+        if index:
+            if character != ',':
+                raise ValueError("Expected ',' or ']'.")
+            position += 1
+            expect()
+
+        while True:
+            try:
+                element, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if read():
+                    continue
+                raise
+            # A number at the end of the buffer might continue in the next
+            # chunk
+            if end == len(buffer) and read():
+                continue
+            break
+        position = end
+
+        if type(element) is not list or len(element) != 2:
+            raise ValueError(
+                "Expected a primary key and an item at index {}.".format(
+                    index))
+        key, item = element
+        yield key, item
+
+    position += 1
+    if skip() is not None:
+        raise ValueError("Unexpected data after the JSON array.")
@@ -1,9 +1,14 @@
 """Error classes."""
 
-from typing import Dict, List, Union
+import json
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Union
 
 ContextStep = Union[int, str]
 
+Path = Tuple[ContextStep, ...]
+
+Record = Tuple[Path, str]
+
 
 class ValidationError(Exception):
     """An error that occured during validation."""
@@ -12,23 +17,108 @@ class ValidationError(Exception):
 
 
 class Errors:
-    """A collection of errors, each associated with a context."""
+    """
+    A collection of errors, each associated with a context.
+
+    The errors are stored as a flat list of records of the context path and
+    the message, with the equal paths shared. The nested view (errors at
+    this level, and nested collections by context step) is only built when
+    requested.
+
+    The truncated flag is set when the validation stopped at an error limit,
+    so that more errors might have been found otherwise.
+    """
+
+    __slots__ = ('records', 'depth', 'truncated', '_paths', '_nested')
 
     def __init__(self) -> None:
-        self.errors: List[str] = []
-        self.nested: Dict[ContextStep, 'Errors'] = {}
+        self.records: List[Record] = []
+        self.depth = 0
+        self.truncated = False
+        self._paths: Dict[Path, Path] = {}
+        self._nested: Optional[Dict[ContextStep, 'Errors']] = None
 
-    def add(self, context: List[ContextStep], message: str) -> None:
+    def add(self, context: Sequence[ContextStep], message: str) -> None:
         """Record an error with the given context."""
 
-        if context == []:
-            self.errors.append(message)
-        else:
-            self.nested.setdefault(context[0], Errors()).\
-                add(context[1:], message)
+        path = tuple(context)
+        path = self._paths.setdefault(path, path)
+        self.records.append((path, message))
+        self._nested = None
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    @property
+    def errors(self) -> List[str]:
+        """The errors recorded at this level."""
+
+        depth = self.depth
+        return [
+            message
+            for path, message in self.records
+            if len(path) == depth
+        ]
+
+    @property
+    def nested(self) -> Dict[ContextStep, 'Errors']:
+        """The errors recorded under each context step."""
+
+        if self._nested is None:
+            self._nested = {}
+            for step, records in group(self.records, self.depth).items():
+                nested = Errors()
+                nested.records = records
+                nested.depth = self.depth + 1
+                self._nested[step] = nested
+        return self._nested
+
+    def json(self) -> Iterator[str]:
+        """
+        Serialize the nested view to JSON incrementally, as an object with
+        the "errors" at this level and the "nested" objects by context step.
+        """
+
+        return records_json(self.records, self.depth)
 
     def __repr__(self) -> str:
         return '<Errors: {errors}, {nested}>'.format(
             errors=', '.join(map(repr, self.errors)),
             nested=repr(self.nested),
         )
+
+
+def group(records: List[Record], depth: int) -> Dict[
+        ContextStep, List[Record]]:
+    """Group the records deeper than the given depth by the next step."""
+
+    groups: Dict[ContextStep, List[Record]] = {}
+    for record in records:
+        path = record[0]
+        if len(path) > depth:
+            groups.setdefault(path[depth], []).append(record)
+    return groups
+
+
+def records_json(records: List[Record], depth: int) -> Iterator[str]:
+    """Serialize the records at the given depth to JSON incrementally."""
+
+    yield '{"errors": ['
+    first = True
+    for path, message in records:
+        if len(path) == depth:
+            if not first:
+                yield ', '
+            yield json.dumps(message)
+            first = False
+
+    yield '], "nested": {'
+    first = True
+    for step, nested in group(records, depth).items():
+        if not first:
+            yield ', '
+        yield json.dumps(str(step))
+        yield ': '
+        yield from records_json(nested, depth + 1)
+        first = False
+    yield '}}'
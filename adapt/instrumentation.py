@@ -0,0 +1,235 @@
+"""
+Measure the time taken by the lenses and the transactions.
+
+The measurements are sent as events to the sinks added with add_sink or
+instrument. Without any sinks, nothing is measured: an instrumented lens
+only checks whether there are sinks before calling the lens it wraps, and
+the transactions check a single attribute.
+
+Each event has the kind of the operation ("get", "set", "transaction" for
+running the action, "commit" for the commit phase and "hook" for each
+commit hook), its name, the context path where it happened, its duration
+and the counts of the counters added with add_counter, such as the number
+of database queries.
+
+The path of a set is the context of the transaction recording the
+validation errors. Reads have no transaction context, so while there are
+sinks, the object and queryset lenses track the attributes and the
+indices they read under separately.
+"""
+
+import logging
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar, Token
+from time import perf_counter
+from typing import (Any, Callable, ContextManager, Dict, Iterator, List,
+                    Optional, TypeVar)
+
+from .errors import ContextStep, Path
+from .lens import Lens
+from .transaction import _state
+
+# Count the occurrences of something while the context is active, yielding
+# the function returning the current count
+Counter = Callable[[], ContextManager[Callable[[], int]]]
+
+
+class Event:
+    """A measured operation."""
+
+    __slots__ = ('kind', 'name', 'path', 'duration', 'counts', 'error')
+
+    def __init__(
+            self,
+            kind: str,
+            name: str,
+            path: Path,
+            duration: float,
+            counts: Dict[str, int],
+            error: Optional[BaseException],
+    ) -> None:
+        self.kind = kind
+        self.name = name
+        self.path = path
+        self.duration = duration
+        self.counts = counts
+        self.error = error
+
+    def __repr__(self) -> str:
+        return '<Event: {kind} {name} at {path}: {duration:.6f}s {counts}>' \
+            .format(
+                kind=self.kind,
+                name=self.name,
+                path='/'.join(map(str, self.path)),
+                duration=self.duration,
+                counts=self.counts,
+            )
+
+
+Sink = Callable[[Event], None]
+
+S = TypeVar('S', bound=Sink)
+
+_sinks: List[Sink] = []
+
+_counters: Dict[str, Counter] = {}
+
+_read_path: ContextVar[Path] = ContextVar('read_path', default=())
+
+
+def add_sink(sink: Sink) -> None:
+    """Start sending the events to the sink."""
+
+    _sinks.append(sink)
+    _state.span = span
+
+
+def remove_sink(sink: Sink) -> None:
+    """Stop sending the events to the sink."""
+
+    _sinks.remove(sink)
+    if not _sinks:
+        _state.span = None
+
+
+@contextmanager
+def instrument(sink: S) -> Iterator[S]:
+    """Send the events to the sink while the context is active."""
+
+    add_sink(sink)
+    try:
+        yield sink
+    finally:
+        remove_sink(sink)
+
+
+def add_counter(name: str, counter: Counter) -> None:
+    """Report the count of the counter in the events under the name."""
+
+    _counters[name] = counter
+
+
+def emit(event: Event) -> None:
+    """Send the event to all the sinks."""
+
+    for sink in list(_sinks):
+        sink(event)
+
+
+class Reading:
+    """Context manager adding a step to the path of the reads inside it."""
+
+    __slots__ = ('step', 'token')
+
+    def __init__(self, step: ContextStep) -> None:
+        self.step = step
+        self.token: Optional[Token[Path]] = None
+
+    def __enter__(self) -> None:
+        self.token = _read_path.set(_read_path.get() + (self.step,))
+
+    def __exit__(self, exc_type: Any, exc: Any, traceback: Any) -> None:
+        assert self.token is not None
+        _read_path.reset(self.token)
+
+
+def reading(step: ContextStep) -> Reading:
+    """Report the reads inside the context under the given step."""
+
+    return Reading(step)
+
+
+@contextmanager
+def span(kind: str, name: str, path: Path) -> Iterator[None]:
+    """Measure the operation inside the context, emitting the event."""
+
+    with ExitStack() as stack:
+        counts = {
+            counter_name: stack.enter_context(counter())
+            for counter_name, counter in _counters.items()
+        }
+        error: Optional[BaseException] = None
+        start = perf_counter()
+        try:
+            yield
+        except BaseException as exc:
+            error = exc
+            raise
+        finally:
+            emit(Event(
+                kind,
+                name,
+                path,
+                perf_counter() - start,
+                {counter_name: count() for counter_name, count in
+                 counts.items()},
+                error,
+            ))
+
+
+class Collector:
+    """A sink keeping the events in memory."""
+
+    def __init__(self) -> None:
+        self.events: List[Event] = []
+
+    def __call__(self, event: Event) -> None:
+        self.events.append(event)
+
+
+class LoggingSink:
+    """A sink logging the events."""
+
+    def __init__(
+            self,
+            logger: logging.Logger,
+            level: int = logging.DEBUG,
+    ) -> None:
+        self.logger = logger
+        self.level = level
+
+    def __call__(self, event: Event) -> None:
+        self.logger.log(
+            self.level,
+            "%s %s at %s: %.6fs %s",
+            event.kind,
+            event.name,
+            '/'.join(map(str, event.path)),
+            event.duration,
+            event.counts,
+        )
+
+
+class Instrumented(Lens):
+    """
+    Measure the time taken by another lens, reporting it under the given
+    name (the lens class name by default) and the context path.
+    """
+
+    def __init__(self, lens: Lens, name: Optional[str] = None) -> None:
+        self.lens = lens
+        self.name = name or type(lens).__name__
+
+    def get(self, target: Any) -> Any:
+        if not _sinks:
+            return self.lens.get(target)
+        with span('get', self.name, _read_path.get()):
+            return self.lens.get(target)
+
+    def set(self, target: Any, value: Any) -> Any:
+        if not _sinks:
+            return self.lens.set(target, value)
+        with span('set', self.name, _state.path):
+            return self.lens.set(target, value)
+
+    async def aget(self, target: Any) -> Any:
+        if not _sinks:
+            return await self.lens.aget(target)
+        with span('get', self.name, _read_path.get()):
+            return await self.lens.aget(target)
+
+    async def aset(self, target: Any, value: Any) -> Any:
+        if not _sinks:
+            return await self.lens.aset(target, value)
+        with span('set', self.name, _state.path):
+            return await self.lens.aset(target, value)
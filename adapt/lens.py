@@ -1,7 +1,12 @@
 """Base lens definitions."""
 
 from abc import ABCMeta, abstractmethod
-from typing import Any
+from typing import Any, Awaitable, Callable, Tuple
+
+# Update a value given an argument, such as the set method of a lens
+Modifier = Callable[[Any, Any], Any]
+
+AsyncModifier = Callable[[Any, Any], Awaitable[Any]]
 
 
 class Lens(metaclass=ABCMeta):
@@ -17,14 +22,61 @@ class Lens(metaclass=ABCMeta):
         """Update the value in the object."""
         pass
 
+    def modify(self, target: Any, function: Modifier, argument: Any) -> Any:
+        """
+        Replace the value in the object with the result of the function
+        called with the value and the argument.
+
+        Lenses able to get and set the value in one pass, such as Attribute,
+        override this. A subclass of Attribute overriding get or set without
+        overriding modify gets this implementation back, calling them.
+        """
+        return self.set(target, function(self.get(target), argument))
+
+    def over(self, target: Any, function: Callable[[Any], Any]) -> Any:
+        """Replace the value in the object with the function of it."""
+        return self.modify(target, apply, function)
+
+    async def aget(self, target: Any) -> Any:
+        """Get the value from an object asynchronously."""
+        return self.get(target)
+
+    async def aset(self, target: Any, value: Any) -> Any:
+        """Update the value in the object asynchronously."""
+        return self.set(target, value)
+
+    async def amodify(
+            self,
+            target: Any,
+            function: AsyncModifier,
+            argument: Any,
+    ) -> Any:
+        """
+        Replace the value in the object with the result of the coroutine
+        function called with the value and the argument.
+        """
+        value = await function(await self.aget(target), argument)
+        return await self.aset(target, value)
+
     def __mul__(self, inner: 'Lens') -> 'Lens':
         """Compose lenses."""
 
         return Composed(self, inner)
 
 
+def apply(value: Any, function: Callable[[Any], Any]) -> Any:
+    """Call the function with the value."""
+
+    return function(value)
+
+
 class Composed(Lens):
-    """A composition of two lenses."""
+    """
+    A composition of two lenses.
+
+    Setting the value modifies the outer lens target with the inner lens, so
+    the outer lens can do it in one pass.
+    """
 
     def __init__(self, outer: Lens, inner: Lens) -> None:
         self.outer = outer
@@ -34,6 +86,43 @@ class Composed(Lens):
         return self.inner.get(self.outer.get(target))
 
     def set(self, target: Any, value: Any) -> Any:
-        inner_target = self.outer.get(target)
-        inner_target_ = self.inner.set(inner_target, value)
-        return self.outer.set(target, inner_target_)
+        return self.outer.modify(target, self.inner.set, value)
+
+    def modify(self, target: Any, function: Modifier, argument: Any) -> Any:
+        return self.outer.modify(
+            target, self.modify_inner, (function, argument))
+
+    def modify_inner(
+            self,
+            inner_target: Any,
+            function_argument: Tuple[Modifier, Any],
+    ) -> Any:
+        """Modify the inner lens target."""
+
+        function, argument = function_argument
+        return self.inner.modify(inner_target, function, argument)
+
+    async def aget(self, target: Any) -> Any:
+        return await self.inner.aget(await self.outer.aget(target))
+
+    async def aset(self, target: Any, value: Any) -> Any:
+        return await self.outer.amodify(target, self.inner.aset, value)
+
+    async def amodify(
+            self,
+            target: Any,
+            function: AsyncModifier,
+            argument: Any,
+    ) -> Any:
+        return await self.outer.amodify(
+            target, self.amodify_inner, (function, argument))
+
+    async def amodify_inner(
+            self,
+            inner_target: Any,
+            function_argument: Tuple[AsyncModifier, Any],
+    ) -> Any:
+        """Modify the inner lens target asynchronously."""
+
+        function, argument = function_argument
+        return await self.inner.amodify(inner_target, function, argument)
@@ -1,8 +1,10 @@
 """Lenses for objects."""
 
-from typing import Any, Dict
+from typing import Any, Dict, Iterable, Tuple
 
-from .lens import Lens
+from .instrumentation import _sinks, reading
+from .lens import Composed, Lens, Modifier
+from .transaction import _state, context
 
 
 class Attribute(Lens):
@@ -11,6 +13,15 @@ class Attribute(Lens):
     def __init__(self, attribute: str) -> None:
         self.attribute = attribute
 
+    def __init_subclass__(cls, **kwargs: Any) -> None:
+        super().__init_subclass__(**kwargs)
+        # Modifying the attribute directly would skip an overridden get or
+        # set, so fall back to calling them unless modify is overridden too
+        if cls.modify is Attribute.modify and (
+                cls.get is not Attribute.get or
+                cls.set is not Attribute.set):
+            cls.modify = Lens.modify  # type: ignore
+
     def get(self, target: Any) -> Any:
         return getattr(target, self.attribute)
 
@@ -18,28 +29,132 @@ class Attribute(Lens):
         setattr(target, self.attribute, value)
         return target
 
+    def modify(self, target: Any, function: Modifier, argument: Any) -> Any:
+        attribute = self.attribute
+        setattr(target, attribute, function(getattr(target, attribute),
+                                            argument))
+        return target
+
+    def __mul__(self, inner: Lens) -> Lens:
+        """
+        Compose lenses, accessing the attribute directly unless a subclass
+        overrides getting or setting it.
+        """
+
+        if all(
+                getattr(type(self), method) is getattr(Attribute, method)
+                for method in ('get', 'set', 'modify')
+        ):
+            return ComposedAttribute(self, inner)
+        return super().__mul__(inner)
+
+
+class ComposedAttribute(Composed):
+    """
+    A composition of an attribute lens with another lens, getting and
+    setting the attribute in one pass without calling the attribute lens.
+    """
+
+    outer: Attribute
+
+    def get(self, target: Any) -> Any:
+        return self.inner.get(getattr(target, self.outer.attribute))
+
+    def set(self, target: Any, value: Any) -> Any:
+        attribute = self.outer.attribute
+        setattr(target, attribute,
+                self.inner.set(getattr(target, attribute), value))
+        return target
+
+    def modify(self, target: Any, function: Modifier, argument: Any) -> Any:
+        attribute = self.outer.attribute
+        setattr(target, attribute, self.inner.modify(
+            getattr(target, attribute), function, argument))
+        return target
+
 
 class Object(Lens):
-    """Lens converting object's attributes to a dictionary."""
+    """
+    Lens converting object's attributes to a dictionary.
+
+    Inside a transaction, validation errors are recorded under the attribute
+    names.
+
+    In partial mode, only the attributes present in the dictionary are set,
+    leaving the others unchanged.
+    """
 
     pointer = Attribute
 
-    def __init__(self, attributes: Dict[str, Lens]) -> None:
+    def __init__(
+            self,
+            attributes: Dict[str, Lens],
+            partial: bool = False,
+    ) -> None:
         self.attributes = {
             attribute: self.pointer(attribute) * lens
             for attribute, lens in attributes.items()
         }
+        self.partial = partial
 
     def get(self, target: Any) -> Any:
-        return {
-            attribute: lens.get(target)
-            for attribute, lens in self.attributes.items()
-        }
+        # While measuring, the reads are reported under the attribute names
+        if not _sinks:
+            return {
+                attribute: lens.get(target)
+                for attribute, lens in self.attributes.items()
+            }
+        result = {}
+        for attribute, lens in self.attributes.items():
+            with reading(attribute):
+                result[attribute] = lens.get(target)
+        return result
+
+    def supplied(self, value: Any) -> Iterable[Tuple[str, Lens]]:
+        """The attributes to set from the value, with their lenses."""
 
-    def set(self, target: Any, value: Any) -> Any:
         if type(value) is not dict:
             raise TypeError("Expected a dictionary.")
-        for attribute, lens in self.attributes.items():
-            target = lens.set(target, value[attribute])
+        if self.partial:
+            return [
+                (attribute, lens)
+                for attribute, lens in self.attributes.items()
+                if attribute in value
+            ]
+        return self.attributes.items()
+
+    def set(self, target: Any, value: Any) -> Any:
+        supplied = self.supplied(value)
+        if not _state.active:
+            # Outside of a transaction, the errors are raised without a
+            # context to record them under
+            for attribute, lens in supplied:
+                target = lens.set(target, value[attribute])
+            return target
+        for attribute, lens in supplied:
+            with context(attribute):
+                target = lens.set(target, value[attribute])
         return target
 
+    async def aget(self, target: Any) -> Any:
+        if not _sinks:
+            return {
+                attribute: await lens.aget(target)
+                for attribute, lens in self.attributes.items()
+            }
+        result = {}
+        for attribute, lens in self.attributes.items():
+            with reading(attribute):
+                result[attribute] = await lens.aget(target)
+        return result
+
+    async def aset(self, target: Any, value: Any) -> Any:
+        supplied = self.supplied(value)
+        if not _state.active:
+            for attribute, lens in supplied:
+                target = await lens.aset(target, value[attribute])
+            return target
+        for attribute, lens in supplied:
+            with context(attribute):
+                target = await lens.aset(target, value[attribute])
+        return target
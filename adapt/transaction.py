@@ -2,18 +2,30 @@
 Compose adapters propagating validation errors and deferring commit actions.
 """
 
-from contextlib import contextmanager
-from functools import wraps
-from typing import Any, Callable, List, Optional
+from contextlib import AsyncExitStack, ExitStack, nullcontext
+from contextvars import ContextVar
+from functools import partial, wraps
+from inspect import isawaitable, iscoroutinefunction
+from typing import (Any, AsyncContextManager, Awaitable, Callable,
+                    ContextManager, Dict, Hashable, List, Optional, TypeVar,
+                    Union, cast, overload)
 
-from .errors import ContextStep, Errors, ValidationError
+from .errors import ContextStep, Errors, Path, ValidationError
 
-Hook = Callable[[], None]
+Hook = Callable[[], Union[None, Awaitable[None]]]
 
 AnyFunc = Callable[..., Any]
 
 AnyAction = Callable[..., None]
 
+CommitContext = Callable[
+    [], Union[ContextManager[Any], AsyncContextManager[Any]]]
+
+# Measure an operation, given its kind, name and context path
+Span = Callable[[str, str, Path], ContextManager[None]]
+
+T = TypeVar('T')
+
 
 class TransactionError(Exception):
     """An error raised when a transaction operation cannot be performed."""
@@ -21,31 +33,166 @@ class TransactionError(Exception):
     pass
 
 
+class ErrorLimitReached(Exception):
+    """
+    Raised when a transaction records as many validation errors as it is
+    allowed to, to stop the action.
+    """
+
+    pass
+
+
+class Transaction:
+    """State of a single running transaction."""
+
+    __slots__ = ('hooks', 'commit_contexts', 'resources', 'context_steps',
+                 'errors', 'max_errors')
+
+    def __init__(self, max_errors: Optional[int] = None) -> None:
+        self.hooks: List[Hook] = []
+        self.commit_contexts: Dict[Hashable, CommitContext] = {}
+        self.resources: Dict[Hashable, Any] = {}
+        self.context_steps: List[ContextStep] = []
+        self.errors: Optional[Errors] = None
+        self.max_errors = max_errors
+
+
 class TransactionState:
-    """Global transaction state for adapters."""
+    """
+    Transaction state for adapters.
+
+    The running transaction is stored in a context variable, so each thread
+    and each asyncio task has its own.
 
-    active: bool = False
-    hooks: List[Hook] = []
-    context_steps: List[ContextStep] = []
-    errors: Optional[Errors] = None
+    By default, all the validation errors are collected before they are
+    raised. With max_errors set, the transactions stop once they have
+    recorded that many errors; see atomic.
+
+    If span is set, the transactions, their commit phase and each commit hook
+    are measured with it.
+    """
+
+    def __init__(self, max_errors: Optional[int] = None) -> None:
+        self._current: ContextVar[Optional[Transaction]] = \
+            ContextVar('transaction', default=None)
+        self.max_errors = max_errors
+        self.span: Optional[Span] = None
+
+    @property
+    def active(self) -> bool:
+        """Whether a transaction is running in the current context."""
+
+        return self._current.get() is not None
+
+    @property
+    def path(self) -> Path:
+        """The context steps of the running transaction."""
+
+        transaction = self._current.get()
+        if transaction is None:
+            return ()
+        return tuple(transaction.context_steps)
+
+    def _span(self, kind: str, action: Any) -> ContextManager[None]:
+        """Measure a part of the transaction, if enabled."""
+
+        span = self.span
+        if span is None:
+            return nullcontext()
+        return span(kind, getattr(action, '__qualname__', repr(action)), ())
 
     def on_commit(self, hook: Hook) -> None:
         """
         Execute the given function as soon as the transaction is committed.
         """
 
-        if not self.active:
+        transaction = self._current.get()
+
+        if transaction is None:
             raise TransactionError(
                 "on_commit hooks cannot be added outside of a transaction."
             )
 
-        self.hooks.append(hook)
+        transaction.hooks.append(hook)
+
+    def commit_context(self, key: Hashable, factory: CommitContext) -> None:
+        """
+        Run the commit hooks of the transaction inside the context manager
+        made by the factory, such as a database transaction. Only the first
+        factory registered with each key is used.
 
+        Asynchronous transactions accept asynchronous context managers too.
+        """
+
+        transaction = self._current.get()
+
+        if transaction is None:
+            raise TransactionError(
+                "Commit contexts cannot be added outside of a transaction."
+            )
+
+        transaction.commit_contexts.setdefault(key, factory)
+
+    def resource(self, key: Hashable, factory: Callable[[], T]) -> T:
+        """
+        Get the object kept by the transaction under the given key, creating
+        it with the factory when it is first requested.
+        """
+
+        transaction = self._current.get()
+
+        if transaction is None:
+            raise TransactionError(
+                "Resources cannot be used outside of a transaction."
+            )
+
+        try:
+            return cast(T, transaction.resources[key])
+        except KeyError:
+            result = transaction.resources[key] = factory()
+            return result
+
+    @overload
     def atomic(self, action: AnyFunc) -> AnyFunc:
+        pass
+
+    @overload
+    def atomic(
+            self,
+            *,
+            max_errors: Optional[int] = None,
+    ) -> Callable[[AnyFunc], AnyFunc]:
+        pass
+
+    def atomic(
+            self,
+            action: Optional[AnyFunc] = None,
+            *,
+            max_errors: Optional[int] = None,
+    ) -> Any:
         """
         Decorate the given action to execute as a transaction.
+
+        Coroutine functions are decorated to execute as a transaction in the
+        current task; their commit hooks can be coroutine functions too.
+
+        Called with max_errors only, return a decorator for transactions
+        stopping once they have recorded that many validation errors
+        (max_errors=1 stops at the first one), instead of the default limit
+        the state has when each transaction starts. When the limit is
+        reached, the rest of the action is skipped: no lens runs after the
+        one recording the last error, and no commit hooks are run. The errors
+        recorded so far are raised as usual, with the truncated flag set. The
+        limit of a nested atomic call is ignored, as the action is a part of
+        the running transaction.
         """
 
+        if action is None:
+            return partial(self.atomic, max_errors=max_errors)
+
+        if iscoroutinefunction(action):
+            return self._atomic_async(action, max_errors)
+
         @wraps(action)
         def wrapped(*args: Any, **kwargs: Any) -> Any:
             """Execute the action as a transaction."""
@@ -54,69 +201,190 @@ class TransactionState:
                 # Already in a transaction.
                 return action(*args, **kwargs)
 
-            assert self.hooks == [], \
-                "Must not have leftover hooks when entering a transaction."
+            transaction = self._transaction(max_errors)
 
+            # Any exception (other than validation error) leaves the
+            # transaction, discarding the hooks
+            token = self._current.set(transaction)
             try:
-                self.active = True
-                result = action(*args, **kwargs)
+                with self._span('transaction', action):
+                    result = action(*args, **kwargs)
+            except ErrorLimitReached:
+                result = None
+            finally:
+                self._current.reset(token)
+
+            self._raise_errors(transaction)
 
-            except:
-                # Error (other than validation error) occured, leave the
-                # transaction and reset hooks
-                self.hooks = []
-                raise
+            # No error, run hooks
+            with self._span('commit', action), ExitStack() as stack:
+                for factory in transaction.commit_contexts.values():
+                    manager = factory()
+                    if not isinstance(manager, ContextManager):
+                        raise TransactionError(
+                            "Asynchronous commit contexts can only be used "
+                            "in asynchronous transactions."
+                        )
+                    stack.enter_context(manager)
+
+                for hook in transaction.hooks:
+                    with self._span('hook', hook):
+                        outcome = hook()
+                    if isawaitable(outcome):
+                        raise TransactionError(
+                            "Asynchronous on_commit hooks can only be used in "
+                            "asynchronous transactions."
+                        )
+
+            return result
+
+        return wrapped
+
+    def _atomic_async(
+            self,
+            action: AnyFunc,
+            max_errors: Optional[int],
+    ) -> AnyFunc:
+        """Decorate the given coroutine function to execute as a transaction."""
+
+        @wraps(action)
+        async def wrapped(*args: Any, **kwargs: Any) -> Any:
+            """Execute the action as a transaction."""
+
+            if self.active:
+                # Already in a transaction.
+                return await action(*args, **kwargs)
 
+            transaction = self._transaction(max_errors)
+
+            token = self._current.set(transaction)
+            try:
+                with self._span('transaction', action):
+                    result = await action(*args, **kwargs)
+            except ErrorLimitReached:
+                result = None
             finally:
-                self.active = False
+                self._current.reset(token)
 
-            if self.errors is not None:
-                self.hooks = []
-                errors = self.errors
-                self.errors = None
-                raise ValidationError(errors)
+            self._raise_errors(transaction)
 
-            # No error, run hooks
-            for hook in self.hooks:
-                hook()
-            self.hooks = []
+            with self._span('commit', action):
+                await self._commit_async(transaction)
 
             return result
 
         return wrapped
 
+    def _transaction(self, max_errors: Optional[int]) -> Transaction:
+        """
+        Start a transaction with the given error limit, or the current
+        default limit of the state.
+        """
+
+        return Transaction(
+            max_errors if max_errors is not None else self.max_errors)
+
+    async def _commit_async(self, transaction: Transaction) -> None:
+        """Run the commit hooks of an asynchronous transaction."""
+
+        async with AsyncExitStack() as stack:
+            for factory in transaction.commit_contexts.values():
+                manager = factory()
+                if isinstance(manager, AsyncContextManager):
+                    await stack.enter_async_context(manager)
+                else:
+                    stack.enter_context(manager)
+
+            for hook in transaction.hooks:
+                with self._span('hook', hook):
+                    outcome = hook()
+                    if isawaitable(outcome):
+                        await outcome
+
+    @staticmethod
+    def _raise_errors(transaction: Transaction) -> None:
+        """Raise the validation errors gathered by the transaction, if any."""
+
+        if transaction.errors is not None:
+            raise ValidationError(transaction.errors)
+
+    def error(self, message: str) -> None:
+        """
+        Record a validation error under the current context, to be raised
+        when the transaction ends. Outside of a transaction, the error is
+        raised immediately.
+
+        If the transaction reaches its error limit, ErrorLimitReached is
+        raised to stop the action.
+        """
+
+        transaction = self._current.get()
+
+        if transaction is None:
+            raise ValidationError(message)
+
+        if transaction.errors is None:
+            transaction.errors = Errors()
+
+        transaction.errors.add(transaction.context_steps, message)
+
+        if transaction.max_errors is not None and \
+                len(transaction.errors) >= transaction.max_errors:
+            transaction.errors.truncated = True
+            raise ErrorLimitReached()
+
     def _add_error(self, error: ValidationError) -> None:
         """Preserve a validation error until the end of the transaction."""
 
-        if self.errors is None:
-            self.errors = Errors()
-
-        message = error.args[0]
-        self.errors.add(self.context_steps, message)
+        self.error(error.args[0])
 
-    @contextmanager
-    def context(self, step: Optional[ContextStep] = None) -> Any:
+    def context(self, step: Optional[ContextStep] = None) -> 'Context':
         """
         Preserve the validation errors until the transaction ends, recording
         them under the given context.
         """
 
-        if not self.active:
-            yield
-            return
+        return Context(self, step)
 
-        if step is not None:
-            self.context_steps.append(step)
 
-        try:
-            yield
+class Context:
+    """
+    Context manager recording the validation errors raised inside it under
+    a context step.
+    """
+
+    __slots__ = ('state', 'step', 'transaction')
+
+    def __init__(
+            self,
+            state: TransactionState,
+            step: Optional[ContextStep],
+    ) -> None:
+        self.state = state
+        self.step = step
+        self.transaction: Optional[Transaction] = None
+
+    def __enter__(self) -> None:
+        transaction = self.transaction = self.state._current.get()
+
+        if transaction is not None and self.step is not None:
+            transaction.context_steps.append(self.step)
+
+    def __exit__(self, exc_type: Any, exc: Any, traceback: Any) -> bool:
+        transaction = self.transaction
 
-        except ValidationError as error:
-            self._add_error(error)
+        if transaction is None:
+            return False
+
+        try:
+            if isinstance(exc, ValidationError):
+                self.state._add_error(exc)
+                return True
+            return False
 
         finally:
-            if step is not None:
-                self.context_steps.pop()
+            if self.step is not None:
+                transaction.context_steps.pop()
 
 
 _state = TransactionState()
@@ -125,4 +393,10 @@ atomic = _state.atomic
 
 context = _state.context
 
+error = _state.error
+
 on_commit = _state.on_commit
+
+commit_context = _state.commit_context
+
+resource = _state.resource
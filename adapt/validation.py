@@ -0,0 +1,43 @@
+"""Lenses validating the values."""
+
+from typing import Any, Callable, Optional
+
+from .lens import Lens
+from .transaction import error
+
+Check = Callable[[Any], Optional[str]]
+
+
+class Validate(Lens):
+    """
+    Only accept the values passing a check.
+
+    The check returns the error message for an invalid value, or None. The
+    error is recorded in the transaction directly instead of being raised,
+    and the target is left unchanged. Outside of a transaction, a
+    ValidationError is raised.
+    """
+
+    def __init__(self, check: Check, lens: Lens) -> None:
+        self.check = check
+        self.lens = lens
+
+    def get(self, target: Any) -> Any:
+        return self.lens.get(target)
+
+    def set(self, target: Any, value: Any) -> Any:
+        message = self.check(value)
+        if message is not None:
+            error(message)
+            return target
+        return self.lens.set(target, value)
+
+    async def aget(self, target: Any) -> Any:
+        return await self.lens.aget(target)
+
+    async def aset(self, target: Any, value: Any) -> Any:
+        message = self.check(value)
+        if message is not None:
+            error(message)
+            return target
+        return await self.lens.aset(target, value)
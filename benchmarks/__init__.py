@@ -0,0 +1,16 @@
+"""Benchmarks for the adapters."""
+
+import os
+
+import django  # type: ignore
+from django.core.management import call_command  # type: ignore
+
+
+def setup_django() -> None:
+    """Set up the sample Django app with an empty database."""
+
+    os.environ['DJANGO_SETTINGS_MODULE'] = 'tests.sample_app.settings'
+    django.setup()
+
+    call_command('migrate', run_syncdb=True, interactive=False, verbosity=0)
+    call_command('flush', interactive=False, verbosity=0)
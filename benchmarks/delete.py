@@ -0,0 +1,70 @@
+"""
+Benchmark deleting the rows omitted from a queryset update on SQLite.
+
+Run with: python -m benchmarks.delete [ROWS...]
+"""
+
+import sys
+import time
+from typing import Callable, List
+
+from benchmarks import setup_django
+
+
+def measure(rows: int, delete: Callable[[List[int]], None]) -> str:
+    """Time deleting half of the addresses, keeping the other half."""
+
+    from tests.sample_app.models import Address
+
+    Address.objects.all()._raw_delete('default')
+    Address.objects.bulk_create(
+        (Address(pk=pk, street="Street", number=pk)
+         for pk in range(1, rows + 1)),
+        batch_size=10000,
+    )
+    kept = list(range(1, rows + 1, 2))
+
+    start = time.perf_counter()
+    try:
+        delete(kept)
+    except Exception as error:  # pylint:disable=broad-except
+        return "failed: {}".format(error)
+    elapsed = time.perf_counter() - start
+
+    assert Address.objects.count() == len(kept)
+    return "{:.3f}s".format(elapsed)
+
+
+def main() -> None:
+    """Compare deleting with a NOT IN list and deleting in batches."""
+
+    setup_django()
+
+    from adapt.django import Model, QuerySet
+    from adapt.primitives import integer, string
+    from tests.sample_app.models import Address
+
+    address_qs = QuerySet(Model({
+        'street': string,
+        'number': integer,
+    }))
+
+    def exclude(kept: List[int]) -> None:
+        """Delete the rows with a single NOT IN query."""
+        Address.objects.exclude(pk__in=kept).delete()
+
+    def batches(kept: List[int]) -> None:
+        """Delete the rows with the queryset lens."""
+        address_qs.delete_omitted(Address.objects.all(), kept)
+
+    for rows in map(int, sys.argv[1:]) if len(sys.argv) > 1 \
+            else (100000, 1000000):
+        print("{} rows: NOT IN {}, batches {}".format(
+            rows,
+            measure(rows, exclude),
+            measure(rows, batches),
+        ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,435 @@
+"""
+Benchmark the lenses, the transactions and the Django adapters.
+
+Run with: python -m benchmarks.suite [--rows ROWS...] [--repeat N]
+    [--output FILE] [--compare BASELINE] [--tolerance RATIO] [NAME...]
+
+The results are written as JSON, mapping each benchmark name to its wall
+time (the best of the repetitions, in seconds) and the number of database
+queries it ran. Only the benchmarks starting with one of the given names
+are run.
+
+To check for regressions, save the output of a run and pass it with
+--compare to a later one: the differences are reported, and the exit status
+is 1 if any benchmark is slower than the baseline by more than the tolerance
+or runs more queries.
+"""
+
+import argparse
+import json
+import sys
+import time
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+
+from adapt.errors import ValidationError
+from adapt.instrumentation import Instrumented
+from adapt.lens import Lens
+from adapt.objects import Attribute, Object
+from adapt.primitives import integer, string
+from adapt.transaction import atomic, context, error, on_commit
+from benchmarks import setup_django
+
+# Prepare the data for a benchmark, returning the action to time
+Benchmark = Callable[[], Callable[[], Any]]
+
+Result = Dict[str, float]
+
+ITEMS = 10000
+
+WIDTH = 20
+
+DEPTH = 10
+
+ROWS = (1000, 10000, 100000)
+
+
+def flat_lens(field: Lens = string) -> Lens:
+    """An object lens with many attributes."""
+
+    return Object({
+        'field{}'.format(index): field
+        for index in range(WIDTH)
+    })
+
+
+def flat_target() -> Any:
+    """An object for the flat lens."""
+
+    return SimpleNamespace(**{
+        'field{}'.format(index): "Value"
+        for index in range(WIDTH)
+    })
+
+
+def deep_lens(depth: int = DEPTH) -> Lens:
+    """Object lenses nested to the given depth."""
+
+    if depth == 0:
+        return Object({'value': integer})
+    return Object({'value': integer, 'child': deep_lens(depth - 1)})
+
+
+def deep_target(depth: int = DEPTH) -> Any:
+    """An object for the deep lens."""
+
+    if depth == 0:
+        return SimpleNamespace(value=depth)
+    return SimpleNamespace(value=depth, child=deep_target(depth - 1))
+
+
+def chain_lens() -> Lens:
+    """A long chain of composed lenses."""
+
+    lens: Lens = Attribute('value')
+    for _ in range(WIDTH):
+        lens = Attribute('child') * lens
+    return lens
+
+
+def chain_target() -> Any:
+    """An object for the chain lens."""
+
+    target = SimpleNamespace(value=0)
+    for _ in range(WIDTH):
+        target = SimpleNamespace(child=target)
+    return target
+
+
+def lens_get(lens: Lens, target: Callable[[], Any]) -> Benchmark:
+    """Get the values of many objects."""
+
+    def prepare() -> Callable[[], None]:
+        targets = [target() for _ in range(ITEMS)]
+
+        def run() -> None:
+            for item in targets:
+                lens.get(item)
+
+        return run
+
+    return prepare
+
+
+def lens_set(lens: Lens, target: Callable[[], Any]) -> Benchmark:
+    """Set the values of many objects."""
+
+    def prepare() -> Callable[[], None]:
+        targets = [target() for _ in range(ITEMS)]
+        values = [lens.get(item) for item in targets]
+
+        def run() -> None:
+            for item, value in zip(targets, values):
+                lens.set(item, value)
+
+        return run
+
+    return prepare
+
+
+def transaction_hooks() -> Callable[[], None]:
+    """Run a transaction with many commit hooks."""
+
+    @atomic
+    def run() -> None:
+        for _ in range(ITEMS):
+            on_commit(lambda: None)
+
+    return run
+
+
+def transaction_nested() -> Callable[[], None]:
+    """Run many nested transactions."""
+
+    @atomic
+    def inner() -> None:
+        pass
+
+    @atomic
+    def run() -> None:
+        for _ in range(ITEMS):
+            inner()
+
+    return run
+
+
+def transaction_errors() -> Callable[[], None]:
+    """Run a transaction recording many validation errors."""
+
+    @atomic
+    def action() -> None:
+        for index in range(ITEMS):
+            with context(index):
+                error("Invalid.")
+
+    def run() -> None:
+        try:
+            action()
+        except ValidationError:
+            pass
+
+    return run
+
+
+def address_lens() -> Lens:
+    """The queryset lens for the addresses."""
+
+    from adapt.django import Model, QuerySet
+
+    return QuerySet(Model({
+        'street': string,
+        'number': integer,
+    }), bulk=True, batch_size=1000)
+
+
+def user_lens() -> Lens:
+    """The queryset lens for the users with their addresses."""
+
+    from adapt.django import Model, QuerySet
+
+    return QuerySet(Model({
+        'name': string,
+        'email': string,
+        'address': Model({
+            'street': string,
+            'number': integer,
+        }),
+    }))
+
+
+def create_rows(rows: int) -> None:
+    """Replace the database contents with the given number of users."""
+
+    from tests.sample_app.models import Address, User
+
+    User.objects.all()._raw_delete('default')
+    Address.objects.all()._raw_delete('default')
+    Address.objects.bulk_create(
+        (Address(pk=pk, street="Street", number=pk)
+         for pk in range(1, rows + 1)),
+        batch_size=10000,
+    )
+    User.objects.bulk_create(
+        (User(pk=pk, name="Name", email="name@example.com", address_id=pk)
+         for pk in range(1, rows + 1)),
+        batch_size=10000,
+    )
+
+
+def queryset_get(rows: int) -> Benchmark:
+    """Get all the addresses."""
+
+    def prepare() -> Callable[[], None]:
+        from tests.sample_app.models import Address
+
+        create_rows(rows)
+        lens = address_lens()
+        return lambda: lens.get(Address.objects.all())
+
+    return prepare
+
+
+def queryset_related(rows: int) -> Benchmark:
+    """Get all the users with their addresses."""
+
+    def prepare() -> Callable[[], None]:
+        from tests.sample_app.models import User
+
+        create_rows(rows)
+        lens = user_lens()
+        return lambda: lens.get(User.objects.all())
+
+    return prepare
+
+
+def queryset_dumps(rows: int) -> Benchmark:
+    """Encode the users with their addresses from the result of get."""
+
+    def prepare() -> Callable[[], str]:
+        from tests.sample_app.models import User
+
+        create_rows(rows)
+        lens = user_lens()
+        return lambda: json.dumps(lens.get(User.objects.all()))
+
+    return prepare
+
+
+def queryset_encode(rows: int) -> Benchmark:
+    """Encode the users with their addresses directly."""
+
+    def prepare() -> Callable[[], str]:
+        from tests.sample_app.models import User
+
+        create_rows(rows)
+        lens: Any = user_lens()
+        return lambda: ''.join(lens.encode(User.objects.all()))
+
+    return prepare
+
+
+def queryset_changes(rows: int) -> Benchmark:
+    """Poll for the addresses changed since the last poll, a few of them."""
+
+    def prepare() -> Callable[[], Any]:
+        from tests.sample_app.models import Address
+
+        create_rows(rows)
+        for pk in range(1, 11):
+            Address.objects.filter(pk=pk).update(number=rows + pk)
+        lens: Any = address_lens()
+        return lambda: lens.changes(Address.objects.all(), 'number', rows)
+
+    return prepare
+
+
+def queryset_set(rows: int) -> Benchmark:
+    """
+    Set the addresses in bulk: update half of the rows, delete the rest and
+    create as many new ones.
+    """
+
+    def prepare() -> Callable[[], None]:
+        from tests.sample_app.models import Address
+
+        create_rows(rows)
+        lens = address_lens()
+        value = [
+            (pk, {'street': "Updated", 'number': pk})
+            for pk in range(1, rows // 2 + 1)
+        ] + [
+            (None, {'street': "New", 'number': pk})
+            for pk in range(rows // 2)
+        ]
+        return lambda: lens.set(Address.objects.all(), value)
+
+    return prepare
+
+
+def benchmarks(rows: List[int]) -> Iterator[Tuple[str, Benchmark]]:
+    """All the benchmarks, by name."""
+
+    for name, lens, target in (
+            ('object.flat', flat_lens(), flat_target),
+            ('object.instrumented', flat_lens(Instrumented(string)),
+             flat_target),
+            ('object.deep', deep_lens(), deep_target),
+            ('composed', chain_lens(), chain_target),
+    ):
+        yield 'lens.{}.get'.format(name), lens_get(lens, target)
+        yield 'lens.{}.set'.format(name), lens_set(lens, target)
+
+    yield 'transaction.hooks', transaction_hooks
+    yield 'transaction.nested', transaction_nested
+    yield 'transaction.errors', transaction_errors
+
+    for count in rows:
+        yield 'django.queryset.get.{}'.format(count), queryset_get(count)
+        yield 'django.queryset.related.{}'.format(count), \
+            queryset_related(count)
+        yield 'django.queryset.dumps.{}'.format(count), queryset_dumps(count)
+        yield 'django.queryset.encode.{}'.format(count), \
+            queryset_encode(count)
+        yield 'django.queryset.changes.{}'.format(count), \
+            queryset_changes(count)
+        yield 'django.queryset.set.{}'.format(count), queryset_set(count)
+
+
+def measure(benchmark: Benchmark, repeat: int) -> Result:
+    """Time the benchmark, counting the queries it runs."""
+
+    from django.db import connection  # type: ignore
+    from django.test.utils import CaptureQueriesContext  # type: ignore
+
+    times = []
+    for _ in range(repeat):
+        run = benchmark()
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            run()
+            times.append(time.perf_counter() - start)
+
+    return {
+        'time': min(times),
+        'queries': len(queries),
+    }
+
+
+def compare(
+        results: Dict[str, Result],
+        baseline: Dict[str, Result],
+        tolerance: float,
+) -> bool:
+    """
+    Report the differences from the baseline, returning whether there are
+    no regressions.
+    """
+
+    success = True
+    for name, result in results.items():
+        try:
+            expected = baseline[name]
+        except KeyError:
+            print("{}: not in the baseline".format(name), file=sys.stderr)
+            continue
+
+        ratio = result['time'] / expected['time'] \
+            if expected['time'] else 1.0
+        regression = ratio > 1 + tolerance or \
+            result['queries'] > expected['queries']
+        success = success and not regression
+
+        print("{}: {:.2f}x time, {} queries ({:+d}){}".format(
+            name,
+            ratio,
+            result['queries'],
+            int(result['queries'] - expected['queries']),
+            " REGRESSION" if regression else "",
+        ), file=sys.stderr)
+
+    return success
+
+
+def main() -> None:
+    """Run the benchmarks."""
+
+    parser = argparse.ArgumentParser(
+        description="Benchmark the lenses, the transactions and the Django "
+        "adapters.",
+    )
+    parser.add_argument('names', nargs='*',
+                        help="run only the benchmarks with these prefixes")
+    parser.add_argument('--rows', type=int, nargs='+', default=list(ROWS),
+                        help="database sizes for the Django benchmarks")
+    parser.add_argument('--repeat', type=int, default=3,
+                        help="times to run each benchmark")
+    parser.add_argument('--output', help="file to write the results to")
+    parser.add_argument('--compare', help="baseline results to compare to")
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help="allowed slowdown relative to the baseline")
+    args = parser.parse_args()
+
+    setup_django()
+
+    results = {
+        name: measure(benchmark, args.repeat)
+        for name, benchmark in benchmarks(args.rows)
+        if not args.names or name.startswith(tuple(args.names))
+    }
+
+    output = json.dumps({'benchmarks': results}, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            output_file.write(output + '\n')
+    else:
+        print(output)
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            baseline = json.load(baseline_file)['benchmarks']
+        if not compare(results, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
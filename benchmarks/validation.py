@@ -0,0 +1,120 @@
+"""
+Benchmark validating valid and invalid payloads, raising the errors or
+recording them as values.
+
+Run with: python -m benchmarks.validation [ITEMS]
+"""
+
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+from adapt.errors import ValidationError
+from adapt.lens import Lens
+from adapt.objects import Object
+from adapt.primitives import integer, string
+from adapt.transaction import atomic, context
+from adapt.validation import Validate
+from tests.utils import Address, Person
+
+
+def non_empty(value: Any) -> Optional[str]:
+    """Check the value is not empty."""
+
+    if not value:
+        return "Must not be empty."
+    return None
+
+
+class Raising(Lens):
+    """Validate the values by raising ValidationError."""
+
+    def __init__(self, lens: Lens) -> None:
+        self.lens = lens
+
+    def get(self, target: Any) -> Any:
+        return self.lens.get(target)
+
+    def set(self, target: Any, value: Any) -> Any:
+        message = non_empty(value)
+        if message is not None:
+            raise ValidationError(message)
+        return self.lens.set(target, value)
+
+
+def person(validated: Lens) -> Lens:
+    """A person lens with the validated attributes."""
+
+    return Object({
+        'name': validated,
+        'email': validated,
+        'address': Object({
+            'street': validated,
+            'number': integer,
+        }),
+    })
+
+
+def payload(items: int, valid: bool) -> List[Dict[str, Any]]:
+    """A list of people, all valid or all having invalid attributes."""
+
+    text = "Text" if valid else ""
+    return [
+        {
+            'name': text,
+            'email': text,
+            'address': {
+                'street': text,
+                'number': number,
+            },
+        }
+        for number in range(items)
+    ]
+
+
+def measure(lens: Lens, value: List[Dict[str, Any]]) -> float:
+    """Time setting all the items, returning the elapsed time."""
+
+    targets = [
+        Person("Name", "Email", Address("Street", 0))
+        for _ in value
+    ]
+
+    @atomic
+    def update() -> None:
+        """Set all the items."""
+
+        for index, (target, item) in enumerate(zip(targets, value)):
+            with context(index):
+                lens.set(target, item)
+
+    start = time.perf_counter()
+    try:
+        update()
+    except ValidationError:
+        pass
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    """Compare the validation protocols."""
+
+    items = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+
+    lenses = {
+        'raise': person(Raising(string)),
+        'value': person(Validate(non_empty, string)),
+    }
+
+    for name, lens in lenses.items():
+        for valid in (True, False):
+            print("{} {} items, {} errors: {:.3f}s".format(
+                items,
+                "valid" if valid else "invalid",
+                name,
+                measure(lens, payload(items, valid)),
+            ))
+
+
+if __name__ == '__main__':
+    main()
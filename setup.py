@@ -23,11 +23,14 @@ if __name__ == '__main__':
                 'GNU General Public License v3 or later (GPLv3+)',
                 'Programming Language :: Python',
                 'Programming Language :: Python :: 3',
+                'Framework :: Django :: 4.2',
             ],
 
             packages=find_packages(exclude=['tests']),
             include_package_data=True,
 
+            python_requires='>=3.8',
+
             setup_requires=['setuptools_scm'],
 
             install_requires=[],
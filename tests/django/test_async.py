@@ -0,0 +1,181 @@
+"""Test asynchronous Django adapters."""
+
+from typing import Any
+
+from asgiref.sync import async_to_sync
+from django.db import connection  # type: ignore
+from django.forms import model_to_dict  # type: ignore
+from django.test.utils import CaptureQueriesContext  # type: ignore
+
+from adapt.django import QuerySet
+from adapt.transaction import atomic, on_commit
+
+from .utils import DjangoTestCase
+
+
+class TestAsync(DjangoTestCase):
+    """Test asynchronous lens methods."""
+
+    def test_nested(self) -> None:
+        """Test reading and updating a nested model asynchronously."""
+
+        from tests.sample_app.models import Address, User
+
+        address_obj = Address.objects.create(
+            street="Banpo",
+            number=12,
+        )
+        User.objects.create(
+            name="Ayano",
+            email="ayano@example.com",
+            address=address_obj,
+        )
+
+        async def run() -> Any:
+            """Read and update the user without loading the address."""
+
+            user_obj = await User.objects.aget(name="Ayano")
+
+            value = await self.user.aget(user_obj)
+
+            await self.user.aset(user_obj, {
+                'name': "Nocchi",
+                'email': "nocchi@example.com",
+                'address': {
+                    'street': "Gangnam",
+                    'number': 25,
+                },
+            })
+
+            return value
+
+        self.assertEqual(async_to_sync(run)(), {
+            'name': "Ayano",
+            'email': "ayano@example.com",
+            'address': {
+                'street': "Banpo",
+                'number': 12,
+            },
+        })
+
+        user_obj = User.objects.get()
+        self.assertEqual(user_obj.name, "Nocchi")
+        self.assertEqual(user_obj.address.street, "Gangnam")
+
+    def test_queryset(self) -> None:
+        """Test reading and updating a queryset asynchronously."""
+
+        from tests.sample_app.models import Address
+
+        for bulk in (False, True):
+            with self.subTest(bulk=bulk):
+                Address.objects.all().delete()
+                Address.objects.create(pk=10, street="Banpo", number=12)
+                Address.objects.create(pk=20, street="Gangnam", number=25)
+
+                address_qs = QuerySet(self.address, bulk=bulk)
+
+                value = async_to_sync(address_qs.aget)(
+                    Address.objects.order_by('pk'))
+                self.assertEqual(value, [
+                    (10, {'street': "Banpo", 'number': 12}),
+                    (20, {'street': "Gangnam", 'number': 25}),
+                ])
+
+                async_to_sync(address_qs.aset)(Address.objects.all(), [
+                    (10, {'street': "Banpo", 'number': 15}),
+                    (30, {'street': "Chenggyecheon", 'number': 70}),
+                    (None, {'street': "Sejong", 'number': 50}),
+                ])
+
+                self.assertEqual(Address.objects.count(), 3)
+                addr1, addr2, addr3 = Address.objects.order_by('street')
+                self.assertEqual(model_to_dict(addr1), {
+                    'id': 10,
+                    'street': "Banpo",
+                    'number': 15,
+                })
+                self.assertEqual(model_to_dict(addr2), {
+                    'id': 30,
+                    'street': "Chenggyecheon",
+                    'number': 70,
+                })
+                self.assertEqual(addr3.street, "Sejong")
+
+    def test_queryset_stream(self) -> None:
+        """Test streaming a queryset asynchronously."""
+
+        from tests.sample_app.models import Address
+
+        Address.objects.create(pk=10, street="Banpo", number=12)
+        Address.objects.create(pk=20, street="Gangnam", number=25)
+
+        address_qs = QuerySet(self.address)
+
+        async def run() -> Any:
+            """Collect the streamed values."""
+            return [
+                item
+                async for item in address_qs.astream(
+                    Address.objects.order_by('pk'), chunk_size=1)
+            ]
+
+        self.assertEqual(async_to_sync(run)(), [
+            (10, {'street': "Banpo", 'number': 12}),
+            (20, {'street': "Gangnam", 'number': 25}),
+        ])
+
+    def test_delete_keys(self) -> None:
+        """Test deleting rows without cascades asynchronously."""
+
+        from tests.sample_app.models import Address, User
+
+        address = Address.objects.create(street="Banpo", number=12)
+        User.objects.bulk_create(
+            User(pk=pk, name="User", email="user@example.com",
+                 address=address)
+            for pk in range(1, 301)
+        )
+
+        user_qs = QuerySet(self.user, delete_batch_size=100)
+        with CaptureQueriesContext(connection) as queries:
+            async_to_sync(user_qs.adelete_keys)(
+                User.objects.all(), list(range(1, 251)))
+
+        # The batches are deleted directly, without loading the rows
+        self.assertEqual(len(queries), 3)
+        self.assertEqual(User.objects.count(), 50)
+
+    def test_rollback(self) -> None:
+        """Test the asynchronous writes are rolled back together."""
+
+        from tests.sample_app.models import Address
+
+        Address.objects.create(pk=10, street="Banpo", number=12)
+        Address.objects.create(pk=20, street="Gangnam", number=25)
+
+        for bulk in (False, True):
+            with self.subTest(bulk=bulk):
+                address_qs = QuerySet(self.address, bulk=bulk)
+
+                async def fail() -> None:
+                    """Fail after the writes."""
+                    raise RuntimeError("Failed")
+
+                @atomic
+                async def action() -> None:
+                    """Set the addresses, failing when committing."""
+
+                    await address_qs.aset(Address.objects.all(), [
+                        (10, {'street': "Sejong", 'number': 50}),
+                        (None, {'street': "Itaewon", 'number': 5}),
+                    ])
+                    on_commit(fail)
+
+                with self.assertRaises(RuntimeError):
+                    async_to_sync(action)()
+
+                self.assertEqual(
+                    sorted(Address.objects.values_list('pk', 'street')),
+                    [(10, "Banpo"), (20, "Gangnam")],
+                )
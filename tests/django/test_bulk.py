@@ -0,0 +1,291 @@
+"""Test bulk writes with Django adapters."""
+
+from typing import Any, Dict, Iterator, Optional, Tuple
+from unittest import mock
+
+from django.db import connection  # type: ignore
+from django.forms import model_to_dict  # type: ignore
+from django.test.utils import CaptureQueriesContext  # type: ignore
+
+from adapt.django import Model, QuerySet
+from adapt.errors import ValidationError
+from adapt.primitives import integer, string
+from adapt.transaction import atomic, error
+from adapt.validation import Validate
+
+from .utils import DjangoTestCase
+
+
+class TestBulk(DjangoTestCase):
+    """Test bulk mode of the queryset lens."""
+
+    def test_queryset(self) -> None:
+        """Test updating a queryset in bulk."""
+
+        from tests.sample_app.models import Address
+
+        address_qs = QuerySet(self.address, bulk=True)
+
+        Address.objects.create(pk=10, street="Banpo", number=12)
+        Address.objects.create(pk=20, street="Gangnam", number=25)
+
+        address_qs.set(Address.objects.all(), [
+            (10, {
+                'street': "Banpo",
+                'number': 15,
+            }),
+            (30, {
+                'street': "Chenggyecheon",
+                'number': 70,
+            }),
+            (None, {
+                'street': "Sejong",
+                'number': 50,
+            }),
+        ])
+
+        self.assertEqual(Address.objects.count(), 3)
+        addr1, addr2, addr3 = Address.objects.all().order_by('street')
+        self.assertEqual(model_to_dict(addr1), {
+            'id': 10,
+            'street': "Banpo",
+            'number': 15,
+        })
+        self.assertEqual(model_to_dict(addr2), {
+            'id': 30,
+            'street': "Chenggyecheon",
+            'number': 70,
+        })
+        self.assertEqual(addr3.street, "Sejong")
+        self.assertEqual(addr3.number, 50)
+
+    def count_queries(self, rows: int) -> int:
+        """Count the queries needed to update and create the given rows."""
+
+        from tests.sample_app.models import Address
+
+        Address.objects.all().delete()
+        Address.objects.bulk_create(
+            Address(pk=pk, street="Old", number=pk)
+            for pk in range(1, rows + 1)
+        )
+
+        address_qs = QuerySet(self.address, bulk=True, batch_size=1000)
+
+        # Half of the rows are updated, the rest deleted, and as many new
+        # rows created
+        value = [
+            (pk, {'street': "Updated", 'number': pk})
+            for pk in range(1, rows // 2 + 1)
+        ] + [
+            (None, {'street': "New", 'number': pk})
+            for pk in range(rows // 2)
+        ]
+
+        with CaptureQueriesContext(connection) as queries:
+            address_qs.set(Address.objects.all(), value)
+
+        self.assertEqual(Address.objects.filter(street="Updated").count(),
+                         rows // 2)
+        self.assertEqual(Address.objects.filter(street="New").count(),
+                         rows // 2)
+        self.assertEqual(Address.objects.filter(street="Old").count(), 0)
+
+        return len(queries)
+
+    def test_query_count(self) -> None:
+        """Test the number of queries doesn't depend on the number of rows."""
+
+        self.assertEqual(self.count_queries(10), self.count_queries(200))
+
+    def test_keys(self) -> None:
+        """Test the primary keys are converted and merged."""
+
+        from tests.sample_app.models import Address
+
+        Address.objects.create(pk=10, street="Banpo", number=12)
+
+        address_qs = QuerySet(self.address, bulk=True)
+        address_qs.set(Address.objects.all(), [
+            ("10", {'street': "Gangnam", 'number': 25}),
+            (20, {'street': "Sejong", 'number': 50}),
+            ("20", {'street': "Chenggyecheon", 'number': 70}),
+        ])
+
+        self.assertEqual(
+            sorted(Address.objects.values_list('pk', 'street', 'number')),
+            [(10, "Gangnam", 25), (20, "Chenggyecheon", 70)],
+        )
+
+        with self.assertRaises(ValidationError) as raised:
+            address_qs.set(Address.objects.all(), [
+                ("ten", {'street': "Banpo", 'number': 12}),
+            ])
+
+        errors = raised.exception.args[0]
+        self.assertEqual(errors.nested[0].errors, ["Invalid primary key."])
+
+    def test_no_returned_keys(self) -> None:
+        """Test new rows are kept if bulk inserts don't return the keys."""
+
+        from tests.sample_app.models import Address
+
+        Address.objects.create(pk=10, street="Banpo", number=12)
+
+        address_qs = QuerySet(self.address, bulk=True)
+
+        # Like MySQL
+        with mock.patch.object(connection.features,
+                               'can_return_columns_from_insert', False):
+            self.assertFalse(
+                connection.features.can_return_rows_from_bulk_insert)
+            address_qs.set(Address.objects.all(), [
+                (10, {'street': "Banpo", 'number': 13}),
+                (20, {'street': "Gangnam", 'number': 25}),
+                (None, {'street': "Sejong", 'number': 50}),
+            ])
+
+        self.assertEqual(
+            sorted(Address.objects.values_list('street', 'number')),
+            [("Banpo", 13), ("Gangnam", 25), ("Sejong", 50)],
+        )
+
+    def test_stream(self) -> None:
+        """Test updating a queryset from a generator in chunks."""
+
+        from tests.sample_app.models import Address
+
+        Address.objects.bulk_create(
+            Address(pk=pk, street="Old", number=pk)
+            for pk in range(1, 31)
+        )
+
+        address_qs = QuerySet(self.address)
+
+        def items() -> Iterator[Tuple[Optional[int], Dict[str, Any]]]:
+            """Update every other row, and create new ones."""
+
+            for pk in range(1, 31, 2):
+                yield pk, {'street': "Updated", 'number': pk}
+            for number in range(10):
+                yield None, {'street': "New", 'number': number}
+
+        with CaptureQueriesContext(connection) as queries:
+            address_qs.set_stream(Address.objects.all(), items(),
+                                  chunk_size=10)
+
+        # Two chunks of 10 rows and a chunk of 5, each taking a few queries
+        # to load, create and update the rows, followed by the deletion
+        self.assertLessEqual(len(queries), 20)
+
+        self.assertEqual(Address.objects.count(), 25)
+        self.assertEqual(
+            set(Address.objects.filter(street="Updated")
+                .values_list('pk', flat=True)),
+            set(range(1, 31, 2)),
+        )
+        self.assertEqual(Address.objects.filter(street="New").count(), 10)
+
+    def test_stream_errors(self) -> None:
+        """Test the errors of a later chunk are recorded by item position."""
+
+        from tests.sample_app.models import Address
+
+        address_qs = QuerySet(Model({
+            'street': string,
+            'number': Validate(
+                lambda number: "Negative." if number < 0 else None,
+                integer,
+            ),
+        }))
+        items = [
+            (None, {'street': "New", 'number': number})
+            for number in range(10)
+        ]
+        items[7] = (None, {'street': "New", 'number': -7})
+
+        with self.assertRaises(ValidationError) as raised:
+            address_qs.set_stream(Address.objects.all(), items, chunk_size=3)
+
+        errors = raised.exception.args[0]
+        self.assertEqual(list(errors.nested), [7])
+        self.assertEqual(errors.nested[7].nested['number'].errors,
+                         ["Negative."])
+
+        # The chunks before the failing one stay written
+        self.assertEqual(Address.objects.count(), 6)
+
+    def test_stream_transaction(self) -> None:
+        """Test streaming inside a transaction deletes on its commit."""
+
+        from tests.sample_app.models import Address
+
+        Address.objects.bulk_create(
+            Address(pk=pk, street="Old", number=pk)
+            for pk in (100, 200)
+        )
+
+        address_qs = QuerySet(self.address)
+
+        @atomic
+        def failing() -> None:
+            """Stream the items, then fail."""
+            address_qs.set_stream(Address.objects.all(), [
+                (100, {'street': "Updated", 'number': 100}),
+            ], chunk_size=1)
+            error("Invalid.")
+
+        with self.assertRaises(ValidationError):
+            failing()
+
+        self.assertEqual(
+            sorted(Address.objects.values_list('pk', 'street')),
+            [(100, "Old"), (200, "Old")],
+        )
+
+        @atomic
+        def succeeding() -> None:
+            """Stream the items, keeping a new one."""
+            address_qs.set_stream(Address.objects.all(), [
+                (100, {'street': "Updated", 'number': 100}),
+                (None, {'street': "New", 'number': 1}),
+            ], chunk_size=1)
+
+        succeeding()
+
+        self.assertEqual(
+            sorted(Address.objects.values_list('street', flat=True)),
+            ["New", "Updated"],
+        )
+
+    def test_delete_omitted(self) -> None:
+        """Test deleting the omitted rows in batches."""
+
+        from tests.sample_app.models import Address, User
+
+        Address.objects.bulk_create(
+            Address(pk=pk, street="Old", number=pk)
+            for pk in range(1, 1501)
+        )
+        User.objects.bulk_create(
+            User(pk=pk, name="User", email="user@example.com", address_id=pk)
+            for pk in range(1, 1501)
+        )
+
+        user_qs = QuerySet(self.user, bulk=True, delete_batch_size=100)
+        user_qs.delete_omitted(User.objects.all(), range(1, 1001))
+
+        self.assertEqual(User.objects.count(), 1000)
+        self.assertEqual(Address.objects.count(), 1500)
+
+        # Deleting addresses cascades to the users
+        address_qs = QuerySet(self.address, bulk=True, delete_batch_size=100)
+        address_qs.delete_omitted(Address.objects.all(),
+                                  map(str, range(1, 501)))
+
+        self.assertEqual(Address.objects.count(), 500)
+        self.assertEqual(User.objects.count(), 500)
+        self.assertEqual(
+            set(User.objects.values_list('pk', flat=True)),
+            set(range(1, 501)),
+        )
@@ -0,0 +1,228 @@
+"""Test caching the values of the model lenses."""
+
+from typing import Any, Mapping
+
+from asgiref.sync import async_to_sync
+from django.core.cache import caches  # type: ignore
+from django.db import connection  # type: ignore
+from django.db.transaction import atomic as db_atomic  # type: ignore
+from django.test.utils import CaptureQueriesContext  # type: ignore
+
+from adapt.cache import Cache, Key, LRUCache
+from adapt.django import CachedModel, DjangoCache, QuerySet
+from adapt.primitives import integer, string
+
+from .utils import DjangoTestCase
+
+
+class Counted(LRUCache):
+    """A cache counting the writes to it."""
+
+    writes = 0
+
+    def set_many(self, values: Mapping[Key, Any]) -> None:
+        self.writes += 1
+        super().set_many(values)
+
+
+class TestCache(DjangoTestCase):
+    """Test the cached model lens."""
+
+    def setUp(self) -> None:
+        super().setUp()
+
+        caches['default'].clear()
+
+        from tests.sample_app.models import Address, User
+
+        self.banpo = Address.objects.create(street="Banpo", number=12)
+        self.ayano = User.objects.create(
+            name="Ayano",
+            email="ayano@example.com",
+            address=self.banpo,
+        )
+
+    def cached_user(self, cache: Cache) -> CachedModel:
+        """The cached lens for the users with their addresses."""
+
+        return CachedModel({
+            'name': string,
+            'email': string,
+            'address': self.address,
+        }, cache=cache)
+
+    def fresh(self, instance: Any) -> Any:
+        """The instance loaded from the database again."""
+
+        return type(instance).objects.get(pk=instance.pk)
+
+    def test_get(self) -> None:
+        """Test the values are cached."""
+
+        for cache in (LRUCache(), DjangoCache()):
+            with self.subTest(cache=cache):
+                user = self.cached_user(cache)
+                expected = {
+                    'name': "Ayano",
+                    'email': "ayano@example.com",
+                    'address': {
+                        'street': "Banpo",
+                        'number': 12,
+                    },
+                }
+
+                self.assertEqual(user.get(self.fresh(self.ayano)), expected)
+
+                # The address is not read again
+                user_obj = self.fresh(self.ayano)
+                with CaptureQueriesContext(connection) as queries:
+                    self.assertEqual(user.get(user_obj), expected)
+                self.assertEqual(len(queries), 0)
+
+    def test_set(self) -> None:
+        """Test setting through the lens invalidates the value."""
+
+        for cache in (LRUCache(), DjangoCache()):
+            with self.subTest(cache=cache):
+                user = self.cached_user(cache)
+                value = user.get(self.fresh(self.ayano))
+
+                user.set(self.fresh(self.ayano), dict(value, name="Mei"))
+
+                self.assertEqual(user.get(self.fresh(self.ayano))['name'],
+                                 "Mei")
+
+    def test_related(self) -> None:
+        """Test writing a related instance invalidates the value."""
+
+        user = self.cached_user(LRUCache())
+        user.get(self.fresh(self.ayano))
+
+        self.address.set(self.fresh(self.banpo), {
+            'street': "Gangnam",
+            'number': 25,
+        })
+
+        self.assertEqual(user.get(self.fresh(self.ayano))['address'], {
+            'street': "Gangnam",
+            'number': 25,
+        })
+
+    def test_queryset(self) -> None:
+        """Test the queryset cleanup invalidates the deleted instances."""
+
+        from tests.sample_app.models import Address
+
+        address = CachedModel({
+            'street': string,
+            'number': integer,
+        }, cache=LRUCache())
+        address_qs = QuerySet(address, projection='values')
+
+        self.assertEqual(address_qs.get(Address.objects.all()), [
+            (self.banpo.pk, {'street': "Banpo", 'number': 12}),
+        ])
+
+        address_qs.set(Address.objects.all(), [])
+        Address.objects.create(pk=self.banpo.pk, street="Sejong", number=50)
+
+        self.assertEqual(address_qs.get(Address.objects.all()), [
+            (self.banpo.pk, {'street': "Sejong", 'number': 50}),
+        ])
+
+    def test_unrelated(self) -> None:
+        """Test writing models no value is read from leaves the cache."""
+
+        from tests.sample_app.models import Address, Article
+
+        cache = Counted(max_size=10)
+        article = CachedModel({'title': string}, cache=cache)
+        article_obj = Article.objects.create(title="Lenses")
+        article.get(article_obj)
+        writes = cache.writes
+
+        address_qs = QuerySet(self.address, bulk=True)
+        address_qs.set(Address.objects.all(), [
+            (None, {'street': "Street {}".format(number), 'number': number})
+            for number in range(50)
+        ])
+
+        self.assertEqual(cache.writes, writes)
+        with CaptureQueriesContext(connection) as queries:
+            article.get(article_obj)
+        self.assertEqual(len(queries), 0)
+
+    def test_commit(self) -> None:
+        """Test the rows are invalidated once the database commits."""
+
+        cache = Counted()
+        user = self.cached_user(cache)
+        value = user.get(self.fresh(self.ayano))
+        writes = cache.writes
+
+        with db_atomic():
+            user.set(self.fresh(self.ayano), dict(value, name="Mei"))
+            self.assertEqual(cache.writes, writes)
+
+        # A single write for the user and its model
+        self.assertEqual(cache.writes, writes + 1)
+        self.assertEqual(user.get(self.fresh(self.ayano))['name'], "Mei")
+
+    def test_shared(self) -> None:
+        """Test a name is required with a cache shared between processes."""
+
+        with self.assertRaises(ValueError):
+            CachedModel({'name': string}, cache=DjangoCache('shared'))
+
+        CachedModel({'name': string}, cache=DjangoCache('shared'),
+                    name='user')
+
+    def test_version(self) -> None:
+        """Test the version field is part of the key."""
+
+        from tests.sample_app.models import Address
+
+        address = CachedModel({
+            'street': string,
+        }, cache=LRUCache(), version='number')
+
+        self.assertEqual(address.get(self.fresh(self.banpo)),
+                         {'street': "Banpo"})
+
+        # Changes made bypassing the lenses are seen when the version changes
+        Address.objects.filter(pk=self.banpo.pk).update(street="Gangnam")
+        self.assertEqual(address.get(self.fresh(self.banpo)),
+                         {'street': "Banpo"})
+
+        Address.objects.filter(pk=self.banpo.pk).update(number=13)
+        self.assertEqual(address.get(self.fresh(self.banpo)),
+                         {'street': "Gangnam"})
+
+    def test_async(self) -> None:
+        """Test the values are cached when read asynchronously."""
+
+        cache = LRUCache()
+        user = self.cached_user(cache)
+        user_obj = self.fresh(self.ayano)
+
+        value = async_to_sync(user.aget)(user_obj)
+
+        # The value, and the stamps and the marks of the user and the
+        # address
+        self.assertEqual(len(cache), 5)
+
+        user_obj = self.fresh(self.ayano)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(user.get(user_obj), value)
+        self.assertEqual(len(queries), 0)
+
+    def test_async_set(self) -> None:
+        """Test setting asynchronously invalidates the value."""
+
+        user = self.cached_user(LRUCache())
+        value = user.get(self.fresh(self.ayano))
+
+        async_to_sync(user.aset)(self.fresh(self.ayano),
+                                 dict(value, name="Mei"))
+
+        self.assertEqual(user.get(self.fresh(self.ayano))['name'], "Mei")
@@ -0,0 +1,129 @@
+"""Test reading the changes of querysets."""
+
+from asgiref.sync import async_to_sync
+from django.db import connection  # type: ignore
+from django.db.models import F, Q  # type: ignore
+from django.test.utils import CaptureQueriesContext  # type: ignore
+
+from adapt.django import Model, QuerySet
+from adapt.primitives import string
+
+from .utils import DjangoTestCase
+
+
+class TestChanges(DjangoTestCase):
+    """Test reading the instances changed since a watermark."""
+
+    def setUp(self) -> None:
+        super().setUp()
+
+        from tests.sample_app.models import Address
+
+        Address.objects.create(pk=1, street="Banpo", number=10)
+        Address.objects.create(pk=2, street="Gangnam", number=20)
+        Address.objects.create(pk=3, street="Sejong", number=30)
+
+        self.address_qs = QuerySet(self.address)
+
+    def test_changes(self) -> None:
+        """Test polling for the changed instances."""
+
+        from tests.sample_app.models import Address
+
+        changes = self.address_qs.changes(Address.objects.all(), 'number')
+        self.assertEqual(changes.items, [
+            (1, {'street': "Banpo", 'number': 10}),
+            (2, {'street': "Gangnam", 'number': 20}),
+            (3, {'street': "Sejong", 'number': 30}),
+        ])
+        self.assertEqual(changes.watermark, 30)
+        self.assertEqual(changes.deleted, [])
+
+        Address.objects.filter(pk=1).update(street="Chenggyecheon", number=40)
+        Address.objects.filter(pk=2).delete()
+
+        changes = self.address_qs.changes(
+            Address.objects.all(), 'number', 30, known=[1, 2, 3])
+        self.assertEqual(changes.items, [
+            (1, {'street': "Chenggyecheon", 'number': 40}),
+        ])
+        self.assertEqual(changes.watermark, 40)
+        self.assertEqual(changes.deleted, [2])
+
+        # Nothing changed
+        with CaptureQueriesContext(connection) as queries:
+            changes = self.address_qs.changes(
+                Address.objects.all(), 'number', 40)
+        self.assertEqual(changes.items, [])
+        self.assertEqual(changes.watermark, 40)
+        self.assertEqual(len(queries), 1)
+
+    def test_primary_key(self) -> None:
+        """Test using the primary key as the watermark for new instances."""
+
+        from tests.sample_app.models import Address
+
+        Address.objects.create(pk=4, street="Itaewon", number=5)
+
+        changes = self.address_qs.changes(Address.objects.all(), 'pk', 3)
+        self.assertEqual(changes.items, [
+            (4, {'street': "Itaewon", 'number': 5}),
+        ])
+        self.assertEqual(changes.watermark, 4)
+
+    def test_deleted_batches(self) -> None:
+        """Test the deleted instances are found in batches."""
+
+        from tests.sample_app.models import Address
+
+        address_qs = QuerySet(self.address, delete_batch_size=2)
+        with CaptureQueriesContext(connection) as queries:
+            deleted = address_qs.deleted(
+                Address.objects.all(), ['1', '4', '3', '5', '6'])
+        self.assertEqual(deleted, [4, 5, 6])
+        self.assertEqual(len(queries), 3)
+
+    def test_tombstone(self) -> None:
+        """Test reporting the soft deleted instances among the changes."""
+
+        from tests.sample_app.models import Article
+
+        Article.objects.create(pk=1, title="First", version=1)
+        Article.objects.create(pk=2, title="Second", version=2)
+        Article.objects.create(pk=3, title="Third", version=3)
+
+        article_qs = QuerySet(Model({'title': string}))
+        Article.objects.filter(pk=2).update(
+            deleted=True, version=F('version') + 10)
+
+        with CaptureQueriesContext(connection) as queries:
+            changes = article_qs.changes(
+                Article.objects.all(), 'version', 1, tombstone=Q(deleted=True))
+        self.assertEqual(changes.items, [(3, {'title': "Third"})])
+        self.assertEqual(changes.watermark, 12)
+        self.assertEqual(changes.deleted, [2])
+        self.assertEqual(len(queries), 3)
+
+        changes = async_to_sync(article_qs.achanges)(
+            Article.objects.all(), 'version', 12, tombstone=Q(deleted=True))
+        self.assertEqual(changes.items, [])
+        self.assertEqual(changes.deleted, [])
+
+    def test_async(self) -> None:
+        """Test polling for the changes asynchronously."""
+
+        from tests.sample_app.models import Address
+
+        changes = async_to_sync(self.address_qs.achanges)(
+            Address.objects.all(), 'number', 10, [1, 4])
+        self.assertEqual(changes.items, [
+            (2, {'street': "Gangnam", 'number': 20}),
+            (3, {'street': "Sejong", 'number': 30}),
+        ])
+        self.assertEqual(changes.watermark, 30)
+        self.assertEqual(changes.deleted, [4])
+
+        changes = async_to_sync(self.address_qs.achanges)(
+            Address.objects.all(), 'number', 30)
+        self.assertEqual(changes.items, [])
+        self.assertEqual(changes.watermark, 30)
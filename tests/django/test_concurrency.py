@@ -0,0 +1,201 @@
+"""Test detecting concurrent changes."""
+
+from asgiref.sync import async_to_sync
+from django.db import connection  # type: ignore
+from django.test.utils import CaptureQueriesContext  # type: ignore
+
+from adapt.django import Model, QuerySet
+from adapt.errors import ValidationError
+from adapt.primitives import integer, string
+from adapt.transaction import atomic, on_commit
+
+from .utils import DjangoTestCase
+
+
+class TestOptimistic(DjangoTestCase):
+    """Test the optimistic version checks."""
+
+    def setUp(self) -> None:
+        super().setUp()
+
+        from tests.sample_app.models import Article
+
+        self.first = Article.objects.create(pk=1, title="First")
+        self.second = Article.objects.create(pk=2, title="Second")
+
+        self.article = Model({
+            'title': string,
+            'version': integer,
+        }, optimistic='version')
+
+    def versions(self) -> object:
+        """The titles and the versions of the articles in the database."""
+
+        from tests.sample_app.models import Article
+
+        return list(Article.objects.order_by('pk')
+                    .values_list('title', 'version'))
+
+    def test_set(self) -> None:
+        """Test the version is checked and incremented."""
+
+        from tests.sample_app.models import Article
+
+        article = Article.objects.get(pk=1)
+        self.article.set(article, {'title': "Updated", 'version': 0})
+
+        self.assertEqual(article.version, 1)
+        self.assertEqual(self.versions(), [("Updated", 1), ("Second", 0)])
+
+        # Nothing changed, nothing is written
+        self.article.set(article, {'title': "Updated", 'version': 1})
+        self.assertEqual(self.versions(), [("Updated", 1), ("Second", 0)])
+
+    def test_outdated_value(self) -> None:
+        """Test a value with an old version is rejected."""
+
+        from tests.sample_app.models import Article
+
+        Article.objects.filter(pk=1).update(title="Theirs", version=1)
+
+        with self.assertRaises(ValidationError) as raised:
+            self.article.set(Article.objects.get(pk=1),
+                             {'title': "Ours", 'version': 0})
+
+        self.assertEqual(raised.exception.args[0].errors,
+                         ["Modified concurrently."])
+        self.assertEqual(self.versions(), [("Theirs", 1), ("Second", 0)])
+
+    def test_conflict(self) -> None:
+        """Test a row changed after reading it is not overwritten."""
+
+        from tests.sample_app.models import Article
+
+        for bulk in (False, True):
+            with self.subTest(bulk=bulk):
+                Article.objects.filter(pk=1).update(title="First", version=0)
+                Article.objects.filter(pk=2).update(title="Second", version=0)
+
+                article_qs = QuerySet(self.article, bulk=bulk)
+
+                def concurrent() -> None:
+                    """Change the first article after it is read."""
+                    Article.objects.filter(pk=1).update(
+                        title="Theirs", version=1)
+
+                @atomic
+                def action() -> None:
+                    """Set the articles, changing the first one before."""
+
+                    on_commit(concurrent)
+                    article_qs.set(Article.objects.all(), [
+                        (1, {'title': "Ours", 'version': 0}),
+                        (2, {'title': "Also ours", 'version': 0}),
+                    ])
+
+                with self.assertRaises(ValidationError) as raised:
+                    action()
+
+                errors = raised.exception.args[0]
+                self.assertEqual(list(errors.nested), [0])
+                self.assertEqual(errors.nested[0].errors,
+                                 ["Modified concurrently."])
+
+                # The whole commit is rolled back, here together with the
+                # simulated change
+                self.assertEqual(self.versions(),
+                                 [("First", 0), ("Second", 0)])
+
+    def test_bulk(self) -> None:
+        """Test the versioned rows are updated in one query."""
+
+        from tests.sample_app.models import Article
+
+        article_qs = QuerySet(self.article, bulk=True)
+
+        with CaptureQueriesContext(connection) as queries:
+            article_qs.patch(Article.objects.all(), [
+                ('update', 1, {'title': "First updated", 'version': 0}),
+                ('update', 2, {'title': "Second updated", 'version': 0}),
+            ])
+
+        updates = [query for query in queries
+                   if query['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(self.versions(),
+                         [("First updated", 1), ("Second updated", 1)])
+
+    def test_async_conflict(self) -> None:
+        """Test an asynchronous conflict rolls back the other writes."""
+
+        from tests.sample_app.models import Article
+
+        article_qs = QuerySet(self.article)
+
+        async def concurrent() -> None:
+            """Change the second article after it is read."""
+            await Article.objects.filter(pk=2).aupdate(version=1)
+
+        @atomic
+        async def action() -> None:
+            """Set the articles, changing the second one before."""
+
+            on_commit(concurrent)
+            await article_qs.aset(Article.objects.all(), [
+                (1, {'title': "Ours", 'version': 0}),
+                (2, {'title': "Also ours", 'version': 0}),
+            ])
+
+        with self.assertRaises(ValidationError) as raised:
+            async_to_sync(action)()
+
+        self.assertEqual(list(raised.exception.args[0].nested), [1])
+        self.assertEqual(self.versions(), [("First", 0), ("Second", 0)])
+
+    def test_async(self) -> None:
+        """Test the version is checked asynchronously."""
+
+        from tests.sample_app.models import Article
+
+        article = Article.objects.get(pk=1)
+        async_to_sync(self.article.aset)(
+            article, {'title': "Updated", 'version': 0})
+        self.assertEqual(self.versions(), [("Updated", 1), ("Second", 0)])
+
+        Article.objects.filter(pk=1).update(version=5)
+        with self.assertRaises(ValidationError):
+            async_to_sync(self.article.aset)(
+                article, {'title': "Again", 'version': 1})
+        self.assertEqual(self.versions(), [("Updated", 5), ("Second", 0)])
+
+
+class TestLock(DjangoTestCase):
+    """Test locking the instances to set."""
+
+    def test_locked(self) -> None:
+        """Test the existing instances are read for update in one query."""
+
+        from tests.sample_app.models import Address
+
+        Address.objects.create(pk=1, street="Banpo", number=12)
+        Address.objects.create(pk=2, street="Gangnam", number=25)
+
+        address_qs = QuerySet(self.address, lock=True)
+        self.assertTrue(address_qs.lock_rows(
+            Address.objects.all(), [(1, None), (None, None)],
+        ).query.select_for_update)
+        self.assertFalse(QuerySet(self.address).locked(
+            Address.objects.all()).query.select_for_update)
+
+        for bulk in (False, True):
+            with self.subTest(bulk=bulk):
+                address_qs = QuerySet(self.address, lock=True, bulk=bulk)
+                address_qs.set(Address.objects.all(), [
+                    (1, {'street': "Banpo", 'number': 13}),
+                    (2, {'street': "Gangnam", 'number': 26}),
+                ])
+                self.assertEqual(
+                    sorted(Address.objects.values_list('number', flat=True)),
+                    [13, 26],
+                )
+                Address.objects.update(number=12)
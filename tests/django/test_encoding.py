@@ -0,0 +1,57 @@
+"""Test encoding querysets as JSON."""
+
+import json
+
+from adapt.django import QuerySet
+from adapt.encoding import decode_items
+
+from .utils import DjangoTestCase
+
+
+class TestEncoding(DjangoTestCase):
+    """Test encoding and decoding with the queryset lens."""
+
+    def test_encode(self) -> None:
+        """Test encoding the queryset gives the same JSON as get."""
+
+        from tests.sample_app.models import Address, User
+
+        self.assertEqual(
+            ''.join(QuerySet(self.user).encode(User.objects.all())), '[]')
+
+        for pk, street in ((10, "Banpo"), (20, "강남")):
+            User.objects.create(
+                pk=pk,
+                name="Ayano",
+                email="ayano@example.com",
+                address=Address.objects.create(street=street, number=pk),
+            )
+
+        for projection in (None, 'only', 'values'):
+            with self.subTest(projection=projection):
+                user_qs = QuerySet(self.user, projection=projection)
+                chunks = list(user_qs.encode(User.objects.all()))
+
+                self.assertEqual(len(chunks), 3)
+                self.assertEqual(
+                    ''.join(chunks),
+                    json.dumps(user_qs.get(User.objects.all())),
+                )
+
+    def test_decode(self) -> None:
+        """Test setting the queryset from the decoded chunks."""
+
+        from tests.sample_app.models import Address
+
+        Address.objects.create(pk=10, street="Banpo", number=12)
+
+        address_qs = QuerySet(self.address)
+        address_qs.set_stream(Address.objects.all(), decode_items([
+            b'[[10, {"street": "Banpo", "number": 15}], ',
+            b'[null, {"street": "Gangnam", "number": 25}]]',
+        ]))
+
+        self.assertEqual(
+            sorted(Address.objects.values_list('street', 'number')),
+            [("Banpo", 15), ("Gangnam", 25)],
+        )
@@ -0,0 +1,70 @@
+"""Test counting the queries of the Django adapters."""
+
+from asgiref.sync import async_to_sync
+
+from adapt.django import Model, QuerySet
+from adapt.instrumentation import Collector, Instrumented, instrument
+from adapt.primitives import integer, string
+
+from .utils import DjangoTestCase
+
+
+class TestInstrumentation(DjangoTestCase):
+    """Test query counts in the instrumentation events."""
+
+    def test_queries(self) -> None:
+        """Test the queries are counted for the lenses and the commit."""
+
+        from tests.sample_app.models import Address
+
+        Address.objects.create(pk=10, street="Banpo", number=12)
+        Address.objects.create(pk=20, street="Gangnam", number=25)
+
+        address_qs = Instrumented(QuerySet(self.address), 'addresses')
+
+        with instrument(Collector()) as collector:
+            address_qs.get(Address.objects.all())
+            address_qs.set(Address.objects.all(), [
+                (10, {'street': "Banpo", 'number': 15}),
+                (20, {'street': "Gangnam", 'number': 30}),
+            ])
+
+        self.assertEqual(
+            [(event.kind, event.name, event.counts['queries'])
+             for event in collector.events],
+            [
+                ('get', 'addresses', 1),
+                # Reading the rows and the instances to update
+                ('transaction', 'QuerySet.set', 2),
+                # Updating the two rows
+                ('hook', 'UnitOfWork.flush', 2),
+                # Deleting the omitted rows
+                ('hook', 'QuerySet.set_calls.<locals>.cleanup', 1),
+                # The hooks and starting the database transaction
+                ('commit', 'QuerySet.set', 4),
+                ('set', 'addresses', 6),
+            ],
+        )
+
+    def test_read_paths(self) -> None:
+        """Test the reads are reported under the item indices."""
+
+        from tests.sample_app.models import Address
+
+        Address.objects.create(pk=10, street="Banpo", number=12)
+        Address.objects.create(pk=20, street="Gangnam", number=25)
+
+        address_qs = QuerySet(Model({
+            'street': Instrumented(string, 'street'),
+            'number': integer,
+        }))
+
+        for get in (address_qs.get, async_to_sync(address_qs.aget)):
+            with self.subTest(get=get):
+                with instrument(Collector()) as collector:
+                    get(Address.objects.order_by('pk'))
+
+                self.assertEqual(
+                    [event.path for event in collector.events],
+                    [(0, 'street'), (1, 'street')],
+                )
@@ -1,37 +1,18 @@
 """Test Django adapters."""
 
-import os
-import unittest
+import json
 
-import django  # type: ignore
-from django.core.management import call_command  # type: ignore
+from django.db import connection  # type: ignore
 from django.forms import model_to_dict  # type: ignore
+from django.test.utils import CaptureQueriesContext  # type: ignore
 
-from adapt import integer, string
-from adapt.django import Model, QuerySet
+from adapt.django import Model, QuerySet, relations
+from adapt.primitives import integer, string
 
+from .utils import DjangoTestCase
 
-class TestDjango(unittest.TestCase):
 
-    def setUp(self) -> None:
-        os.environ['DJANGO_SETTINGS_MODULE'] = 'tests.sample_app.settings'
-        django.setup()
-
-        with open('/dev/null', 'w') as null:
-            call_command('check', verbosity=0, stdout=null)
-        call_command('migrate', run_syncdb=True, interactive=False, verbosity=0)
-        call_command('flush', interactive=False, verbosity=0)
-
-        self.address = Model({
-            'street': string,
-            'number': integer,
-        })
-
-        self.user = Model({
-            'name': string,
-            'email': string,
-            'address': self.address,
-        })
+class TestDjango(DjangoTestCase):
 
     def test_model(self) -> None:
         """Test updating a model."""
@@ -161,3 +142,208 @@ class TestDjango(unittest.TestCase):
         # This new object has a PK assigned automatically
         self.assertEqual(addr3.street, "Sejong")
         self.assertEqual(addr3.number, 50)
+
+    def test_queryset_related(self) -> None:
+        """Test reading nested models from a queryset."""
+
+        from tests.sample_app.models import Address, User
+
+        user_qs = QuerySet(self.user)
+
+        self.assertEqual(relations(user_qs), [('address',)])
+
+        for number in range(10):
+            User.objects.create(
+                name="User {}".format(number),
+                email="user{}@example.com".format(number),
+                address=Address.objects.create(
+                    street="Street {}".format(number),
+                    number=number,
+                ),
+            )
+
+        with CaptureQueriesContext(connection) as queries:
+            users = user_qs.get(User.objects.all())
+
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(len(users), 10)
+        self.assertEqual(users[3][1]['address'], {
+            'street': "Street 3",
+            'number': 3,
+        })
+
+    def test_queryset_prefetch(self) -> None:
+        """Test reading a nested queryset over a reverse relation."""
+
+        from tests.sample_app.models import Address, User
+
+        address_qs = QuerySet(Model({
+            'street': string,
+            'user_set': QuerySet(Model({'name': string})),
+        }))
+
+        self.assertEqual(relations(address_qs), [('user_set',)])
+
+        for number in range(5):
+            address = Address.objects.create(
+                street="Street {}".format(number),
+                number=number,
+            )
+            for resident in range(number):
+                User.objects.create(
+                    name="User {} {}".format(number, resident),
+                    email="user{}{}@example.com".format(number, resident),
+                    address=address,
+                )
+
+        with CaptureQueriesContext(connection) as queries:
+            addresses = address_qs.get(Address.objects.order_by('number'))
+
+        self.assertEqual(len(queries), 2)
+        self.assertEqual(len(addresses), 5)
+        self.assertEqual(
+            sorted(user['name'] for _, user in addresses[2][1]['user_set']),
+            ["User 2 0", "User 2 1"],
+        )
+
+    def test_queryset_projection(self) -> None:
+        """Test reading only the columns used by the lens."""
+
+        from tests.sample_app.models import Address, User
+
+        for number in range(3):
+            User.objects.create(
+                name="User {}".format(number),
+                email="user{}@example.com".format(number),
+                address=Address.objects.create(
+                    street="Street {}".format(number),
+                    number=number,
+                ),
+            )
+
+        expected = QuerySet(self.user).get(User.objects.all())
+
+        for projection in ('only', 'values'):
+            with self.subTest(projection=projection):
+                user_qs = QuerySet(self.user, projection=projection)
+
+                with CaptureQueriesContext(connection) as queries:
+                    users = user_qs.get(User.objects.all())
+
+                self.assertEqual(users, expected)
+                self.assertEqual(len(queries), 1)
+
+                name_qs = QuerySet(Model({'name': string}),
+                                   projection=projection)
+
+                with CaptureQueriesContext(connection) as queries:
+                    names = name_qs.get(User.objects.order_by('pk'))
+
+                self.assertEqual(
+                    [item for _, item in names],
+                    [{'name': "User {}".format(number)}
+                     for number in range(3)],
+                )
+                self.assertNotIn('email', queries[0]['sql'])
+
+    def test_model_changed_fields(self) -> None:
+        """Test saving only the changed fields of a model."""
+
+        from tests.sample_app.models import Address
+
+        address_obj = Address.objects.create(
+            street="Banpo",
+            number=12,
+        )
+
+        with CaptureQueriesContext(connection) as queries:
+            self.address.set(address_obj, {
+                'street': "Banpo",
+                'number': 12,
+            })
+
+        self.assertEqual(len(queries), 0)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.address.set(address_obj, {
+                'street': "Banpo",
+                'number': 15,
+            })
+
+        updates = [
+            query['sql']
+            for query in queries
+            if query['sql'].startswith('UPDATE')
+        ]
+        self.assertEqual(len(updates), 1)
+        self.assertIn('number', updates[0])
+        self.assertNotIn('street', updates[0])
+
+        address_obj.refresh_from_db()
+        self.assertEqual(address_obj.number, 15)
+
+    def test_model_partial(self) -> None:
+        """Test saving only the supplied fields of a model."""
+
+        from tests.sample_app.models import Address
+
+        address = Model({
+            'street': string,
+            'number': integer,
+        }, partial=True)
+
+        address_obj = Address.objects.create(
+            street="Banpo",
+            number=12,
+        )
+        Address.objects.filter(pk=address_obj.pk).update(street="Gangnam")
+
+        with CaptureQueriesContext(connection) as queries:
+            address.set(address_obj, {'number': 15})
+
+        updates = [
+            query['sql']
+            for query in queries
+            if query['sql'].startswith('UPDATE')
+        ]
+        self.assertEqual(len(updates), 1)
+        self.assertIn('number', updates[0])
+        self.assertNotIn('street', updates[0])
+
+        # The stale street in memory is not written back
+        address_obj.refresh_from_db()
+        self.assertEqual(address_obj.street, "Gangnam")
+        self.assertEqual(address_obj.number, 15)
+
+    def test_queryset_stream(self) -> None:
+        """Test streaming a queryset."""
+
+        from tests.sample_app.models import Address, User
+
+        for number in range(5):
+            User.objects.create(
+                name="User {}".format(number),
+                email="user{}@example.com".format(number),
+                address=Address.objects.create(
+                    street="Street {}".format(number),
+                    number=number,
+                ),
+            )
+
+        for projection in (None, 'only', 'values'):
+            with self.subTest(projection=projection):
+                user_qs = QuerySet(self.user, projection=projection)
+                users = User.objects.order_by('pk')
+
+                stream = user_qs.stream(users, chunk_size=2)
+                lines = [
+                    json.dumps([key, value]) + '\n'
+                    for key, value in stream
+                ]
+
+                self.assertEqual(
+                    [tuple(json.loads(line)) for line in lines],
+                    user_qs.get(User.objects.order_by('pk')),
+                )
+                # The instances are not cached on the queryset
+                self.assertIsNone(users._result_cache)
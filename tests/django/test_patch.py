@@ -0,0 +1,183 @@
+"""Test patching querysets."""
+
+import json
+
+from asgiref.sync import async_to_sync
+from django.db import connection  # type: ignore
+from django.test.utils import CaptureQueriesContext  # type: ignore
+
+from adapt.django import QuerySet, diff
+from adapt.errors import ValidationError
+
+from .utils import DjangoTestCase
+
+
+class TestPatch(DjangoTestCase):
+    """Test the patch operations of the queryset lens."""
+
+    def setUp(self) -> None:
+        super().setUp()
+
+        from tests.sample_app.models import Address
+
+        Address.objects.create(pk=10, street="Banpo", number=12)
+        Address.objects.create(pk=20, street="Gangnam", number=25)
+        Address.objects.create(pk=30, street="Sejong", number=50)
+
+    def addresses(self) -> object:
+        """The addresses in the database."""
+
+        from tests.sample_app.models import Address
+
+        return sorted(
+            Address.objects.values_list('pk', 'street', 'number'))
+
+    def test_patch(self) -> None:
+        """Test adding, updating and removing instances."""
+
+        from tests.sample_app.models import Address
+
+        for bulk in (False, True):
+            with self.subTest(bulk=bulk):
+                Address.objects.filter(pk__gte=40).delete()
+                Address.objects.update_or_create(
+                    pk=20, defaults={'street': "Gangnam", 'number': 25})
+                Address.objects.update_or_create(
+                    pk=30, defaults={'street': "Sejong", 'number': 50})
+
+                address_qs = QuerySet(self.address, bulk=bulk)
+                address_qs.patch(Address.objects.all(), [
+                    ('update', 20, {'street': "Gangnam", 'number': 30}),
+                    ('remove', 30, None),
+                    ('add', 40, {'street': "Chenggyecheon", 'number': 70}),
+                ])
+
+                self.assertEqual(self.addresses(), [
+                    (10, "Banpo", 12),
+                    (20, "Gangnam", 30),
+                    (40, "Chenggyecheon", 70),
+                ])
+
+    def test_untouched(self) -> None:
+        """Test the instances not mentioned are not read."""
+
+        from tests.sample_app.models import Address
+
+        address_qs = QuerySet(self.address, bulk=True)
+
+        with CaptureQueriesContext(connection) as queries:
+            address_qs.patch(Address.objects.all(), [
+                ('update', 20, {'street': "Gangnam", 'number': 30}),
+            ])
+
+        for query in queries:
+            self.assertNotIn('NOT IN', query['sql'])
+            if query['sql'].startswith('SELECT'):
+                self.assertIn('IN (20)', query['sql'])
+
+    def test_errors(self) -> None:
+        """Test the operations conflicting with the instances."""
+
+        from tests.sample_app.models import Address
+
+        address_qs = QuerySet(self.address)
+
+        with self.assertRaises(ValidationError) as raised:
+            address_qs.patch(Address.objects.all(), [
+                ('add', 10, {'street': "Banpo", 'number': 15}),
+                ('update', 20, {'street': "Gangnam", 'number': 30}),
+                ('update', 40, {'street': "Sejong", 'number': 50}),
+                ('remove', 50, None),
+                ('move', 30, None),
+                ('remove', 30),
+                "remove",
+                ('update', "thirty", None),
+            ])
+
+        errors = raised.exception.args[0]
+        self.assertEqual(
+            {index: nested.errors for index, nested in errors.nested.items()},
+            {
+                0: ["Already exists."],
+                2: ["Does not exist."],
+                3: ["Does not exist."],
+                4: ["Unknown operation: move."],
+                5: ["Expected an operation, a primary key and an item."],
+                6: ["Expected an operation, a primary key and an item."],
+                7: ["Invalid primary key."],
+            },
+        )
+
+        # Nothing is written
+        self.assertEqual(self.addresses(), [
+            (10, "Banpo", 12),
+            (20, "Gangnam", 25),
+            (30, "Sejong", 50),
+        ])
+
+    def test_json(self) -> None:
+        """Test applying a patch sent as JSON."""
+
+        from tests.sample_app.models import Address
+
+        address_qs = QuerySet(self.address)
+        previous = address_qs.get(Address.objects.all())
+
+        Address.objects.filter(pk=20).update(number=30)
+        Address.objects.filter(pk=30).delete()
+
+        # Restore the previous state from the patch back to it
+        patch = json.loads(json.dumps(diff(
+            address_qs.get(Address.objects.all()), previous)))
+        self.assertIsInstance(patch[0], list)
+        address_qs.patch(Address.objects.all(), patch)
+
+        self.assertEqual(self.addresses(), [
+            (10, "Banpo", 12),
+            (20, "Gangnam", 25),
+            (30, "Sejong", 50),
+        ])
+
+    def test_diff(self) -> None:
+        """Test the diff between two results applies as a patch."""
+
+        from tests.sample_app.models import Address
+
+        address_qs = QuerySet(self.address)
+        previous = address_qs.get(Address.objects.all())
+
+        Address.objects.filter(pk=10).update(number=15)
+        Address.objects.filter(pk=30).delete()
+        Address.objects.create(pk=40, street="Chenggyecheon", number=70)
+
+        operations = address_qs.diff(Address.objects.all(), previous)
+        self.assertEqual(sorted(operations), [
+            ('add', 40, {'street': "Chenggyecheon", 'number': 70}),
+            ('remove', 30, None),
+            ('update', 10, {'street': "Banpo", 'number': 15}),
+        ])
+
+        self.assertEqual(diff(previous, previous), [])
+
+    def test_async(self) -> None:
+        """Test patching asynchronously."""
+
+        from tests.sample_app.models import Address
+
+        for bulk in (False, True):
+            with self.subTest(bulk=bulk):
+                Address.objects.filter(pk__gte=40).delete()
+                Address.objects.update_or_create(
+                    pk=30, defaults={'street': "Sejong", 'number': 50})
+
+                address_qs = QuerySet(self.address, bulk=bulk)
+                async_to_sync(address_qs.apatch)(Address.objects.all(), [
+                    ('remove', 30, None),
+                    ('add', 40, {'street': "Chenggyecheon", 'number': 70}),
+                ])
+
+                self.assertEqual(self.addresses(), [
+                    (10, "Banpo", 12),
+                    (20, "Gangnam", 25),
+                    (40, "Chenggyecheon", 70),
+                ])
@@ -0,0 +1,120 @@
+"""Test reading from a replica database."""
+
+from asgiref.sync import async_to_sync
+from django.core.management import call_command  # type: ignore
+
+from adapt.django import QuerySet
+from adapt.transaction import atomic
+
+from .utils import DjangoTestCase
+
+
+class TestReplica(DjangoTestCase):
+    """Test routing the reads to a replica."""
+
+    def setUp(self) -> None:
+        super().setUp()
+
+        call_command('migrate', run_syncdb=True, interactive=False,
+                     verbosity=0, database='replica')
+        call_command('flush', interactive=False, verbosity=0,
+                     database='replica')
+
+        from tests.sample_app.models import Address
+
+        # The replica is behind the primary
+        Address.objects.create(pk=1, street="Banpo", number=12)
+        Address.objects.create(pk=2, street="Gangnam", number=25)
+        Address.objects.using('replica').create(
+            pk=1, street="Banpo", number=10)
+
+        self.address_qs = QuerySet(self.address, replica='replica')
+
+    def streets(self, using: str) -> object:
+        """The addresses in the database."""
+
+        from tests.sample_app.models import Address
+
+        return sorted(Address.objects.using(using)
+                      .values_list('pk', 'street', 'number'))
+
+    def test_get(self) -> None:
+        """Test the reads go to the replica."""
+
+        from tests.sample_app.models import Address
+
+        replica = [(1, {'street': "Banpo", 'number': 10})]
+
+        self.assertEqual(self.address_qs.get(Address.objects.all()), replica)
+        self.assertEqual(
+            list(self.address_qs.stream(Address.objects.all())), replica)
+        self.assertEqual(
+            async_to_sync(self.address_qs.aget)(Address.objects.all()),
+            replica)
+        self.assertEqual(
+            self.address_qs.changes(Address.objects.all(), 'pk').items,
+            replica)
+
+        # Without a replica, the target's database is read
+        self.assertEqual(
+            QuerySet(self.address).get(Address.objects.all()), [
+                (1, {'street': "Banpo", 'number': 12}),
+                (2, {'street': "Gangnam", 'number': 25}),
+            ])
+
+    def test_transaction(self) -> None:
+        """Test the reads inside a transaction go to the primary."""
+
+        from tests.sample_app.models import Address
+
+        @atomic
+        def read() -> object:
+            """Read the addresses inside a transaction."""
+            return self.address_qs.get(Address.objects.all())
+
+        self.assertEqual(read(), [
+            (1, {'street': "Banpo", 'number': 12}),
+            (2, {'street': "Gangnam", 'number': 25}),
+        ])
+
+    def test_set(self) -> None:
+        """Test the lookups and the writes go to the primary."""
+
+        from tests.sample_app.models import Address
+
+        for asynchronous in (False, True):
+            with self.subTest(asynchronous=asynchronous):
+                value = [
+                    (1, {'street': "Banpo", 'number': 13}),
+                    (2, {'street': "Gangnam", 'number': 26}),
+                ]
+                if asynchronous:
+                    async_to_sync(self.address_qs.aset)(
+                        Address.objects.all(), value)
+                else:
+                    self.address_qs.set(Address.objects.all(), value)
+
+                # The second address, missing from the replica, is updated
+                self.assertEqual(self.streets('default'), [
+                    (1, "Banpo", 13),
+                    (2, "Gangnam", 26),
+                ])
+                self.assertEqual(self.streets('replica'), [
+                    (1, "Banpo", 10),
+                ])
+
+                Address.objects.filter(pk=1).update(number=12)
+                Address.objects.filter(pk=2).update(number=25)
+
+    def test_patch(self) -> None:
+        """Test the existence is checked on the primary."""
+
+        from tests.sample_app.models import Address
+
+        self.address_qs.patch(Address.objects.all(), [
+            ('update', 2, {'street': "Gangnam", 'number': 30}),
+            ('remove', 1, None),
+        ])
+
+        self.assertEqual(self.streets('default'), [(2, "Gangnam", 30)])
+        self.assertEqual(self.streets('replica'), [(1, "Banpo", 10)])
@@ -0,0 +1,112 @@
+"""Test database transactions with Django adapters."""
+
+from django.db import connection  # type: ignore
+from django.db.transaction import atomic as db_atomic  # type: ignore
+from django.test.utils import CaptureQueriesContext  # type: ignore
+
+from adapt.transaction import atomic, on_commit
+
+from .utils import DjangoTestCase
+
+
+class CustomException(Exception):
+    """An exception raised while committing."""
+
+    pass
+
+
+def fail() -> None:
+    """A commit hook failing."""
+
+    raise CustomException
+
+
+class TestTransaction(DjangoTestCase):
+    """Test the writes happen in a database transaction."""
+
+    def create_user(self) -> None:
+        """Create a user with an address."""
+
+        from tests.sample_app.models import Address, User
+
+        User.objects.create(
+            name="Ayano",
+            email="ayano@example.com",
+            address=Address.objects.create(
+                street="Banpo",
+                number=12,
+            ),
+        )
+
+    def test_single_commit(self) -> None:
+        """Test a nested update is committed once."""
+
+        from tests.sample_app.models import User
+
+        self.create_user()
+        user_obj = User.objects.get()
+
+        with CaptureQueriesContext(connection) as queries:
+            self.user.set(user_obj, {
+                'name': "Nocchi",
+                'email': "nocchi@example.com",
+                'address': {
+                    'street': "Gangnam",
+                    'number': 25,
+                },
+            })
+
+        # The address is loaded, then both models are saved at once
+        statements = [query['sql'].split()[0] for query in queries]
+        self.assertEqual(statements, [
+            'SELECT',
+            'BEGIN',
+            'UPDATE',
+            'UPDATE',
+            'COMMIT',
+        ])
+
+    def test_rollback(self) -> None:
+        """Test a failure while committing rolls back all the writes."""
+
+        from tests.sample_app.models import User
+
+        self.create_user()
+        user_obj = User.objects.get()
+
+        @atomic
+        def update() -> None:
+            """Update the user and fail afterwards."""
+
+            self.user.set(user_obj, {
+                'name': "Nocchi",
+                'email': "nocchi@example.com",
+                'address': {
+                    'street': "Gangnam",
+                    'number': 25,
+                },
+            })
+            on_commit(fail)
+
+        with self.assertRaises(CustomException):
+            update()
+
+        user_obj = User.objects.get()
+        self.assertEqual(user_obj.name, "Ayano")
+        self.assertEqual(user_obj.address.street, "Banpo")
+
+    def test_outer_transaction(self) -> None:
+        """Test the writes join an existing database transaction."""
+
+        from tests.sample_app.models import Address
+
+        with self.assertRaises(CustomException):
+            with db_atomic():
+                self.address.set(Address(), {
+                    'street': "Gangnam",
+                    'number': 25,
+                })
+                self.assertEqual(Address.objects.count(), 1)
+                raise CustomException
+
+        self.assertEqual(Address.objects.count(), 0)
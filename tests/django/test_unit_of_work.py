@@ -0,0 +1,138 @@
+"""Test the unit of work of Django adapters."""
+
+from typing import List
+
+from django.db import connection  # type: ignore
+from django.test.utils import CaptureQueriesContext  # type: ignore
+
+from adapt.django import (Model, QuerySet, UnitOfWork, dependency_order,
+                          unit_of_work)
+from adapt.primitives import integer, string
+from adapt.transaction import atomic
+
+from .utils import DjangoTestCase
+
+
+def statements(queries: CaptureQueriesContext) -> List[str]:
+    """The kinds of the statements executed."""
+
+    return [query['sql'].split()[0] for query in queries]
+
+
+class TestUnitOfWork(DjangoTestCase):
+    """Test merging and ordering the writes."""
+
+    def test_merge(self) -> None:
+        """Test saving the same row twice writes it once."""
+
+        from tests.sample_app.models import Address
+
+        address_obj = Address.objects.create(street="Banpo", number=12)
+        same_address_obj = Address.objects.get()
+
+        @atomic
+        def update() -> None:
+            """Update the same row through different objects."""
+
+            self.address.set(address_obj, {
+                'street': "Gangnam",
+                'number': 12,
+            })
+            self.address.set(same_address_obj, {
+                'street': "Banpo",
+                'number': 25,
+            })
+
+        with CaptureQueriesContext(connection) as queries:
+            update()
+
+        self.assertEqual(statements(queries), ['BEGIN', 'UPDATE', 'COMMIT'])
+
+        # Same as saving the changed fields of each object in turn
+        address_obj.refresh_from_db()
+        self.assertEqual(address_obj.street, "Gangnam")
+        self.assertEqual(address_obj.number, 25)
+
+    def test_bulk_nested(self) -> None:
+        """Test the nested models are written in bulk model by model."""
+
+        from tests.sample_app.models import Address, User
+
+        for number in range(10):
+            User.objects.create(
+                name="User {}".format(number),
+                email="user{}@example.com".format(number),
+                address=Address.objects.create(
+                    street="Street {}".format(number),
+                    number=number,
+                ),
+            )
+
+        user_qs = QuerySet(Model({
+            'name': string,
+            'email': string,
+            'address': Model({
+                'street': string,
+                'number': integer,
+            }, bulk=True),
+        }), bulk=True)
+
+        value = [
+            (pk, {
+                'name': item['name'],
+                'email': item['email'],
+                'address': {
+                    'street': item['address']['street'],
+                    'number': item['address']['number'] + 1,
+                },
+            })
+            for pk, item in user_qs.get(User.objects.all())
+        ]
+
+        with CaptureQueriesContext(connection) as queries:
+            user_qs.set(User.objects.all(), value)
+
+        # Load the users with addresses, update the addresses, and find the
+        # users to delete
+        self.assertEqual(
+            statements(queries),
+            ['SELECT', 'BEGIN', 'UPDATE', 'SELECT', 'COMMIT'],
+        )
+        self.assertEqual(
+            sorted(Address.objects.values_list('number', flat=True)),
+            list(range(1, 11)),
+        )
+
+    def test_dependency_order(self) -> None:
+        """Test the referenced models are created first."""
+
+        from tests.sample_app.models import Address, User
+
+        self.assertEqual(dependency_order([User, Address]), [Address, User])
+
+        address_obj = Address(street="Banpo", number=12)
+        user_obj = User(
+            name="Ayano",
+            email="ayano@example.com",
+            address=address_obj,
+        )
+
+        work = UnitOfWork()
+        work.add(user_obj, 'default', bulk=True)
+        work.add(address_obj, 'default', bulk=True)
+        work.flush()
+
+        self.assertEqual(User.objects.get().address, Address.objects.get())
+
+    def test_transaction(self) -> None:
+        """Test each transaction has its own unit of work."""
+
+        @atomic
+        def get() -> UnitOfWork:
+            """Get the unit of work twice."""
+
+            work = unit_of_work()
+            self.assertIs(unit_of_work(), work)
+            return work
+
+        self.assertIsNot(get(), get())
@@ -0,0 +1,34 @@
+"""Utilities for Django tests."""
+
+import os
+import unittest
+
+import django  # type: ignore
+from django.core.management import call_command  # type: ignore
+
+from adapt import integer, string
+from adapt.django import Model
+
+
+class DjangoTestCase(unittest.TestCase):
+    """Base class for tests using the sample Django app."""
+
+    def setUp(self) -> None:
+        os.environ['DJANGO_SETTINGS_MODULE'] = 'tests.sample_app.settings'
+        django.setup()
+
+        with open('/dev/null', 'w') as null:
+            call_command('check', verbosity=0, stdout=null)
+        call_command('migrate', run_syncdb=True, interactive=False, verbosity=0)
+        call_command('flush', interactive=False, verbosity=0)
+
+        self.address = Model({
+            'street': string,
+            'number': integer,
+        })
+
+        self.user = Model({
+            'name': string,
+            'email': string,
+            'address': self.address,
+        })
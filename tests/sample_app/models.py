@@ -16,3 +16,11 @@ class User(models.Model):  # type: ignore
     name = models.CharField(max_length=100)
     email = models.EmailField()
     address = models.ForeignKey(Address, on_delete=models.CASCADE)
+
+
+class Article(models.Model):  # type: ignore
+    """An article edited concurrently."""
+
+    title = models.CharField(max_length=100)
+    version = models.IntegerField(default=0)
+    deleted = models.BooleanField(default=False)
@@ -0,0 +1,45 @@
+"""Test the caches."""
+
+import unittest
+
+from adapt.cache import LRUCache
+
+
+class TestLRUCache(unittest.TestCase):
+    """Test the in-process cache."""
+
+    def test_get_set(self) -> None:
+        """Test storing and finding values."""
+
+        cache = LRUCache()
+        cache.set_many({'one': 1, ('two', 2): 2})
+
+        self.assertEqual(cache.get_many(['one', ('two', 2), 'three']), {
+            'one': 1,
+            ('two', 2): 2,
+        })
+
+    def test_eviction(self) -> None:
+        """Test the least recently used values are evicted."""
+
+        cache = LRUCache(max_size=3)
+        cache.set_many({'one': 1, 'two': 2, 'three': 3})
+
+        # Using a value makes it recent
+        cache.get_many(['one'])
+        cache.set_many({'four': 4})
+
+        self.assertEqual(len(cache), 3)
+        self.assertEqual(
+            cache.get_many(['one', 'two', 'three', 'four']),
+            {'one': 1, 'three': 3, 'four': 4},
+        )
+
+        # Setting a value again makes it recent too
+        cache.set_many({'three': 30})
+        cache.set_many({'five': 5, 'six': 6})
+
+        self.assertEqual(
+            cache.get_many(['one', 'three', 'four', 'five', 'six']),
+            {'three': 30, 'five': 5, 'six': 6},
+        )
@@ -0,0 +1,197 @@
+"""Test compiling lenses."""
+
+import unittest
+from typing import Any
+
+from adapt.compiler import Compiled, compile_lens
+from adapt.lens import Lens
+from adapt.objects import Attribute, Object
+from adapt.primitives import integer, string
+
+from .utils import Address, test_person
+
+
+class Upper(Lens):
+    """A lens the compiler doesn't know about."""
+
+    def get(self, target: Any) -> Any:
+        return target.upper()
+
+    def set(self, target: Any, value: Any) -> Any:
+        return value.lower()
+
+
+class TestCompiler(unittest.TestCase):
+    """Test compiled lenses behave as the original ones."""
+
+    def setUp(self) -> None:
+        self.person = Object({
+            'name': string,
+            'email': Upper(),
+            'address': Object({
+                'street': string,
+                'number': integer,
+            }),
+        })
+        self.compiled = compile_lens(self.person)
+
+    def test_get(self) -> None:
+        """Test getting the value."""
+
+        person_obj = test_person()
+
+        self.assertEqual(
+            self.compiled.get(person_obj),
+            self.person.get(person_obj),
+        )
+        self.assertEqual(self.compiled.get(person_obj)['email'],
+                         "AYANO@NAVER.COM")
+
+    def test_set(self) -> None:
+        """Test setting the value."""
+
+        value = {
+            'name': "Nocchi",
+            'email': "NOCCHI@NAVER.COM",
+            'address': {
+                'street': "Gangnam",
+                'number': 25,
+            },
+        }
+
+        person_obj = test_person()
+        address_obj = person_obj.address
+
+        person_obj_ = self.compiled.set(person_obj, value)
+
+        self.assertIs(person_obj_, person_obj)
+        self.assertIs(person_obj_.address, address_obj)
+        self.assertEqual(
+            self.person.get(person_obj_),
+            self.person.get(self.person.set(test_person(), value)),
+        )
+        self.assertEqual(person_obj_.email, "nocchi@naver.com")
+
+    def test_set_errors(self) -> None:
+        """Test the errors are the same as from the original lens."""
+
+        for value in [
+                "not a dictionary",
+                {'name': "Nocchi"},
+                {
+                    'name': "Nocchi",
+                    'email': "nocchi@naver.com",
+                    'address': {
+                        'street': "Gangnam",
+                        'number': "25",
+                    },
+                },
+        ]:
+            with self.subTest(value=value):
+                with self.assertRaises(Exception) as original:
+                    self.person.set(test_person(), value)
+                with self.assertRaises(Exception) as compiled:
+                    self.compiled.set(test_person(), value)
+                self.assertIs(type(compiled.exception),
+                              type(original.exception))
+                self.assertEqual(compiled.exception.args,
+                                 original.exception.args)
+
+    def test_composed(self) -> None:
+        """Test compiling a composition of attributes."""
+
+        number = compile_lens(Attribute('address') * Attribute('number'))
+
+        person_obj = test_person()
+        self.assertEqual(number.get(person_obj), 12)
+
+        person_obj_ = number.set(person_obj, 14)
+        assert person_obj_.address is not None
+        self.assertEqual(person_obj_.address.number, 14)
+
+    def test_partial(self) -> None:
+        """Test compiling a lens in partial mode."""
+
+        person = compile_lens(Object({
+            'name': string,
+            'address': Object({
+                'street': string,
+                'number': integer,
+            }, partial=True),
+        }, partial=True))
+
+        person_obj = person.set(test_person(), {
+            'address': {'number': 25},
+        })
+
+        self.assertEqual(person.get(person_obj), {
+            'name': "Ayano",
+            'address': {'street': "Banpo", 'number': 25},
+        })
+
+    def test_custom_modify(self) -> None:
+        """Test a composition with a custom outer modify is not inlined."""
+
+        class Doubled(Attribute):
+            """An attribute lens doubling the values set through it."""
+
+            def modify(self, target: Any, function: Any,
+                       argument: Any) -> Any:
+                return super().modify(target, function, argument * 2)
+
+        number = Doubled('address') * Attribute('number')
+        compiled = compile_lens(number)
+
+        person_obj = compiled.set(test_person(), 14)
+        assert person_obj.address is not None
+        self.assertEqual(person_obj.address.number, 28)
+
+    def test_contexts(self) -> None:
+        """
+        Test only the lenses called as is record their errors under the
+        attribute names, and only inside transactions.
+        """
+
+        source = Compiled(self.person).source.split('def set_recording')
+        self.assertNotIn("with ", source[0])
+        self.assertEqual(source[1].count("with "), 1)
+        self.assertIn("('email')", source[1])
+
+    def test_unused_target(self) -> None:
+        """Test the attributes only checked for type are not read."""
+
+        class Named:
+            """An object counting the reads of its name."""
+
+            reads = 0
+
+            def __init__(self) -> None:
+                self._name = "Ayano"
+
+            @property
+            def name(self) -> str:
+                """The name, counting the reads."""
+                self.reads += 1
+                return self._name
+
+            @name.setter
+            def name(self, value: str) -> None:
+                self._name = value
+
+        named = compile_lens(Object({'name': string})).set(
+            Named(), {'name': "Nocchi"})
+
+        self.assertEqual(named.reads, 0)
+        self.assertEqual(named.name, "Nocchi")
+
+    def test_keyword_attribute(self) -> None:
+        """Test compiling attributes named as Python keywords."""
+
+        lens = compile_lens(Object({'class': string}))
+
+        address = Address("Banpo", 12)
+        setattr(address, 'class', "Commercial")
+        self.assertEqual(lens.get(address), {'class': "Commercial"})
+
+        lens.set(address, {'class': "Residential"})
+        self.assertEqual(lens.get(address), {'class': "Residential"})
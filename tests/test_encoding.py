@@ -0,0 +1,107 @@
+"""Test encoding and decoding JSON with lenses."""
+
+import json
+import unittest
+from typing import Any, List, Union
+
+from adapt.encoding import compile_encoder, decode_items
+from adapt.lens import Lens
+from adapt.objects import Attribute, Object
+from adapt.primitives import integer, string
+
+from .utils import test_person
+
+
+class Upper(Lens):
+    """A lens the encoder doesn't know about."""
+
+    def get(self, target: Any) -> Any:
+        return target.upper()
+
+    def set(self, target: Any, value: Any) -> Any:
+        return value.lower()
+
+
+class TestEncoder(unittest.TestCase):
+    """Test the compiled encoders."""
+
+    def test_encode(self) -> None:
+        """Test the encoded text is the same as from the value."""
+
+        person = Object({
+            'name': string,
+            'email': Upper(),
+            'address': Object({
+                'street': string,
+                'number': integer,
+                'unit': integer,
+            }),
+        })
+
+        for name, unit in (
+                ("Ayano", None),
+                ("\"Nocchi\"\n", 3.5),
+                ("あ~ちゃん", [True, {'floor': 2}]),
+        ):
+            with self.subTest(name=name):
+                person_obj = test_person()
+                person_obj.name = name
+                setattr(person_obj.address, 'unit', unit)
+
+                self.assertEqual(
+                    compile_encoder(person)(person_obj),
+                    json.dumps(person.get(person_obj)),
+                )
+
+    def test_composed(self) -> None:
+        """Test encoding a composition of lenses."""
+
+        number = compile_encoder(Attribute('address') * Attribute('number'))
+        self.assertEqual(number(test_person()), '12')
+
+
+class TestDecoder(unittest.TestCase):
+    """Test decoding the items incrementally."""
+
+    def test_decode(self) -> None:
+        """Test decoding the items split into chunks anywhere."""
+
+        items: List[Any] = [
+            [10, {'street': "Banpo", 'number': 12}],
+            [None, {'street': "강남", 'number': 1234567}],
+            ["key", [1.5, True, None]],
+        ]
+        text = ' ' + json.dumps(items, ensure_ascii=False, indent=1) + '\n'
+        data = text.encode()
+
+        for size in range(1, len(data) + 1):
+            with self.subTest(size=size):
+                chunks: List[Union[str, bytes]] = [
+                    data[start:start + size]
+                    for start in range(0, len(data), size)
+                ]
+                self.assertEqual(
+                    list(decode_items(chunks)),
+                    [(key, item) for key, item in items],
+                )
+
+        self.assertEqual(list(decode_items(['[', ' ', ']'])), [])
+
+    def test_invalid(self) -> None:
+        """Test decoding invalid JSON."""
+
+        for text in ('{}', '[[1, 2] [3, 4]]', '[[1, 2]', '[[1, 2], [3', '',
+                     '[[1, 2]] [', '[[1, 2]]]'):
+            with self.subTest(text=text):
+                with self.assertRaises(ValueError):
+                    list(decode_items([text]))
+
+        for text in ('[[1, 2], 3]', '[[1, 2], [3, 4, 5]]', '[[1, 2], {}]'):
+            with self.subTest(text=text):
+                with self.assertRaisesRegex(
+                        ValueError,
+                        r"^Expected a primary key and an item at index 1\.$"):
+                    list(decode_items([text]))
+
+        # Whitespace after the array is accepted
+        self.assertEqual(list(decode_items(['[[1, 2]]', ' \n'])), [(1, 2)])
@@ -0,0 +1,86 @@
+"""Test error collections."""
+
+import json
+import unittest
+
+from adapt.errors import Errors
+
+
+class TestErrors(unittest.TestCase):
+    """Test recording and viewing errors."""
+
+    def setUp(self) -> None:
+        self.errors = Errors()
+        self.errors.add([], "Outer error")
+        self.errors.add([0, 'name'], "Name error")
+        self.errors.add([1, 'address', 'street'], "Street error")
+        self.errors.add([0, 'name'], "Another name error")
+
+    def test_nested(self) -> None:
+        """Test the nested view."""
+
+        self.assertEqual(len(self.errors), 4)
+        self.assertEqual(self.errors.errors, ["Outer error"])
+        self.assertEqual(list(self.errors.nested.keys()), [0, 1])
+
+        first = self.errors.nested[0]
+        self.assertEqual(first.errors, [])
+        self.assertEqual(first.nested['name'].errors,
+                         ["Name error", "Another name error"])
+        self.assertEqual(first.nested['name'].nested, {})
+
+        street = self.errors.nested[1].nested['address'].nested['street']
+        self.assertEqual(street.errors, ["Street error"])
+
+    def test_shared_paths(self) -> None:
+        """Test the equal paths are stored once."""
+
+        first, _, _, last = self.errors.records
+        self.assertIs(first[0], ())
+        self.assertEqual(last[0], (0, 'name'))
+        self.assertIs(last[0], self.errors.records[1][0])
+
+    def test_json(self) -> None:
+        """Test serializing the errors to JSON."""
+
+        self.assertEqual(json.loads(''.join(self.errors.json())), {
+            'errors': ["Outer error"],
+            'nested': {
+                '0': {
+                    'errors': [],
+                    'nested': {
+                        'name': {
+                            'errors': ["Name error", "Another name error"],
+                            'nested': {},
+                        },
+                    },
+                },
+                '1': {
+                    'errors': [],
+                    'nested': {
+                        'address': {
+                            'errors': [],
+                            'nested': {
+                                'street': {
+                                    'errors': ["Street error"],
+                                    'nested': {},
+                                },
+                            },
+                        },
+                    },
+                },
+            },
+        })
+
+        self.assertEqual(
+            json.loads(''.join(self.errors.nested[0].json())),
+            {
+                'errors': [],
+                'nested': {
+                    'name': {
+                        'errors': ["Name error", "Another name error"],
+                        'nested': {},
+                    },
+                },
+            },
+        )
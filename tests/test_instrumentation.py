@@ -0,0 +1,179 @@
+"""Test instrumenting lenses and transactions."""
+
+import asyncio
+import logging
+import unittest
+
+from adapt.compiler import compile_lens
+from adapt.errors import ValidationError
+from adapt.instrumentation import (Collector, Instrumented, LoggingSink,
+                                   instrument)
+from adapt.objects import Object
+from adapt.primitives import integer, string
+from adapt.transaction import atomic, error, on_commit
+
+from .utils import test_person
+
+
+class TestInstrumentation(unittest.TestCase):
+    """Test instrumentation events."""
+
+    def setUp(self) -> None:
+        self.person = Object({
+            'name': Instrumented(string, 'name'),
+            'address': Instrumented(Object({
+                'street': Instrumented(string, 'street'),
+                'number': integer,
+            }), 'address'),
+        })
+
+    def test_disabled(self) -> None:
+        """Test nothing is collected without a sink."""
+
+        collector = Collector()
+        with instrument(collector):
+            pass
+
+        self.person.get(test_person())
+        atomic(self.person.set)(test_person(), {
+            'name': "Nocchi",
+            'address': {'street': "Gangnam", 'number': 25},
+        })
+
+        self.assertEqual(collector.events, [])
+
+    def test_lens(self) -> None:
+        """Test measuring the lenses under their context paths."""
+
+        with instrument(Collector()) as collector:
+            self.person.get(test_person())
+
+        self.assertEqual(
+            [(event.kind, event.name, event.path)
+             for event in collector.events],
+            [
+                ('get', 'name', ('name',)),
+                ('get', 'street', ('address', 'street')),
+                ('get', 'address', ('address',)),
+            ],
+        )
+        for event in collector.events:
+            self.assertGreaterEqual(event.duration, 0)
+            self.assertIsNone(event.error)
+
+    def test_compiled(self) -> None:
+        """Test measuring the lenses of a compiled lens."""
+
+        with instrument(Collector()) as collector:
+            compile_lens(self.person).get(test_person())
+
+        self.assertEqual(
+            [(event.name, event.path) for event in collector.events],
+            [
+                ('name', ('name',)),
+                ('street', ('address', 'street')),
+                ('address', ('address',)),
+            ],
+        )
+
+    def test_transaction(self) -> None:
+        """Test measuring the transaction phases and the hooks."""
+
+        def hook() -> None:
+            """A commit hook."""
+
+        @atomic
+        def action() -> None:
+            """Set the person and add a hook."""
+
+            self.person.set(test_person(), {
+                'name': "Nocchi",
+                'address': {'street': "Gangnam", 'number': 25},
+            })
+            on_commit(hook)
+
+        with instrument(Collector()) as collector:
+            action()
+
+        self.assertEqual(
+            [(event.kind, event.name, event.path)
+             for event in collector.events],
+            [
+                ('set', 'name', ('name',)),
+                ('set', 'street', ('address', 'street')),
+                ('set', 'address', ('address',)),
+                ('transaction', action.__qualname__, ()),
+                ('hook', hook.__qualname__, ()),
+                ('commit', action.__qualname__, ()),
+            ],
+        )
+
+    def test_error(self) -> None:
+        """Test the events of failed operations."""
+
+        @atomic
+        def action() -> None:
+            """Record an error."""
+
+            error("Invalid.")
+
+        with instrument(Collector()) as collector:
+            with self.assertRaises(ValidationError):
+                action()
+
+        self.assertEqual([event.kind for event in collector.events],
+                         ['transaction'])
+        self.assertIsNone(collector.events[0].error)
+
+        with instrument(Collector()) as collector:
+            with self.assertRaises(TypeError):
+                self.person.set(test_person(), {
+                    'name': 1,
+                    'address': {'street': "Gangnam", 'number': 25},
+                })
+
+        self.assertIsInstance(collector.events[0].error, TypeError)
+
+    def test_async(self) -> None:
+        """Test measuring asynchronous transactions."""
+
+        async def hook() -> None:
+            """An asynchronous commit hook."""
+
+        @atomic
+        async def action() -> None:
+            """Get the person and add a hook."""
+
+            await self.person.aget(test_person())
+            on_commit(hook)
+
+        with instrument(Collector()) as collector:
+            asyncio.run(action())
+
+        self.assertEqual(
+            [(event.kind, event.name, event.path)
+             for event in collector.events],
+            [
+                ('get', 'name', ('name',)),
+                ('get', 'street', ('address', 'street')),
+                ('get', 'address', ('address',)),
+                ('transaction', action.__qualname__, ()),
+                ('hook', hook.__qualname__, ()),
+                ('commit', action.__qualname__, ()),
+            ],
+        )
+
+    def test_logging(self) -> None:
+        """Test logging the events."""
+
+        logger = logging.getLogger(__name__)
+
+        with self.assertLogs(logger, logging.DEBUG) as logs:
+            with instrument(LoggingSink(logger)):
+                atomic(self.person.set)(test_person(), {
+                    'name': "Nocchi",
+                    'address': {'street': "Gangnam", 'number': 25},
+                })
+
+        self.assertRegex(logs.output[1],
+                         r'set street at address/street: [0-9.]+s')
@@ -1,8 +1,11 @@
 """Test lenses."""
 
+import asyncio
 import unittest
+from typing import Any, List
 
-from adapt.objects import Attribute
+from adapt.lens import Composed
+from adapt.objects import Attribute, ComposedAttribute, Object
 from adapt.primitives import string
 
 from .utils import test_person
@@ -22,3 +25,94 @@ class TestCompose(unittest.TestCase):
         person_ = address.set(person, 14)
         assert person_.address is not None
         self.assertEqual(person_.address.number, 14)
+
+
+class Counted(Attribute):
+    """An attribute lens counting the times the attribute is read."""
+
+    def __init__(self, attribute: str) -> None:
+        super().__init__(attribute)
+        self.reads = 0
+
+    def get(self, target: Any) -> Any:
+        self.reads += 1
+        return super().get(target)
+
+
+class Logged(Attribute):
+    """An attribute lens recording the values set."""
+
+    def __init__(self, attribute: str) -> None:
+        super().__init__(attribute)
+        self.values: List[Any] = []
+
+    def set(self, target: Any, value: Any) -> Any:
+        self.values.append(value)
+        return super().set(target, value)
+
+
+class TestModify(unittest.TestCase):
+    """Test modifying the values through lenses."""
+
+    def test_over(self) -> None:
+        """Test applying a function to the value."""
+
+        number = Attribute('address') * Attribute('number')
+        self.assertIsInstance(number, ComposedAttribute)
+
+        person = number.over(test_person(), lambda value: value + 1)
+        self.assertEqual(number.get(person), 13)
+
+        name = Attribute('name')
+        person = name.over(person, str.upper)
+        self.assertEqual(person.name, "AYANO")
+
+    def test_single_pass(self) -> None:
+        """Test setting through a composition reads the outer lens once."""
+
+        address = Counted('address')
+        number = address * Attribute('number')
+        self.assertIs(type(number), Composed)
+
+        person = number.set(test_person(), 14)
+        self.assertEqual(address.reads, 1)
+
+        person = number.over(person, lambda value: value * 2)
+        self.assertEqual(address.reads, 2)
+        self.assertEqual(number.get(person), 28)
+
+    def test_overridden_set(self) -> None:
+        """Test a subclass overriding only set is still called."""
+
+        name = Logged('name')
+        self.assertIs(type(name * string), Composed)
+
+        person = (name * string).set(test_person(), "Mei")
+        self.assertEqual(person.name, "Mei")
+        self.assertEqual(name.values, ["Mei"])
+
+        class LoggedObject(Object):
+            """An object lens with logged attributes."""
+            pointer = Logged
+
+        person_lens = LoggedObject({'name': string})
+        person = person_lens.set(person, {'name': "Ayano"})
+        self.assertEqual(person.name, "Ayano")
+        logged = person_lens.attributes['name']
+        assert isinstance(logged, Composed)
+        assert isinstance(logged.outer, Logged)
+        self.assertEqual(logged.outer.values, ["Ayano"])
+
+    def test_async(self) -> None:
+        """Test modifying the values asynchronously."""
+
+        number = Counted('address') * Attribute('number')
+
+        async def double(value: Any, factor: int) -> Any:
+            return value * factor
+
+        person = asyncio.run(number.amodify(test_person(), double, 3))
+        self.assertEqual(number.get(person), 36)
+
+        person = asyncio.run(number.aset(person, 15))
+        self.assertEqual(number.get(person), 15)
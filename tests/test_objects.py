@@ -1,5 +1,6 @@
 """Test adapters."""
 
+import asyncio
 import unittest
 
 from adapt.objects import Attribute, Object
@@ -31,6 +32,63 @@ class TestObject(unittest.TestCase):
         self.assertEqual(person_obj_.name, "Nocchi")
         self.assertEqual(person_obj_.email, "nocchi@naver.com")
 
+    def test_async(self) -> None:
+        person = Object({
+            'name': string,
+            'address': Object({
+                'street': string,
+            }),
+        })
+
+        person_obj = test_person()
+
+        self.assertEqual(asyncio.run(person.aget(person_obj)), {
+            'name': "Ayano",
+            'address': {
+                'street': "Banpo",
+            },
+        })
+
+        person_obj_ = asyncio.run(person.aset(person_obj, {
+            'name': "Nocchi",
+            'address': {
+                'street': "Gangnam",
+            },
+        }))
+
+        self.assertEqual(person_obj_.name, "Nocchi")
+        assert person_obj_.address is not None
+        self.assertEqual(person_obj_.address.street, "Gangnam")
+
+    def test_partial(self) -> None:
+        person = Object({
+            'name': string,
+            'email': string,
+            'address': Object({
+                'street': string,
+            }, partial=True),
+        }, partial=True)
+
+        person_obj = person.set(test_person(), {
+            'email': "nocchi@naver.com",
+            'address': {},
+        })
+
+        self.assertEqual(person_obj.name, "Ayano")
+        self.assertEqual(person_obj.email, "nocchi@naver.com")
+        assert person_obj.address is not None
+        self.assertEqual(person_obj.address.street, "Banpo")
+
+        person_obj = asyncio.run(person.aset(person_obj, {
+            'name': "Nocchi",
+        }))
+
+        self.assertEqual(person_obj.name, "Nocchi")
+        self.assertEqual(person_obj.email, "nocchi@naver.com")
+
+        with self.assertRaises(KeyError):
+            Object({'name': string}).set(test_person(), {})
+
 
 class TestAttribute(unittest.TestCase):
 
@@ -1,10 +1,16 @@
 """Test transactions."""
 
+import asyncio
+import threading
 import unittest
-from typing import List, Optional, Set
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import partial
+from typing import Iterator, List, Optional, Set
 
 from adapt.errors import ValidationError
-from adapt.transaction import atomic, context, on_commit
+from adapt.transaction import (TransactionState, atomic, commit_context,
+                               context, error, on_commit)
 
 Log = List[str]
 
@@ -118,6 +124,104 @@ class TestTransaction(unittest.TestCase):
         ])
 
 
+class TestConcurrency(unittest.TestCase):
+    """Test transactions running concurrently."""
+
+    def test_threads(self) -> None:
+        """Test transactions in different threads don't share state."""
+
+        threads = 16
+        rounds = 50
+        barrier = threading.Barrier(threads, timeout=10)
+
+        @atomic
+        def action(log: Log, marker: str, error: bool) -> None:
+            """An action waiting for all the other threads to start theirs."""
+
+            with context(marker):
+                on_commit(lambda: log.append("{} commit".format(marker)))
+                barrier.wait()
+                if error:
+                    raise ValidationError("Error {}".format(marker))
+
+        def run(thread: int) -> Log:
+            """Run a number of transactions, failing every other one."""
+
+            log: Log = []
+            for number in range(rounds):
+                marker = "{}-{}".format(thread, number)
+                error = (thread + number) % 2 == 0
+                try:
+                    action(log, marker, error)
+                except ValidationError as exc:
+                    errors = exc.args[0]
+                    self.assertEqual(list(errors.nested.keys()), [marker])
+                    log.append("{} error".format(marker))
+            return log
+
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            logs = list(executor.map(run, range(threads)))
+
+        for thread, log in enumerate(logs):
+            self.assertEqual(log, [
+                "{}-{} {}".format(
+                    thread,
+                    number,
+                    "error" if (thread + number) % 2 == 0 else "commit",
+                )
+                for number in range(rounds)
+            ])
+
+    def test_tasks(self) -> None:
+        """Test transactions in different asyncio tasks don't share state."""
+
+        tasks = 100
+
+        @atomic
+        async def action(log: Log, marker: str, error: bool) -> None:
+            """An action letting the other tasks run in the middle."""
+
+            with context(marker):
+                on_commit(lambda: log.append("{} commit".format(marker)))
+
+                async def async_hook() -> None:
+                    await asyncio.sleep(0)
+                    log.append("{} async commit".format(marker))
+
+                on_commit(async_hook)
+                await asyncio.sleep(0)
+                if error:
+                    raise ValidationError("Error {}".format(marker))
+
+        async def run(task: int) -> Log:
+            """Run a transaction, failing every other one."""
+
+            log: Log = []
+            marker = str(task)
+            try:
+                await action(log, marker, task % 2 == 0)
+            except ValidationError as exc:
+                errors = exc.args[0]
+                self.assertEqual(list(errors.nested.keys()), [marker])
+                log.append("{} error".format(marker))
+            return log
+
+        async def run_all() -> List[Log]:
+            """Run all the tasks concurrently."""
+            return await asyncio.gather(*map(run, range(tasks)))
+
+        logs = asyncio.run(run_all())
+
+        for task, log in enumerate(logs):
+            if task % 2 == 0:
+                self.assertEqual(log, ["{} error".format(task)])
+            else:
+                self.assertEqual(log, [
+                    "{} commit".format(task),
+                    "{} async commit".format(task),
+                ])
+
+
 class TestErrors(unittest.TestCase):
     """Test error gathering."""
 
@@ -134,3 +238,136 @@ class TestErrors(unittest.TestCase):
         self.assertEqual(list(errors.nested.keys()), ["A"])
         self.assertEqual(errors.nested["A"].errors, ["Error A"])
         self.assertEqual(errors.nested["A"].nested, {})
+        self.assertFalse(errors.truncated)
+
+    def test_fail_fast(self) -> None:
+        """Test stopping at the first error."""
+
+        log: Log = []
+
+        with self.assertRaises(ValidationError) as raised:
+            atomic(max_errors=1)(composite_action)(log, errors={"A", "B"})
+
+        errors = raised.exception.args[0]
+        self.assertTrue(errors.truncated)
+        self.assertEqual(len(errors), 1)
+        self.assertEqual(errors.nested["A"].errors, ["Error A"])
+        self.assertEqual(log, ["outer 1", "A 1"])
+
+    def test_max_errors(self) -> None:
+        """Test stopping after a number of errors."""
+
+        @atomic
+        def action(log: Log, count: int) -> None:
+            """An action recording several errors."""
+
+            for index in range(count):
+                with context(index):
+                    log.append(str(index))
+                    error("Error {}".format(index))
+
+        for max_errors, count, expected, truncated in (
+                (3, 10, 3, True),
+                (3, 3, 3, True),
+                (3, 2, 2, False),
+                (None, 10, 10, False),
+        ):
+            with self.subTest(max_errors=max_errors, count=count):
+                log: Log = []
+
+                with self.assertRaises(ValidationError) as raised:
+                    atomic(max_errors=max_errors)(action)(log, count)
+
+                errors = raised.exception.args[0]
+                self.assertEqual(errors.truncated, truncated)
+                self.assertEqual(list(errors.nested), list(range(expected)))
+                self.assertEqual(log, [str(index) for index in range(expected)])
+
+    def test_state_limit(self) -> None:
+        """Test the default limit of the transaction state."""
+
+        state = TransactionState(max_errors=2)
+        log: Log = []
+
+        @state.atomic
+        def action() -> None:
+            """An action recording errors until stopped."""
+
+            for index in range(5):
+                log.append(str(index))
+                state.error("Error {}".format(index))
+                state.on_commit(lambda: log.append("commit"))
+
+        with self.assertRaises(ValidationError) as raised:
+            action()
+
+        self.assertEqual(raised.exception.args[0].errors,
+                         ["Error 0", "Error 1"])
+        self.assertEqual(log, ["0", "1"])
+
+        # The limit is read when the transaction starts
+        state.max_errors = 1
+        log.clear()
+
+        with self.assertRaises(ValidationError) as raised:
+            action()
+
+        self.assertEqual(raised.exception.args[0].errors, ["Error 0"])
+        self.assertTrue(raised.exception.args[0].truncated)
+        self.assertEqual(log, ["0"])
+
+    def test_async_limit(self) -> None:
+        """Test stopping an asynchronous transaction."""
+
+        log: Log = []
+
+        @atomic(max_errors=1)
+        async def action() -> None:
+            """An asynchronous action recording errors."""
+
+            for index in range(3):
+                await asyncio.sleep(0)
+                log.append(str(index))
+                error("Error {}".format(index))
+
+        with self.assertRaises(ValidationError) as raised:
+            asyncio.run(action())
+
+        self.assertEqual(raised.exception.args[0].errors, ["Error 0"])
+        self.assertEqual(log, ["0"])
+
+
+class TestCommitContext(unittest.TestCase):
+    """Test running the commit hooks inside a context manager."""
+
+    def test_commit_context(self) -> None:
+        """Test the hooks run inside the registered contexts."""
+
+        log: Log = []
+
+        @contextmanager
+        def logged(name: str) -> Iterator[None]:
+            log.append("enter {}".format(name))
+            yield
+            log.append("exit {}".format(name))
+
+        @atomic
+        def action() -> None:
+            """An action registering the contexts several times."""
+
+            commit_context('A', partial(logged, "A"))
+            on_commit(lambda: log.append("commit 1"))
+            commit_context('A', partial(logged, "A again"))
+            commit_context('B', partial(logged, "B"))
+            on_commit(lambda: log.append("commit 2"))
+
+        action()
+
+        self.assertEqual(log, [
+            "enter A",
+            "enter B",
+            "commit 1",
+            "commit 2",
+            "exit B",
+            "exit A",
+        ])
@@ -0,0 +1,92 @@
+"""Test validating lenses."""
+
+import unittest
+from typing import Any, Optional
+
+from adapt.compiler import compile_lens
+from adapt.errors import ValidationError
+from adapt.objects import Object
+from adapt.primitives import integer, string
+from adapt.transaction import atomic, context
+from adapt.validation import Validate
+
+from .utils import test_person
+
+
+def non_empty(value: Any) -> Optional[str]:
+    """Check the value is not empty."""
+
+    if not value:
+        return "Must not be empty."
+    return None
+
+
+class TestValidate(unittest.TestCase):
+    """Test validation."""
+
+    def setUp(self) -> None:
+        self.person = Object({
+            'name': Validate(non_empty, string),
+            'address': Object({
+                'street': Validate(non_empty, string),
+                'number': integer,
+            }),
+        })
+
+    def test_valid(self) -> None:
+        """Test a valid value is set."""
+
+        person_obj = atomic(self.person.set)(test_person(), {
+            'name': "Nocchi",
+            'address': {
+                'street': "Gangnam",
+                'number': 25,
+            },
+        })
+
+        self.assertEqual(person_obj.name, "Nocchi")
+
+    def test_errors(self) -> None:
+        """Test the errors are recorded under the attribute names."""
+
+        for lens in (self.person, compile_lens(self.person)):
+            with self.subTest(lens=lens):
+                person_obj = test_person()
+
+                @atomic
+                def update() -> None:
+                    """Update the person with invalid values."""
+
+                    for index in range(3):
+                        with context(index):
+                            lens.set(person_obj, {
+                                'name': "" if index != 1 else "Nocchi",
+                                'address': {
+                                    'street': "",
+                                    'number': 25,
+                                },
+                            })
+
+                with self.assertRaises(ValidationError) as raised:
+                    update()
+
+                errors = raised.exception.args[0]
+                self.assertEqual(list(errors.nested.keys()), [0, 1, 2])
+                self.assertEqual(errors.nested[0].nested['name'].errors,
+                                 ["Must not be empty."])
+                self.assertNotIn('name', errors.nested[1].nested)
+                self.assertEqual(
+                    errors.nested[2].nested['address'].nested['street']
+                    .errors,
+                    ["Must not be empty."],
+                )
+
+                # The valid values are still set
+                assert person_obj.address is not None
+                self.assertEqual(person_obj.address.number, 25)
+
+    def test_outside_transaction(self) -> None:
+        """Test the error is raised outside of a transaction."""
+
+        with self.assertRaises(ValidationError):
+            Validate(non_empty, string).set("", "")